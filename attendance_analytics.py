@@ -0,0 +1,213 @@
+"""Absence analytics on per-month attendance bitmaps.
+
+`attendance_bitmaps` keeps one row per employee and month with three
+32-bit masks (present / absent / leave, bit d-1 = day d). The masks are
+kept in sync by the attendance write paths in db_config, so a company-wide
+month loads in a single query of one small row per employee. Questions
+like "absent 3+ days" or "department attendance rate by week" then become
+AND/popcount operations on integers instead of scans over raw rows.
+
+Usage:
+    python attendance_analytics.py 2026-10 --absent 3
+    python attendance_analytics.py 2026-10 --rebuild
+"""
+import argparse
+import calendar
+import datetime
+import sys
+from array import array
+
+import db_config
+from db_config import create_connection, Error, _show_error, valid_year_month, period_date
+from migrations import ATTENDANCE_BITMAP_UPSERT
+
+NO_DEPT = "(No Department)"
+
+# ATTENDANCE_BITMAP_UPSERT for SQLite, which has no DATE_SUB/DAY/BIT_OR/IF. SUM stands in
+# for BIT_OR: attendance has one row per employee and day, so no bit is ever added twice.
+SQLITE_BITMAP_UPSERT = """
+    INSERT INTO attendance_bitmaps (emp_id, month, present_bits, absent_bits, leave_bits)
+    SELECT emp_id,
+           date(att_date, 'start of month') AS month,
+           SUM(CASE WHEN status = 'PRESENT' THEN 1 << (CAST(strftime('%d', att_date) AS INTEGER) - 1) ELSE 0 END),
+           SUM(CASE WHEN status = 'ABSENT' THEN 1 << (CAST(strftime('%d', att_date) AS INTEGER) - 1) ELSE 0 END),
+           SUM(CASE WHEN status = 'LEAVE' THEN 1 << (CAST(strftime('%d', att_date) AS INTEGER) - 1) ELSE 0 END)
+    FROM attendance
+    WHERE emp_id > %s AND emp_id <= %s {month_filter}
+    GROUP BY emp_id, month
+    ON DUPLICATE KEY UPDATE
+        present_bits = VALUES(present_bits),
+        absent_bits = VALUES(absent_bits),
+        leave_bits = VALUES(leave_bits)
+"""
+
+
+def week_masks(year_month):
+    """[(label, mask)] for each Monday-based week of the month, clipped to the month."""
+    first = period_date(year_month)
+    days = calendar.monthrange(first.year, first.month)[1]
+    weeks = []
+    mask = 0
+    start = 1
+    for day in range(1, days + 1):
+        mask |= 1 << (day - 1)
+        if datetime.date(first.year, first.month, day).weekday() == 6 or day == days:
+            weeks.append((f"{start:02d}-{day:02d}", mask))
+            mask = 0
+            start = day + 1
+    return weeks
+
+
+class MonthBitmaps:
+    """One month of status masks for all employees, held column-wise."""
+
+    def __init__(self, year_month, emp_ids, dept_names, dept_codes, present, absent, leave):
+        self.year_month = year_month
+        self.emp_ids = emp_ids          # array('l')
+        self.dept_names = dept_names    # code -> name
+        self.dept_codes = dept_codes    # array('H')
+        self.present = present          # array('L') masks
+        self.absent = absent
+        self.leave = leave
+
+    def __len__(self):
+        return len(self.emp_ids)
+
+    @classmethod
+    def load(cls, year_month):
+        """Read the month's bitmaps in one query. Returns None on failure."""
+        conn = create_connection()
+        if conn is None:
+            return None
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute("""
+                SELECT b.emp_id, COALESCE(d.dept_name, %s), b.present_bits, b.absent_bits, b.leave_bits
+                FROM attendance_bitmaps b
+                JOIN employees e ON b.emp_id = e.emp_id
+                LEFT JOIN departments d ON e.dept_id = d.dept_id
+                WHERE b.month = %s
+                ORDER BY b.emp_id
+            """, (NO_DEPT, period_date(year_month)))
+            names, index = [], {}
+            emp_ids, codes = array("l"), array("H")
+            present, absent, leave = array("L"), array("L"), array("L")
+            for emp_id, dept_name, p, a, lv in cursor:
+                code = index.get(dept_name)
+                if code is None:
+                    code = index[dept_name] = len(names)
+                    names.append(dept_name)
+                emp_ids.append(emp_id)
+                codes.append(code)
+                present.append(p)
+                absent.append(a)
+                leave.append(lv)
+            return cls(year_month, emp_ids, names, codes, present, absent, leave)
+        except Error as e:
+            _show_error("DB Error", f"Error loading attendance bitmaps: {e}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def absent_at_least(self, days, mask=0xFFFFFFFF):
+        """[(emp_id, absent_days)] for employees absent `days` or more within `mask`."""
+        counts = ((emp_id, (bits & mask).bit_count()) for emp_id, bits in zip(self.emp_ids, self.absent))
+        return [(emp_id, n) for emp_id, n in counts if n >= days]
+
+    def employee_counts(self):
+        """[(emp_id, present_days, absent_days, leave_days)] for the month."""
+        return [(emp_id, p.bit_count(), a.bit_count(), lv.bit_count())
+                for emp_id, p, a, lv in zip(self.emp_ids, self.present, self.absent, self.leave)]
+
+    def department_weekly_rates(self):
+        """{dept_name: [(week_label, present_days, recorded_days, rate)]} for the month.
+
+        rate is present days over days with any recorded status, or None if nothing was recorded.
+        """
+        weeks = week_masks(self.year_month)
+        totals = {name: [[0, 0] for _ in weeks] for name in self.dept_names}
+        for code, p, a, lv in zip(self.dept_codes, self.present, self.absent, self.leave):
+            dept_totals = totals[self.dept_names[code]]
+            recorded = p | a | lv
+            for i, (_label, mask) in enumerate(weeks):
+                dept_totals[i][0] += (p & mask).bit_count()
+                dept_totals[i][1] += (recorded & mask).bit_count()
+        return {
+            name: [(label, present, recorded, (present / recorded) if recorded else None)
+                   for (label, _mask), (present, recorded) in zip(weeks, rows)]
+            for name, rows in sorted(totals.items())
+        }
+
+
+def rebuild_bitmaps(year_month=None, batch=2000):
+    """Recompute bitmaps from raw attendance (one month, or all), in emp_id batches.
+
+    Only needed after attendance was changed outside db_config (imports, manual SQL).
+    The DELETE and every batch run in one transaction, so a failure part-way leaves the
+    old bitmaps in place instead of an empty or half-filled month.
+    """
+    conn = create_connection()
+    if conn is None:
+        return False
+    cursor = conn.cursor(buffered=True)
+    try:
+        month_filter, extra = "", ()
+        if year_month:
+            first = period_date(year_month)
+            last = first.replace(day=calendar.monthrange(first.year, first.month)[1])
+            month_filter, extra = "AND att_date BETWEEN %s AND %s", (first, last)
+            cursor.execute("DELETE FROM attendance_bitmaps WHERE month = %s", (first,))
+        else:
+            cursor.execute("DELETE FROM attendance_bitmaps")
+        cursor.execute("SELECT MIN(emp_id), MAX(emp_id) FROM attendance")
+        lo, hi = cursor.fetchone()
+        upsert = SQLITE_BITMAP_UPSERT if db_config.get_backend().name == "sqlite" else ATTENDANCE_BITMAP_UPSERT
+        sql = upsert.format(month_filter=month_filter)
+        start = (lo or 1) - 1
+        while hi is not None and start < hi:
+            cursor.execute(sql, (start, start + batch) + extra)
+            start += batch
+        conn.commit()
+        return True
+    except Error as e:
+        conn.rollback()
+        _show_error("DB Error", f"Error rebuilding attendance bitmaps: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Company-wide absence report for one month.")
+    parser.add_argument("year_month", help="Month (YYYY-MM)")
+    parser.add_argument("--absent", type=int, default=3, help="List employees absent at least this many days")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the month's bitmaps from attendance first")
+    args = parser.parse_args(argv)
+    if not valid_year_month(args.year_month):
+        parser.error("year_month must be in YYYY-MM format")
+
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    if args.rebuild and not rebuild_bitmaps(args.year_month):
+        return 1
+    bitmaps = MonthBitmaps.load(args.year_month)
+    if bitmaps is None:
+        return 1
+
+    flagged = bitmaps.absent_at_least(args.absent)
+    print(f"{len(flagged)} of {len(bitmaps)} employees absent {args.absent}+ days in {args.year_month}")
+    for emp_id, days in sorted(flagged, key=lambda r: -r[1]):
+        print(f"  emp {emp_id}: {days} day(s)")
+    print("Attendance rate by department and week:")
+    for dept_name, weeks in bitmaps.department_weekly_rates().items():
+        cells = "  ".join(f"{label}: {'-' if rate is None else f'{rate:.0%}'}" for label, _p, _r, rate in weeks)
+        print(f"  {dept_name:<18} {cells}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
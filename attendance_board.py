@@ -0,0 +1,281 @@
+"""Live attendance board: today's counts, overall and per department.
+
+For every active employee the board keeps today's state (department,
+status, punched in but not out) and a set of counters per department. The
+state is seeded from a single query (active employees left-joined to
+today's attendance rows, aggregated in memory), after which the app's own
+writes are applied as they happen: attach() subscribes the board to
+db_config change events, so mark_in_time, mark_out_time,
+mark_attendance_status and employee adds, moves and deletions each adjust
+a handful of counters in constant time, with no re-read of `attendance`.
+
+Writes made by other users or processes are picked up by reconcile(),
+which re-runs the seed query and replaces the state (reporting how many
+employees had drifted). Change events that arrive while the query runs are
+recorded and replayed onto the fresh state; each event sets an absolute
+state, so replaying one the query already saw is harmless. A new day
+starts over with a fresh seed.
+
+Usage:
+    python attendance_board.py
+    python attendance_board.py --date 2026-10-19
+"""
+import argparse
+import datetime
+import sys
+import threading
+
+import db_config
+from db_config import create_connection, Error, _show_error
+from attendance_analytics import NO_DEPT
+
+COUNTERS = ("headcount", "present", "absent", "leave", "not_punched", "clocked_in")
+COUNTER_TITLES = ("Headcount", "Present", "Absent", "Leave", "Not punched", "Clocked in")
+RECONCILE_SECONDS = 60
+
+BOARD_QUERY = db_config.register_query("attendance board seed", """
+    SELECT e.emp_id, e.dept_id, d.dept_name, a.status,
+           a.in_time IS NOT NULL AND a.out_time IS NULL
+    FROM employees e
+    LEFT JOIN departments d ON e.dept_id = d.dept_id
+    LEFT JOIN attendance a ON a.emp_id = e.emp_id AND a.att_date = %s
+    WHERE e.status = 'ACTIVE'
+""", (db_config.SAMPLE_DAY,))
+
+
+def _contribution(status, clocked_in):
+    """Counters an employee in this state adds 1 to (headcount included)."""
+    keys = ["headcount", status.lower() if status else "not_punched"]
+    if clocked_in:
+        keys.append("clocked_in")
+    return keys
+
+
+class AttendanceBoard:
+    """In-memory counters for one day; thread-safe. `version` changes whenever they do."""
+
+    def __init__(self, day=None):
+        self.day = day
+        self.fixed_day = day is not None
+        self.version = 0
+        self.seeded_at = None
+        self.last_drift = None
+        self._lock = threading.Lock()
+        self._state = {}          # emp_id -> [dept_id, status, clocked_in]
+        self._counts = {}         # dept_id -> {counter: n}
+        self._totals = dict.fromkeys(COUNTERS, 0)
+        self._dept_names = {}
+        self._recorders = []      # one event list per reconcile in progress
+        self._attached = False
+
+    # -----------------------
+    # SEEDING + RECONCILING
+    # -----------------------
+    def _load(self, day, quiet=False):
+        """(state, dept_names) for `day` from the database, or None on failure."""
+        conn = create_connection()
+        if conn is None:
+            return None
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute(BOARD_QUERY, (day,))
+            state, dept_names = {}, {}
+            for emp_id, dept_id, dept_name, status, clocked_in in cursor:
+                state[emp_id] = [dept_id, status, bool(clocked_in)]
+                if dept_id is not None:
+                    dept_names[dept_id] = dept_name
+            return state, dept_names
+        except Error as e:
+            if quiet:
+                print(f"[Attendance board] {e}", file=sys.stderr)
+            else:
+                _show_error("DB Error", f"Error loading attendance board: {e}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _stop_recording(self, events):
+        """Caller holds the lock."""
+        self._recorders = [other for other in self._recorders if other is not events]
+
+    def _install(self, day, state, dept_names, events=None):
+        """Replace the state with a fresh read, then replay `events` recorded during it."""
+        counts = {}
+        totals = dict.fromkeys(COUNTERS, 0)
+        for dept_id, status, clocked_in in state.values():
+            dept = counts.setdefault(dept_id, dict.fromkeys(COUNTERS, 0))
+            for key in _contribution(status, clocked_in):
+                dept[key] += 1
+                totals[key] += 1
+        with self._lock:
+            if events is not None:
+                self._stop_recording(events)
+            old_day, old_state = self.day, self._state
+            self.day = day
+            self._state = state
+            self._counts = counts
+            self._totals = totals
+            self._dept_names = dept_names
+            for event in events or ():
+                self._apply(*event)
+            drift = None
+            if old_day == day and old_state:
+                drift = sum(1 for emp_id in state.keys() | old_state.keys()
+                            if state.get(emp_id) != old_state.get(emp_id))
+            self.seeded_at = datetime.datetime.now()
+            self.last_drift = drift
+            self.version += 1
+        return drift
+
+    def seed(self):
+        """(Re)load today's state; returns False on a database error."""
+        return self.reconcile() is not False
+
+    def reconcile(self, quiet=False):
+        """Replace the counters with a fresh read. Returns the number of employees whose
+        state had drifted (None on the first load or a new day), or False on failure.
+
+        Safe to call from a worker thread; with quiet=True errors go to stderr instead of a message box.
+        """
+        day = self.day if self.fixed_day else datetime.date.today()
+        events = []
+        with self._lock:
+            self._recorders.append(events)
+        try:
+            loaded = self._load(day, quiet)
+            if loaded is None:
+                return False
+            return self._install(day, *loaded, events)
+        finally:
+            with self._lock:
+                self._stop_recording(events)
+
+    # -----------------------
+    # INCREMENTAL UPDATES
+    # -----------------------
+    def _move(self, emp_id, dept_id=None, status=None, clocked_in=None, keep_dept=True):
+        """Change one employee's state and adjust only the affected counters. Caller holds the lock."""
+        current = self._state.get(emp_id)
+        if current is None:
+            return
+        old_dept, old_status, old_clocked = current
+        new = [old_dept if keep_dept else dept_id,
+               old_status if status is None else status,
+               old_clocked if clocked_in is None else clocked_in]
+        if new == current:
+            return
+        for key in _contribution(old_status, old_clocked):
+            self._counts[old_dept][key] -= 1
+            self._totals[key] -= 1
+        dept = self._counts.setdefault(new[0], dict.fromkeys(COUNTERS, 0))
+        for key in _contribution(new[1], new[2]):
+            dept[key] += 1
+            self._totals[key] += 1
+        self._state[emp_id] = new
+        self.version += 1
+
+    def _add(self, emp_id, dept_id):
+        if emp_id in self._state:
+            return
+        self._state[emp_id] = [dept_id, None, False]
+        dept = self._counts.setdefault(dept_id, dict.fromkeys(COUNTERS, 0))
+        for key in _contribution(None, False):
+            dept[key] += 1
+            self._totals[key] += 1
+        self.version += 1
+
+    def _remove(self, emp_id):
+        current = self._state.pop(emp_id, None)
+        if current is None:
+            return
+        for key in _contribution(current[1], current[2]):
+            self._counts[current[0]][key] -= 1
+            self._totals[key] -= 1
+        self.version += 1
+
+    def on_change(self, table, action, key, before=None, after=None):
+        """db_config change listener."""
+        with self._lock:
+            for events in self._recorders:
+                events.append((table, action, key, before, after))
+            self._apply(table, action, key, before, after)
+
+    def _apply(self, table, action, key, before, after):
+        """Apply one change event to the counters. Caller holds the lock."""
+        if self.day is None:
+            return
+        if table == "attendance":
+            emp_id, att_date = str(key).split(":", 1)
+            if att_date != self.day.isoformat():
+                return
+            emp_id = int(emp_id)
+            if action == "IN_TIME":
+                self._move(emp_id, status=(after or {}).get("status", "PRESENT"), clocked_in=True)
+            elif action == "OUT_TIME":
+                self._move(emp_id, clocked_in=False)
+            elif action == "STATUS":
+                # A newly inserted status row has no in-time; an existing row keeps its punches
+                self._move(emp_id, status=after["status"], clocked_in=None if before else False)
+        elif table == "employees":
+            emp_id = int(key)
+            if action == "INSERT" and (after or {}).get("status", "ACTIVE") == "ACTIVE":
+                self._add(emp_id, after.get("dept_id"))
+            elif action in ("UPDATE", "BULK_UPDATE") and after and "dept_id" in after:
+                self._move(emp_id, dept_id=after["dept_id"], keep_dept=False)
+            elif action in ("DELETE", "PURGE"):
+                self._remove(emp_id)
+
+    def attach(self):
+        if not self._attached:
+            db_config.add_change_listener(self.on_change)
+            self._attached = True
+        return self
+
+    def detach(self):
+        if self._attached:
+            db_config.remove_change_listener(self.on_change)
+            self._attached = False
+
+    # -----------------------
+    # READING
+    # -----------------------
+    def dept_name(self, dept_id):
+        if dept_id is None:
+            return NO_DEPT
+        return self._dept_names.get(dept_id) or f"Department {dept_id}"
+
+    def snapshot(self):
+        """(version, totals, [(dept_name, counts)] by name); counts are {counter: n}."""
+        with self._lock:
+            rows = [(self.dept_name(dept_id), dict(counts))
+                    for dept_id, counts in self._counts.items() if counts["headcount"]]
+            return self.version, dict(self._totals), sorted(rows, key=lambda r: r[0])
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Today's attendance counts, overall and per department.")
+    parser.add_argument("--date", help="Day to show (YYYY-MM-DD, default today)")
+    args = parser.parse_args(argv)
+    try:
+        day = datetime.datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    except ValueError:
+        parser.error("--date must be in YYYY-MM-DD format")
+
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    board = AttendanceBoard(day)
+    if not board.seed():
+        return 1
+    _version, totals, rows = board.snapshot()
+    print(f"Attendance for {board.day}")
+    print(f"  {'Department':<20}" + "".join(f"{title:>13}" for title in COUNTER_TITLES))
+    for name, counts in rows + [("All", totals)]:
+        print(f"  {name:<20}" + "".join(f"{counts[key]:>13}" for key in COUNTERS))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""Asynchronous, append-only audit trail for db_config write functions.
+
+Write paths call record() after their commit. The entry is only placed on a
+bounded in-process queue; a background thread serialises entries and
+persists them in batches, either to the `audit_log` table or to segmented
+append-only JSONL files. When the queue is full, record() blocks until the
+writer catches up, so memory stays bounded and nothing is dropped. A failing
+sink spills to local segments; only if those cannot be written either are
+entries dropped (counted and reported on stderr), so the writer keeps running.
+Pending entries are flushed when the interpreter exits.
+
+With several databases in one process (see tenants.py) each entry carries
+the route it was recorded under and is written to that route's database.
+"""
+import atexit
+import datetime
+import getpass
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# -----------------------
+# AUDIT CONFIG
+# -----------------------
+AUDIT_SINK = "db"            # "db" for the audit_log table, or a directory for JSONL segments
+AUDIT_FALLBACK_DIR = os.path.join(os.path.expanduser("~"), ".hr_system", "audit")
+QUEUE_MAX = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5         # seconds a partial batch may wait
+PUT_TIMEOUT = 1.0            # record() re-checks that the writer is alive this often while blocked
+SEGMENT_BYTES = 16 * 1024 * 1024
+
+_lock = threading.Lock()
+_writer = None
+_actor = None
+_route = None                # () -> route key of the caller, e.g. the current tenant
+_route_connect = None        # route key -> connection to that route's database
+_STOP = object()
+
+
+def set_actor(name):
+    """Set the user name recorded with subsequent audit entries."""
+    global _actor
+    _actor = name
+
+
+def set_router(route, connect):
+    """Write entries to per-route databases: route() names the caller's, connect(key) opens it.
+
+    Pass None, None to go back to the single configured database.
+    """
+    global _route, _route_connect
+    _route = route
+    _route_connect = connect
+
+
+def _current_actor():
+    global _actor
+    if not _actor:
+        try:
+            _actor = getpass.getuser()
+        except Exception:
+            _actor = "unknown"
+    return _actor
+
+
+def record(table, action, key, before=None, after=None):
+    """Queue one audit entry. `before`/`after` are dict row images (or None)."""
+    route = _route() if _route is not None else None
+    entry = (route, datetime.datetime.now(), _current_actor(), table, action, str(key), before, after)
+    writer = _ensure_writer()
+    while True:
+        try:
+            writer.queue.put(entry, timeout=PUT_TIMEOUT)
+            return
+        except queue.Full:
+            # Backpressure, unless the writer died: then a new one takes over its queue
+            if not writer.is_alive():
+                writer = _ensure_writer()
+
+
+# -----------------------
+# SINKS
+# -----------------------
+def _to_json(image):
+    if image is None:
+        return None
+    return json.dumps(image, default=str, separators=(",", ":"), sort_keys=True)
+
+
+class _FileSink:
+    """Append-only JSONL segments, rolled over at SEGMENT_BYTES."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.handle = None
+
+    def _open_segment(self):
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.directory, f"audit-{stamp}.jsonl")
+        self.handle = open(path, "a", encoding="utf-8")
+
+    def write(self, entries):
+        if self.handle is None or self.handle.tell() >= SEGMENT_BYTES:
+            if self.handle is not None:
+                self.handle.close()
+            self._open_segment()
+        lines = []
+        for route, logged_at, actor, table, action, key, before, after in entries:
+            entry = {
+                "logged_at": logged_at.isoformat(),
+                "actor": actor,
+                "table": table,
+                "action": action,
+                "key": key,
+                "before": before,
+                "after": after,
+            }
+            if route is not None:
+                entry["tenant"] = route
+            lines.append(json.dumps(entry, default=str, separators=(",", ":"), sort_keys=True))
+        self.handle.write("\n".join(lines) + "\n")
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class _UnwrittenEntries(Exception):
+    """A sink wrote part of a batch; `entries` are the ones that still need a home."""
+
+    def __init__(self, message, entries):
+        super().__init__(message)
+        self.entries = entries
+
+
+class _DatabaseSink:
+    """Batched multi-row INSERTs into audit_log over one long-lived connection per route.
+
+    Each route commits on its own; if some fail, the others stay written and only the
+    failed routes' entries are raised in _UnwrittenEntries.
+    """
+
+    def __init__(self):
+        self.conns = {}
+
+    def _connection(self, route):
+        conn = self.conns.get(route)
+        if conn is None or not conn.is_connected():
+            if route is None or _route_connect is None:
+                from db_config import create_connection
+                conn = create_connection()
+            else:
+                conn = _route_connect(route)
+            if conn is None:
+                raise RuntimeError(f"no database connection for audit log ({route or 'default'})")
+            self.conns[route] = conn
+        return conn
+
+    def write(self, entries):
+        by_route = {}
+        for entry in entries:
+            by_route.setdefault(entry[0], []).append(entry)
+        failed, errors = [], []
+        for route, group in by_route.items():
+            try:
+                self._write_route(route, group)
+            except Exception as e:
+                failed.extend(group)
+                errors.append(f"{route or 'default'}: {e}")
+        if failed:
+            raise _UnwrittenEntries("; ".join(errors), failed)
+
+    def _write_route(self, route, entries):
+        conn = self._connection(route)
+        cursor = conn.cursor()
+        try:
+            cursor.executemany("""
+                INSERT INTO audit_log (logged_at, actor, table_name, action, row_key, before_data, after_data)
+                VALUES (%s,%s,%s,%s,%s,%s,%s)
+            """, [(logged_at, actor, table, action, key, _to_json(before), _to_json(after))
+                  for _, logged_at, actor, table, action, key, before, after in entries])
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        for conn in self.conns.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self.conns = {}
+
+
+# -----------------------
+# WRITER THREAD
+# -----------------------
+class _Writer(threading.Thread):
+    def __init__(self, pending=None):
+        super().__init__(name="audit-writer", daemon=True)
+        self.queue = pending if pending is not None else queue.Queue(maxsize=QUEUE_MAX)
+        self.sink = None
+        self.fallback = None
+        self.dropped = 0
+
+    def _persist(self, batch):
+        try:
+            if self.sink is None:
+                self.sink = _DatabaseSink() if AUDIT_SINK == "db" else _FileSink(AUDIT_SINK)
+            self.sink.write(batch)
+            return
+        except Exception as e:
+            # Never lose entries: spill the unwritten ones to local segments
+            batch = getattr(e, "entries", batch)
+            print(f"[Audit] {e}; writing {len(batch)} entries to {AUDIT_FALLBACK_DIR}", file=sys.stderr)
+        try:
+            if self.fallback is None:
+                self.fallback = _FileSink(AUDIT_FALLBACK_DIR)
+            self.fallback.write(batch)
+        except Exception as e:
+            # The writer must survive: record() and flush() wait on it
+            self.dropped += len(batch)
+            print(f"[Audit] fallback failed ({e}); dropped {len(batch)} entries "
+                  f"({self.dropped} since start)", file=sys.stderr)
+            if self.fallback is not None:
+                try:
+                    self.fallback.close()
+                except Exception:
+                    pass
+                self.fallback = None
+
+    def run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + FLUSH_INTERVAL
+            if batch and (stopping or len(batch) >= BATCH_SIZE or time.monotonic() >= deadline):
+                self._persist(batch)
+                batch = []
+                deadline = None
+        for sink in (self.sink, self.fallback):
+            if sink is not None:
+                try:
+                    sink.close()
+                except Exception:
+                    pass
+
+
+def _ensure_writer():
+    global _writer
+    writer = _writer
+    if writer is not None and writer.is_alive():
+        return writer
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            # A writer that died leaves its queue behind; the new one drains it
+            _writer = _Writer(_writer.queue if _writer is not None else None)
+            _writer.start()
+        return _writer
+
+
+def flush(timeout=10.0):
+    """Persist everything queued so far and stop the writer (it restarts on the next record())."""
+    global _writer
+    with _lock:
+        writer = _writer
+        _writer = None
+    if writer is None:
+        return
+    deadline = time.monotonic() + timeout
+    while writer.is_alive():
+        try:
+            writer.queue.put(_STOP, timeout=0.1)
+            break
+        except queue.Full:
+            if time.monotonic() >= deadline:
+                print("[Audit] writer did not drain in time; pending entries were not persisted",
+                      file=sys.stderr)
+                return
+    writer.join(max(0.0, deadline - time.monotonic()))
+
+
+atexit.register(flush)
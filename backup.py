@@ -0,0 +1,534 @@
+"""Parallel logical backup and restore of the HR tables.
+
+Backup opens one connection per worker and starts a consistent read
+snapshot on all of them while writes are briefly blocked, so every table is
+read as of the same moment. Each table is split into key ranges of about
+--chunk-rows rows (from MIN/MAX of its key and the row estimate); workers
+stream the ranges into gzip-compressed JSON Lines chunk files, one row per
+line. A manifest with the columns, row counts and SHA-256 checksum of every
+chunk is written last, so a directory without manifest.json is not a
+complete backup.
+
+Restore creates the schema if needed, turns foreign key (and on MySQL
+unique) checks off for its sessions, and loads the chunks in parallel with
+multi-row inserts, one transaction per chunk. Every chunk's checksum is
+verified before any table is emptied, so a damaged backup leaves the target
+untouched; a chunk that still fails while loading is rolled back and the
+restore stops, leaving the tables partially loaded. Once loaded,
+every foreign key is checked for orphan rows. On SQLite the inserts
+serialise on the single writer; decompression and parsing still run in
+parallel.
+
+Usage:
+    python backup.py backup backups/2026-10-19 --workers 8
+    python backup.py verify backups/2026-10-19
+    python backup.py restore backups/2026-10-19 --replace
+
+Exit codes: 0 success, 1 corrupt chunks (verify) or orphan rows (restore), 2 invalid
+arguments or backup, 3 database unavailable.
+"""
+import argparse
+import contextvars
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import db_config
+from db_config import create_connection, Error, _show_error, _show_warning
+from payroll_batch import Progress, partition_ranges
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_ROWS = 100000
+INSERT_BATCH = 1000
+COMPRESS_LEVEL = 6
+READ_BLOCK = 1 << 20
+
+# Restore order (parents first): table -> (integer split key, ORDER BY)
+TABLES = {
+    "departments": ("dept_id", "dept_id"),
+    "employees": ("emp_id", "emp_id"),
+    "attendance": ("att_id", "att_id"),
+    "payroll": ("payroll_id", "payroll_id"),
+    "attendance_bitmaps": ("emp_id", "emp_id, month"),
+}
+
+# Tables that may only be overwritten with --replace; departments are always
+# replaced, since create_tables() seeds the defaults into a new database.
+PROTECTED_TABLES = ("employees", "attendance", "payroll", "attendance_bitmaps")
+
+ORPHAN_CHECKS = {
+    "employees.dept_id": """
+        SELECT COUNT(*) FROM employees e LEFT JOIN departments d ON e.dept_id = d.dept_id
+        WHERE e.dept_id IS NOT NULL AND d.dept_id IS NULL""",
+    "attendance.emp_id": """
+        SELECT COUNT(*) FROM attendance a LEFT JOIN employees e ON a.emp_id = e.emp_id
+        WHERE e.emp_id IS NULL""",
+    "payroll.emp_id": """
+        SELECT COUNT(*) FROM payroll p LEFT JOIN employees e ON p.emp_id = e.emp_id
+        WHERE e.emp_id IS NULL""",
+    "attendance_bitmaps.emp_id": """
+        SELECT COUNT(*) FROM attendance_bitmaps b LEFT JOIN employees e ON b.emp_id = e.emp_id
+        WHERE e.emp_id IS NULL""",
+}
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_DATABASE = 3
+
+
+class ChecksumError(ValueError):
+    """A chunk file does not match its manifest entry."""
+
+
+# -----------------------
+# CHUNK FILES
+# -----------------------
+def _json_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, (datetime.date, Decimal, datetime.timedelta)):
+        return str(value)
+    raise TypeError(f"cannot back up {type(value).__name__} value")
+
+
+class _HashingFile:
+    """File wrapper that feeds every byte written or read through a SHA-256."""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.handle.write(data)
+
+    def read(self, size=-1):
+        data = self.handle.read(size)
+        self.digest.update(data)
+        self.size += len(data)
+        return data
+
+    def flush(self):
+        self.handle.flush()
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(backup_dir):
+    """The backup's manifest dict; ValueError if it is missing or not a backup."""
+    path = os.path.join(backup_dir, MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"{path}: {e}") from None
+    if manifest.get("format") != FORMAT_VERSION or not isinstance(manifest.get("tables"), dict):
+        raise ValueError(f"{path}: not a backup manifest")
+    return manifest
+
+
+def verify_backup(backup_dir):
+    """[(file, problem)] for chunk files that are missing or fail their checksum."""
+    manifest = load_manifest(backup_dir)
+    problems = []
+    for table in manifest["tables"].values():
+        for chunk in table["chunks"]:
+            path = os.path.join(backup_dir, chunk["file"])
+            try:
+                if file_checksum(path) != chunk["sha256"]:
+                    problems.append((chunk["file"], "checksum mismatch"))
+            except OSError as e:
+                problems.append((chunk["file"], str(e)))
+    return problems
+
+
+# -----------------------
+# BACKUP
+# -----------------------
+def _snapshot_connections(backend, count):
+    """`count` connections reading one consistent snapshot; returns (conns, consistent)."""
+    conns = []
+    blocker = create_connection()
+    if blocker is None:
+        return None, False
+    try:
+        try:
+            backend.block_writes(blocker)
+            consistent = True
+        except Error as e:
+            # Without the lock each table is still consistent, but tables may differ in age
+            _show_warning("Backup", f"Could not block writes ({e}); tables are read independently.")
+            consistent = False
+        try:
+            for _ in range(count):
+                conn = create_connection()
+                if conn is None:
+                    break
+                conns.append(conn)
+                conn.start_transaction(consistent_snapshot=True, readonly=True)
+                cursor = conn.cursor(buffered=True)
+                try:
+                    cursor.execute("SELECT COUNT(*) FROM departments")   # pin the read view now
+                    cursor.fetchall()
+                finally:
+                    cursor.close()
+        finally:
+            if consistent:
+                backend.unblock_writes(blocker)
+    finally:
+        blocker.close()
+    if len(conns) < count:
+        for conn in conns:
+            conn.close()
+        return None, False
+    return conns, consistent
+
+
+def _plan_tables(conn, backend, chunk_rows):
+    """{table: {"columns", "key", "order", "ranges", "estimate"}} read inside the snapshot."""
+    plan = {}
+    cursor = conn.cursor(buffered=True)
+    try:
+        for table, (key, order) in TABLES.items():
+            cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+            columns = [d[0] for d in cursor.description]
+            cursor.fetchall()
+            cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+            lo, hi = cursor.fetchone()
+            estimate = backend.estimate_rows(cursor, table)
+            parts = max(1, math.ceil(estimate / chunk_rows))
+            plan[table] = {"columns": columns, "key": key, "order": order, "estimate": estimate,
+                           "ranges": partition_ranges(lo, hi, parts)}
+    finally:
+        cursor.close()
+    return plan
+
+
+def _dump_chunk(idle, backup_dir, table, spec, number, after_id, last_id, progress):
+    name = f"{table}-{number:05d}.jsonl.gz"
+    conn = idle.get()
+    cursor = conn.cursor()      # unbuffered: rows stream from the server as they are written
+    rows = 0
+    try:
+        cursor.execute(f"SELECT {', '.join(spec['columns'])} FROM {table} "
+                       f"WHERE {spec['key']} > %s AND {spec['key']} <= %s ORDER BY {spec['order']}",
+                       (after_id, last_id))
+        with open(os.path.join(backup_dir, name), "wb") as handle:
+            hashing = _HashingFile(handle)
+            with gzip.GzipFile(filename="", mode="wb", fileobj=hashing,
+                               compresslevel=COMPRESS_LEVEL, mtime=0) as gz:
+                out = io.TextIOWrapper(gz, encoding="utf-8", newline="\n")
+                lines = []
+                for row in cursor:
+                    lines.append(json.dumps(row, default=_json_value, separators=(",", ":")))
+                    if len(lines) >= INSERT_BATCH:
+                        out.write("\n".join(lines) + "\n")
+                        progress.add(len(lines), 0)
+                        rows += len(lines)
+                        lines = []
+                if lines:
+                    out.write("\n".join(lines) + "\n")
+                    progress.add(len(lines), 0)
+                    rows += len(lines)
+                out.flush()
+                out.detach()
+            handle.flush()
+            os.fsync(handle.fileno())
+    finally:
+        cursor.close()
+        idle.put(conn)
+    return {"file": name, "after_id": after_id, "last_id": last_id, "rows": rows,
+            "bytes": hashing.size, "sha256": hashing.digest.hexdigest()}
+
+
+def backup(backup_dir, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS, stream=sys.stderr):
+    """Back up TABLES into `backup_dir` (created, must not hold a backup yet).
+
+    Returns {"rows", "bytes", "chunks", "consistent", "seconds", "rows_per_s", "path"},
+    or None if the database is unavailable or the backup failed.
+    """
+    if os.path.exists(os.path.join(backup_dir, MANIFEST)):
+        _show_error("Backup", f"{backup_dir} already holds a backup.")
+        return None
+    workers = workers or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+    backend = db_config.get_backend()
+    conns, consistent = _snapshot_connections(backend, workers)
+    if conns is None:
+        return None
+    idle = queue.Queue()
+    for conn in conns:
+        idle.put(conn)
+    started = datetime.datetime.now()
+    try:
+        plan = _plan_tables(conns[0], backend, chunk_rows)
+        os.makedirs(backup_dir, exist_ok=True)
+        progress = Progress("Backup", sum(spec["estimate"] for spec in plan.values()), stream)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Workers run in a copy of the caller's context so they use the same tenant database
+            futures = {table: [pool.submit(contextvars.copy_context().run, _dump_chunk, idle, backup_dir,
+                                           table, spec, n, a, b, progress)
+                               for n, (a, b) in enumerate(spec["ranges"], start=1)]
+                       for table, spec in plan.items()}
+            tables = {}
+            for table, spec in plan.items():
+                chunks = [future.result() for future in futures[table]]
+                tables[table] = {"columns": spec["columns"], "key": spec["key"],
+                                 "rows": sum(chunk["rows"] for chunk in chunks), "chunks": chunks}
+    except (*Error, OSError) as e:
+        _show_error("Backup", f"Backup to {backup_dir} failed: {e}")
+        return None
+    finally:
+        for conn in conns:
+            try:
+                conn.rollback()
+            except Error:
+                pass
+            conn.close()
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created": started.isoformat(" ", "seconds"),
+        "source": backend.identity,
+        "backend": backend.name,
+        "consistent": consistent,
+        "tables": tables,
+    }
+    tmp = os.path.join(backup_dir, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, os.path.join(backup_dir, MANIFEST))
+    if stream:
+        progress.report()
+    seconds = time.monotonic() - progress.started
+    rows = sum(t["rows"] for t in tables.values())
+    return {
+        "rows": rows,
+        "bytes": sum(c["bytes"] for t in tables.values() for c in t["chunks"]),
+        "chunks": sum(len(t["chunks"]) for t in tables.values()),
+        "consistent": consistent,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds > 0 else 0.0,
+        "path": backup_dir,
+    }
+
+
+# -----------------------
+# RESTORE
+# -----------------------
+def _load_chunk(idle, backup_dir, table, columns, chunk, progress):
+    conn = idle.get()
+    cursor = conn.cursor()
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    rows = 0
+    try:
+        with open(os.path.join(backup_dir, chunk["file"]), "rb") as handle:
+            hashing = _HashingFile(handle)
+            with gzip.GzipFile(filename="", mode="rb", fileobj=hashing) as gz:
+                batch = []
+                for line in io.TextIOWrapper(gz, encoding="utf-8"):
+                    batch.append(json.loads(line))
+                    if len(batch) >= INSERT_BATCH:
+                        cursor.executemany(sql, batch)
+                        rows += len(batch)
+                        batch = []
+                if batch:
+                    cursor.executemany(sql, batch)
+                    rows += len(batch)
+            hashing.read()      # anything after the gzip stream counts towards the checksum too
+        if hashing.digest.hexdigest() != chunk["sha256"] or rows != chunk["rows"]:
+            raise ChecksumError(f"{chunk['file']} does not match the manifest")
+        conn.commit()
+        progress.add(rows, 0)
+        return rows
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        idle.put(conn)
+
+
+def _count_orphans(conn):
+    cursor = conn.cursor(buffered=True)
+    try:
+        orphans = {}
+        for name, sql in ORPHAN_CHECKS.items():
+            cursor.execute(sql)
+            count = cursor.fetchone()[0]
+            if count:
+                orphans[name] = count
+        return orphans
+    finally:
+        cursor.close()
+
+
+def _has_rows(conn, table):
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+
+def restore(backup_dir, workers=None, replace=False, stream=sys.stderr):
+    """Load a backup into the configured database, creating the schema if needed.
+
+    Existing employees, attendance and payroll rows are only replaced with
+    replace=True. Returns {"rows", "tables", "orphans", "seconds", "rows_per_s"},
+    or None if the backup is invalid, the database is unavailable or a chunk failed.
+    The error message says whether the target was left untouched or partially loaded.
+    """
+    try:
+        manifest = load_manifest(backup_dir)
+    except ValueError as e:
+        _show_error("Restore", str(e))
+        return None
+    unknown = [table for table in manifest["tables"] if table not in TABLES]
+    if unknown:
+        _show_error("Restore", f"Backup holds unknown table(s): {', '.join(unknown)}")
+        return None
+    problems = verify_backup(backup_dir)
+    if problems:
+        listed = "; ".join(f"{name}: {problem}" for name, problem in problems[:5])
+        _show_error("Restore", f"{backup_dir} failed verification ({len(problems)} bad chunk(s): "
+                               f"{listed}). Nothing was restored; the database is unchanged.")
+        return None
+    db_config.initialize_database()
+    db_config.create_tables()
+
+    workers = workers or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+    backend = db_config.get_backend()
+    conns = []
+    emptied = False
+    try:
+        for _ in range(workers):
+            conn = create_connection()
+            if conn is None:
+                return None
+            conns.append(conn)
+            backend.begin_bulk_load(conn)
+        occupied = [t for t in PROTECTED_TABLES if t in manifest["tables"] and _has_rows(conns[0], t)]
+        if occupied and not replace:
+            _show_error("Restore", f"Target already has rows in {', '.join(occupied)}; "
+                                   f"use --replace to overwrite them.")
+            return None
+        for table in reversed(list(TABLES)):
+            if table in manifest["tables"]:
+                backend.truncate_table(conns[0], table)
+        conns[0].commit()
+        emptied = True
+
+        idle = queue.Queue()
+        for conn in conns:
+            idle.put(conn)
+        progress = Progress("Restore", sum(t["rows"] for t in manifest["tables"].values()), stream)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {table: [pool.submit(contextvars.copy_context().run, _load_chunk, idle, backup_dir,
+                                           table, manifest["tables"][table]["columns"], chunk, progress)
+                               for chunk in manifest["tables"][table]["chunks"]]
+                       for table in TABLES if table in manifest["tables"]}
+            loaded = {table: sum(future.result() for future in chunk_futures)
+                      for table, chunk_futures in futures.items()}
+        orphans = _count_orphans(conns[0])
+    except (*Error, OSError, ValueError) as e:        # ChecksumError is a ValueError
+        outcome = (f"The restored tables ({', '.join(t for t in TABLES if t in manifest['tables'])}) "
+                   f"were emptied and are only partially loaded; run the restore again with "
+                   f"--replace once the cause is fixed." if emptied else "The database was not changed.")
+        _show_error("Restore", f"Restore from {backup_dir} failed: {e}. {outcome}")
+        return None
+    finally:
+        for conn in conns:
+            conn.close()
+
+    if stream:
+        progress.report()
+    seconds = time.monotonic() - progress.started
+    rows = sum(loaded.values())
+    return {
+        "rows": rows,
+        "tables": loaded,
+        "orphans": orphans,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds > 0 else 0.0,
+    }
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel backup and restore of the HR tables.")
+    parser.add_argument("command", choices=("backup", "restore", "verify"))
+    parser.add_argument("path", help="Backup directory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Parallel connections (default: up to {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Approximate rows per chunk file (backup)")
+    parser.add_argument("--replace", action="store_true",
+                        help="Overwrite existing employees, attendance and payroll (restore)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args(argv)
+
+    if (args.workers is not None and args.workers < 1) or args.chunk_rows < 1:
+        print("--workers and --chunk-rows must be positive.", file=sys.stderr)
+        return EXIT_USAGE
+    stream = None if args.quiet else sys.stderr
+
+    if args.command == "verify":
+        try:
+            problems = verify_backup(args.path)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+        for name, problem in problems:
+            print(f"{name}: {problem}", file=sys.stderr)
+        print(f"{args.path}: {'OK' if not problems else f'{len(problems)} bad chunk(s)'}")
+        return EXIT_FAILED if problems else EXIT_OK
+
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    if args.command == "backup":
+        summary = backup(args.path, args.workers, args.chunk_rows, stream)
+        if summary is None:
+            return EXIT_NO_DATABASE
+        print(f"{summary['rows']} row(s) in {summary['chunks']} chunk(s) written to {summary['path']} "
+              f"({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']:.1f}s "
+              f"({summary['rows_per_s']:.0f} rows/s)"
+              + ("" if summary["consistent"] else "; tables were not read from one snapshot"))
+        return EXIT_OK
+
+    summary = restore(args.path, args.workers, args.replace, stream)
+    if summary is None:
+        return EXIT_NO_DATABASE
+    print(f"{summary['rows']} row(s) restored from {args.path} in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_s']:.0f} rows/s): "
+          + ", ".join(f"{table} {rows}" for table, rows in summary["tables"].items()))
+    for name, count in summary["orphans"].items():
+        print(f"Warning: {count} row(s) with a dangling {name}", file=sys.stderr)
+    return EXIT_FAILED if summary["orphans"] else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
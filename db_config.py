@@ -1,139 +1,208 @@
-import mysql.connector
-from mysql.connector import Error
-from tkinter import messagebox
 import datetime
+import os
 import re
 import sys
 from decimal import Decimal
+from records import EmployeeRecord, AttendanceRecord, build_records
+import audit_log
+import storage
+from storage import Error
 
 # -----------------------
 # DATABASE CONFIG
 # -----------------------
+# "mysql" for a MySQL server, "sqlite" for an embedded database file at DB_SQLITE_PATH
+DB_BACKEND = os.environ.get("HR_DB_BACKEND", "mysql")
+DB_SQLITE_PATH = os.path.join(os.path.expanduser("~"), ".hr_system", "employee_management.db")
+
 DB_HOST = "localhost"
 DB_USER = "root"
 DB_PASS = "6667"
 DB_NAME = "employee_management"
 
+# 0 opens a fresh connection per call; >0 serves connections from a pool (see configure_pool)
+DB_POOL_SIZE = 0
+DB_POOL_TIMEOUT = 10.0
+
 EMAIL_RE = re.compile(r"^[^@]+@[^@]+\.[^@]+$")
 
 
 # -----------------------
 # Helper for error display
 # -----------------------
+_message_handler = None
+
+
+def _messagebox():
+    """Import tkinter only when a dialog is shown, so headless tools never load Tk."""
+    from tkinter import messagebox
+    return messagebox
+
+
+def set_message_handler(handler):
+    """Route messages to handler(kind, title, msg) instead of dialogs; kind is error/warning/info.
+
+    Pass None to restore the default dialogs.
+    """
+    global _message_handler
+    _message_handler = handler
+
+
 def _show_error(title, msg):
     """Show messagebox if GUI is active, otherwise print to stderr."""
+    if _message_handler is not None:
+        _message_handler("error", title, msg)
+        return
     try:
-        messagebox.showerror(title, msg)
+        _messagebox().showerror(title, msg)
     except Exception:
         print(f"[{title}] {msg}", file=sys.stderr)
 
 
+def _show_warning(title, msg):
+    if _message_handler is not None:
+        _message_handler("warning", title, msg)
+        return
+    try:
+        _messagebox().showwarning(title, msg)
+    except Exception:
+        print(f"[{title}] {msg}", file=sys.stderr)
+
+
+def _show_info(title, msg):
+    if _message_handler is not None:
+        _message_handler("info", title, msg)
+        return
+    try:
+        _messagebox().showinfo(title, msg)
+    except Exception:
+        pass
+
+
+# -----------------------
+# CHANGE EVENTS
+# -----------------------
+_change_listeners = []
+
+
+def add_change_listener(listener):
+    """Call listener(table, action, key, before, after) after each committed write in this process.
+
+    Listeners run on the writing thread, after the commit and the audit entry; keep them short.
+    """
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def remove_change_listener(listener):
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+
+def _record_change(table, action, key, before=None, after=None):
+    """Audit a committed write and notify change listeners."""
+    audit_log.record(table, action, key, before=before, after=after)
+    for listener in list(_change_listeners):
+        try:
+            listener(table, action, key, before, after)
+        except Exception as e:
+            print(f"[Change listener] {e}", file=sys.stderr)
+
+
 # -----------------------
 # CONNECTION
 # -----------------------
+_backend = None
+_backend_resolver = None
+
+
+def set_backend_resolver(resolver):
+    """Route connections per context: resolver() returns a backend, or None for the configured one.
+
+    Used by tenants.TenantRouter; pass None to remove it.
+    """
+    global _backend_resolver
+    _backend_resolver = resolver
+
+
+def get_backend():
+    """The storage backend for the current context (see storage.py), created on first use."""
+    global _backend
+    if _backend_resolver is not None:
+        backend = _backend_resolver()
+        if backend is not None:
+            return backend
+    if _backend is None:
+        if DB_BACKEND == "sqlite":
+            _backend = storage.SQLiteBackend(DB_SQLITE_PATH)
+        elif DB_BACKEND == "mysql":
+            _backend = storage.MySQLBackend(DB_HOST, DB_USER, DB_PASS, DB_NAME,
+                                            DB_POOL_SIZE, DB_POOL_TIMEOUT)
+        else:
+            raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+    return _backend
+
+
+def configure_pool(size=None):
+    """(Re)create the shared connection pool; size 0 disables pooling."""
+    global DB_POOL_SIZE
+    if size is not None:
+        DB_POOL_SIZE = size
+    return get_backend().configure_pool(DB_POOL_SIZE)
+
+
 def create_connection():
-    """Create and return a new MySQL connection or None if it fails."""
+    """Create and return a new database connection or None if it fails.
+
+    With pooling enabled, close() on the returned connection hands it back to the pool.
+    """
     try:
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME,
-            autocommit=False
-        )
-        return conn
-    except Error as e:
+        return get_backend().connect()
+    except (*Error, RuntimeError) as e:
         _show_error("DB Connection Error", str(e))
         return None
 
 
+# -----------------------
+# QUERY REGISTRY
+# -----------------------
+# Hot read queries by name, with representative parameters, so query_plans.py can
+# EXPLAIN them against a seeded database. Sample values fall inside its seeded data.
+QUERIES = {}
+SAMPLE_DAY = datetime.date(2026, 1, 15)
+SAMPLE_PERIOD = SAMPLE_DAY.replace(day=1)
+
+
+def register_query(name, sql, sample_params=()):
+    """Record `sql` under `name` and return it unchanged (use at module level)."""
+    QUERIES[name] = (sql, tuple(sample_params))
+    return sql
+
+
 # -----------------------
 # INITIALIZE DATABASE & TABLES
 # -----------------------
 def initialize_database():
     """Create the database if it doesn't exist."""
-    conn = None
-    cursor = None
     try:
-        conn = mysql.connector.connect(host=DB_HOST, user=DB_USER, password=DB_PASS)
-        cursor = conn.cursor(buffered=True)   # ✅ FIXED
-        cursor.execute(
-            f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
-        )
-        conn.commit()
-    except Error as e:
+        get_backend().initialize_database()
+    except (*Error, RuntimeError, OSError) as e:
         _show_error("DB Error", f"Error creating database: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 def create_tables():
-    """Create all required tables and default departments."""
+    """Bring the schema up to date and create default departments.
+
+    MySQL applies pending migrations (migrations.py); SQLite creates its schema directly.
+    """
     conn = create_connection()
     if conn is None:
         return
     cursor = None
     try:
+        get_backend().create_schema(conn)
         cursor = conn.cursor(buffered=True)
 
-        # Departments
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS departments (
-            dept_id INT PRIMARY KEY AUTO_INCREMENT,
-            dept_name VARCHAR(100) NOT NULL UNIQUE
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """)
-
-        # Employees
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS employees (
-            emp_id INT PRIMARY KEY AUTO_INCREMENT,
-            first_name VARCHAR(100) NOT NULL,
-            last_name VARCHAR(100),
-            email VARCHAR(150) UNIQUE,
-            phone VARCHAR(20),
-            hire_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-            job_title VARCHAR(100),
-            dept_id INT,
-            base_salary DECIMAL(12,2) DEFAULT 0,
-            status ENUM('ACTIVE','INACTIVE','TERMINATED') DEFAULT 'ACTIVE',
-            FOREIGN KEY (dept_id) REFERENCES departments(dept_id) ON DELETE SET NULL
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """)
-
-        # Attendance
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS attendance (
-            att_id INT PRIMARY KEY AUTO_INCREMENT,
-            emp_id INT NOT NULL,
-            att_date DATE NOT NULL,
-            in_time DATETIME,
-            out_time DATETIME,
-            status ENUM('PRESENT','ABSENT','LEAVE') DEFAULT 'PRESENT',
-            FOREIGN KEY (emp_id) REFERENCES employees(emp_id) ON DELETE CASCADE,
-            UNIQUE(emp_id, att_date)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """)
-
-        # Payroll
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS payroll (
-            payroll_id INT PRIMARY KEY AUTO_INCREMENT,
-            emp_id INT NOT NULL,
-            `year_month` VARCHAR(7) NOT NULL,
-            gross_pay DECIMAL(12,2),
-            allowances DECIMAL(12,2),
-            deductions DECIMAL(12,2),
-            net_pay DECIMAL(12,2),
-            generated_on DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(emp_id, `year_month`),
-            FOREIGN KEY (emp_id) REFERENCES employees(emp_id) ON DELETE CASCADE
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        """)
-
         # Insert default departments
         for dept in ["HR", "IT", "Finance", "Sales", "Marketing", "Admin"]:
             cursor.execute(
@@ -143,7 +212,7 @@ def create_tables():
             )
 
         conn.commit()
-    except Error as e:
+    except (*Error, RuntimeError) as e:
         try:
             conn.rollback()
         except Exception:
@@ -207,6 +276,20 @@ def _resolve_dept_id(conn, dept):
         cur.close()
 
 
+EMPLOYEE_AUDIT_COLUMNS = ("first_name", "last_name", "email", "phone", "job_title",
+                          "dept_id", "base_salary", "status")
+
+
+def _employee_image(cursor, emp_id):
+    """Current row of an employee as a dict for the audit trail, locked for this transaction."""
+    cursor.execute(
+        "SELECT " + ", ".join(EMPLOYEE_AUDIT_COLUMNS) + " FROM employees WHERE emp_id=%s FOR UPDATE",
+        (emp_id,)
+    )
+    row = cursor.fetchone()
+    return dict(zip(EMPLOYEE_AUDIT_COLUMNS, row)) if row else None
+
+
 # -----------------------
 # EMPLOYEE FUNCTIONS
 # -----------------------
@@ -242,6 +325,11 @@ def add_employee_db(first, last, email, phone, job, dept, salary):
             VALUES (%s,%s,%s,%s,%s,%s,%s)
         """, (first, last or None, email or None, phone or None, job or None, dept_id, salary_decimal))
         conn.commit()
+        _record_change("employees", "INSERT", cursor.lastrowid, after={
+            "first_name": first, "last_name": last or None, "email": email or None,
+            "phone": phone or None, "job_title": job or None, "dept_id": dept_id,
+            "base_salary": salary_decimal, "status": "ACTIVE",
+        })
         return True
     except Error as e:
         try:
@@ -255,21 +343,24 @@ def add_employee_db(first, last, email, phone, job, dept, salary):
         conn.close()
 
 
+EMPLOYEE_LIST_QUERY = register_query("fetch_employees_db", """
+    SELECT e.emp_id, e.first_name, e.last_name, e.email, e.phone,
+           e.job_title, COALESCE(d.dept_name, '') AS dept_name, e.base_salary
+    FROM employees e
+    LEFT JOIN departments d ON e.dept_id = d.dept_id
+    ORDER BY e.emp_id
+""")
+
+
 def fetch_employees_db():
+    """Return all employees as slotted EmployeeRecord rows."""
     conn = create_connection()
     if conn is None:
         return []
-    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor = conn.cursor(buffered=True)
     try:
-        cursor.execute("""
-            SELECT e.emp_id, e.first_name, e.last_name, e.email, e.phone,
-                   e.job_title, COALESCE(d.dept_name, '') AS dept_name, e.base_salary
-            FROM employees e
-            LEFT JOIN departments d ON e.dept_id = d.dept_id
-            ORDER BY e.emp_id
-        """)
-        rows = cursor.fetchall()
-        return rows
+        cursor.execute(EMPLOYEE_LIST_QUERY)
+        return build_records(EmployeeRecord, cursor.fetchall())
     except Error as e:
         _show_error("Error", str(e))
         return []
@@ -309,14 +400,21 @@ def update_employee_db(emp_id, first, last, email, phone, job, dept, salary):
     cursor = conn.cursor(buffered=True)
     try:
         dept_id = _resolve_dept_id(conn, dept)
+        before = _employee_image(cursor, emp_id_int)
         cursor.execute("""
             UPDATE employees
             SET first_name=%s, last_name=%s, email=%s, phone=%s,
                 job_title=%s, dept_id=%s, base_salary=%s
             WHERE emp_id=%s
         """, (first, last or None, email or None, phone or None, job or None, dept_id, salary_decimal, emp_id_int))
+        updated = cursor.rowcount > 0
         conn.commit()
-        return cursor.rowcount > 0
+        if updated:
+            after = dict(before or {}, first_name=first, last_name=last or None, email=email or None,
+                         phone=phone or None, job_title=job or None, dept_id=dept_id,
+                         base_salary=salary_decimal)
+            _record_change("employees", "UPDATE", emp_id_int, before=before, after=after)
+        return updated
     except Error as e:
         try:
             conn.rollback()
@@ -341,9 +439,15 @@ def delete_employee_db(emp_id):
         return False
     cursor = conn.cursor(buffered=True)
     try:
+        before = _employee_image(cursor, emp_id_int)
         cursor.execute("DELETE FROM employees WHERE emp_id=%s", (emp_id_int,))
+        deleted = cursor.rowcount > 0
+        if deleted:
+            cursor.execute("INSERT INTO directory_tombstones (emp_id) VALUES (%s)", (emp_id_int,))
         conn.commit()
-        return cursor.rowcount > 0
+        if deleted:
+            _record_change("employees", "DELETE", emp_id_int, before=before)
+        return deleted
     except Error as e:
         try:
             conn.rollback()
@@ -356,10 +460,206 @@ def delete_employee_db(emp_id):
         conn.close()
 
 
+# -----------------------
+# BULK EMPLOYEE UPDATES
+# -----------------------
+BULK_CHUNK_SIZE = 500
+
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def parse_emp_id_list(text):
+    """Parse '1, 4, 10-20' into a sorted list of unique employee IDs. Raises ValueError."""
+    ids = set()
+    for part in re.split(r"[,\s]+", (text or "").strip()):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            lo, hi = int(lo), int(hi)
+            if lo > hi:
+                raise ValueError(f"Invalid range: {part}")
+            ids.update(range(lo, hi + 1))
+        else:
+            ids.add(int(part))
+    return sorted(ids)
+
+
+def bulk_update_employees(emp_ids=None, dept=None, raise_pct=None, new_dept=None,
+                          status="ACTIVE", dry_run=False, chunk_size=BULK_CHUNK_SIZE):
+    """Apply a salary raise and/or department move to many employees in one transaction.
+
+    Targets are the given emp_ids, the members of `dept`, or the intersection of both.
+    Updates are sent as chunked multi-row UPDATE statements and committed once.
+    Returns a summary dict, or None on failure. With dry_run=True nothing is written
+    and the summary's "preview" holds (emp_id, old_salary, new_salary, old_dept_id, new_dept_id).
+    The summary's "skipped" lists given emp_ids that were not changed because they do not
+    exist, are not in `dept`, or do not have `status`.
+    """
+    if emp_ids is None and (dept is None or dept == ""):
+        _show_error("Validation Error", "Select employees by ID list or department.")
+        return None
+    if raise_pct in (None, "") and (new_dept is None or new_dept == ""):
+        _show_error("Validation Error", "Nothing to change: give a raise % or a new department.")
+        return None
+
+    factor = None
+    if raise_pct not in (None, ""):
+        try:
+            pct = Decimal(str(raise_pct))
+            if pct <= Decimal("-100"):
+                raise ValueError
+        except Exception:
+            _show_error("Validation Error", "Invalid raise percentage.")
+            return None
+        factor = Decimal("1") + pct / Decimal("100")
+
+    try:
+        ids = sorted({int(e) for e in emp_ids}) if emp_ids is not None else None
+    except Exception:
+        _show_error("Validation Error", "Invalid employee ID in list.")
+        return None
+
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        dept_id = None
+        if dept not in (None, ""):
+            dept_id = _resolve_dept_id(conn, dept)
+            if dept_id is None:
+                _show_error("Validation Error", f"Department '{dept}' not found.")
+                return None
+        target_dept_id = None
+        if new_dept not in (None, ""):
+            target_dept_id = _resolve_dept_id(conn, new_dept)
+            if target_dept_id is None:
+                _show_error("Validation Error", f"Department '{new_dept}' not found.")
+                return None
+
+        # Lock the target rows so the applied change matches what was computed
+        lock = "" if dry_run else " FOR UPDATE"
+        clauses = []
+        params = []
+        if dept_id is not None:
+            clauses.append("dept_id = %s")
+            params.append(dept_id)
+        if status:
+            clauses.append("status = %s")
+            params.append(status)
+
+        targets = []
+        if ids is None:
+            where = " WHERE " + " AND ".join(clauses) if clauses else ""
+            cursor.execute(
+                "SELECT emp_id, base_salary, dept_id FROM employees" + where + " ORDER BY emp_id" + lock,
+                tuple(params)
+            )
+            targets = cursor.fetchall()
+        else:
+            for chunk in _chunks(ids, chunk_size):
+                chunk_clauses = ["emp_id IN (" + ",".join(["%s"] * len(chunk)) + ")"] + clauses
+                cursor.execute(
+                    "SELECT emp_id, base_salary, dept_id FROM employees WHERE "
+                    + " AND ".join(chunk_clauses) + " ORDER BY emp_id" + lock,
+                    tuple(chunk) + tuple(params)
+                )
+                targets.extend(cursor.fetchall())
+
+        preview = []
+        total_before = Decimal("0.00")
+        total_after = Decimal("0.00")
+        for emp_id, salary, old_dept_id in targets:
+            old_salary = Decimal(str(salary or 0))
+            new_salary = old_salary
+            if factor is not None:
+                new_salary = (old_salary * factor).quantize(Decimal("0.01"))
+            to_dept = target_dept_id if target_dept_id is not None else old_dept_id
+            total_before += old_salary
+            total_after += new_salary
+            preview.append((emp_id, old_salary, new_salary, old_dept_id, to_dept))
+
+        matched_ids = {row[0] for row in preview}
+        summary = {
+            "matched": len(preview),
+            "updated": 0,
+            "skipped": [emp_id for emp_id in ids or () if emp_id not in matched_ids],
+            "salary_before": total_before,
+            "salary_after": total_after,
+            "salary_delta": total_after - total_before,
+            "dry_run": dry_run,
+            "preview": preview,
+        }
+        if dry_run or not preview:
+            conn.rollback()
+            return summary
+
+        updated = 0
+        for chunk in _chunks(preview, chunk_size):
+            sets = []
+            set_params = []
+            if factor is not None:
+                sets.append("base_salary = CASE emp_id " + " ".join(["WHEN %s THEN %s"] * len(chunk)) + " END")
+                for emp_id, _old, new_salary, _od, _nd in chunk:
+                    set_params.extend((emp_id, new_salary))
+            if target_dept_id is not None:
+                sets.append("dept_id = %s")
+                set_params.append(target_dept_id)
+            chunk_ids = [row[0] for row in chunk]
+            cursor.execute(
+                "UPDATE employees SET " + ", ".join(sets)
+                + " WHERE emp_id IN (" + ",".join(["%s"] * len(chunk_ids)) + ")",
+                tuple(set_params) + tuple(chunk_ids)
+            )
+            updated += cursor.rowcount
+        conn.commit()
+        for emp_id, old_salary, new_salary, old_dept_id, to_dept in preview:
+            _record_change("employees", "BULK_UPDATE", emp_id,
+                           before={"base_salary": old_salary, "dept_id": old_dept_id},
+                           after={"base_salary": new_salary, "dept_id": to_dept})
+        summary["updated"] = updated
+        return summary
+    except Error as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        _show_error("DB Error", f"Bulk update failed, no changes were applied: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
 # -----------------------
 # ATTENDANCE FUNCTIONS
 # -----------------------
-def mark_in_time(emp_id):
+def _sync_attendance_bitmap(cursor, emp_id, att_date, status):
+    """Set the day's bit for `status` in attendance_bitmaps and clear it for the other statuses.
+
+    Runs in the caller's transaction so the bitmap commits together with the attendance row.
+    """
+    bit = 1 << (att_date.day - 1)
+    keep = ~bit & 0xFFFFFFFF
+    bits = {s: (bit if s == status else 0) for s in ("PRESENT", "ABSENT", "LEAVE")}
+    cursor.execute("""
+        INSERT INTO attendance_bitmaps (emp_id, month, present_bits, absent_bits, leave_bits)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            present_bits = (present_bits & %s) | VALUES(present_bits),
+            absent_bits = (absent_bits & %s) | VALUES(absent_bits),
+            leave_bits = (leave_bits & %s) | VALUES(leave_bits)
+    """, (emp_id, att_date.replace(day=1), bits["PRESENT"], bits["ABSENT"], bits["LEAVE"], keep, keep, keep))
+
+
+def mark_in_time(emp_id, known_employee=False):
+    """Record today's in-time. known_employee=True skips the employee lookup
+    (the caller already knows the id, e.g. from name_index); the foreign key still guards it.
+    """
     if not emp_id or not str(emp_id).isdigit():
         _show_error("Validation Error", "Employee ID must be a number.")
         return False
@@ -373,23 +673,24 @@ def mark_in_time(emp_id):
     try:
         cursor.execute("SELECT att_id FROM attendance WHERE emp_id=%s AND att_date=%s", (emp_id, today))
         if cursor.fetchone():
-            _show_error("Warning", "Attendance entry for today already exists. Use Out-Time or Mark.")
+            _show_warning("Warning", "Attendance entry for today already exists. Use Out-Time or Mark.")
             return False
 
-        cursor.execute("SELECT emp_id FROM employees WHERE emp_id=%s", (emp_id,))
-        if not cursor.fetchone():
-            _show_error("Error", f"Employee ID {emp_id} not found.")
-            return False
+        if not known_employee:
+            cursor.execute("SELECT emp_id FROM employees WHERE emp_id=%s", (emp_id,))
+            if not cursor.fetchone():
+                _show_error("Error", f"Employee ID {emp_id} not found.")
+                return False
 
         cursor.execute("""
             INSERT INTO attendance (emp_id, att_date, in_time, status)
             VALUES (%s, %s, %s, 'PRESENT')
         """, (emp_id, today, now))
+        _sync_attendance_bitmap(cursor, emp_id, today, "PRESENT")
         conn.commit()
-        try:
-            messagebox.showinfo("Success", f"In-Time marked at {now.strftime('%H:%M:%S')}")
-        except Exception:
-            pass
+        _record_change("attendance", "IN_TIME", f"{emp_id}:{today}",
+                       after={"in_time": now, "status": "PRESENT"})
+        _show_info("Success", f"In-Time marked at {now.strftime('%H:%M:%S')}")
         return True
     except Error as e:
         try:
@@ -418,18 +719,76 @@ def mark_out_time(emp_id):
         cursor.execute("SELECT att_id, out_time FROM attendance WHERE emp_id=%s AND att_date=%s", (emp_id, today))
         record = cursor.fetchone()
         if not record:
-            _show_error("Warning", "No In-Time found for today. Cannot mark Out-Time.")
+            _show_warning("Warning", "No In-Time found for today. Cannot mark Out-Time.")
             return False
         if record["out_time"]:
-            _show_error("Warning", "Out-Time already marked for today.")
+            _show_warning("Warning", "Out-Time already marked for today.")
             return False
 
         cursor.execute("UPDATE attendance SET out_time=%s WHERE emp_id=%s AND att_date=%s", (now, emp_id, today))
         conn.commit()
+        _record_change("attendance", "OUT_TIME", f"{emp_id}:{today}",
+                       before={"out_time": None}, after={"out_time": now})
+        _show_info("Success", f"Out-Time marked at {now.strftime('%H:%M:%S')}")
+        return True
+    except Error as e:
         try:
-            messagebox.showinfo("Success", f"Out-Time marked at {now.strftime('%H:%M:%S')}")
+            conn.rollback()
         except Exception:
             pass
+        _show_error("Error", str(e))
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def mark_attendance_status(emp_id, att_date, status, known_employee=False):
+    """Insert or overwrite the PRESENT/ABSENT/LEAVE status of one attendance day.
+
+    known_employee=True skips the employee lookup, as for mark_in_time.
+    """
+    status = (status or "").strip().upper()
+    if status not in ("PRESENT", "ABSENT", "LEAVE"):
+        _show_error("Validation Error", "Status must be PRESENT, ABSENT or LEAVE.")
+        return False
+    try:
+        emp_id_int = int(emp_id)
+    except Exception:
+        _show_error("Validation Error", "Employee ID must be integer.")
+        return False
+    if isinstance(att_date, str):
+        try:
+            att_date = datetime.datetime.strptime(att_date, "%Y-%m-%d").date()
+        except ValueError:
+            _show_error("Validation Error", "Date must be in YYYY-MM-DD format.")
+            return False
+
+    conn = create_connection()
+    if conn is None:
+        return False
+    cursor = conn.cursor(buffered=True)
+    try:
+        if not known_employee:
+            cursor.execute("SELECT emp_id FROM employees WHERE emp_id=%s", (emp_id_int,))
+            if not cursor.fetchone():
+                _show_error("Error", "Employee not found.")
+                return False
+
+        cursor.execute(
+            "SELECT status FROM attendance WHERE emp_id=%s AND att_date=%s FOR UPDATE",
+            (emp_id_int, att_date)
+        )
+        row = cursor.fetchone()
+        cursor.execute("""
+            INSERT INTO attendance (emp_id, att_date, status)
+            VALUES (%s,%s,%s)
+            ON DUPLICATE KEY UPDATE status=VALUES(status)
+        """, (emp_id_int, att_date, status))
+        _sync_attendance_bitmap(cursor, emp_id_int, att_date, status)
+        conn.commit()
+        _record_change("attendance", "STATUS", f"{emp_id_int}:{att_date}",
+                       before={"status": row[0]} if row else None, after={"status": status})
         return True
     except Error as e:
         try:
@@ -443,9 +802,65 @@ def mark_out_time(emp_id):
         conn.close()
 
 
+ATTENDANCE_LIST_QUERY = register_query(
+    "fetch_attendance_db",
+    "SELECT att_id, emp_id, att_date, in_time, out_time, status "
+    "FROM attendance ORDER BY att_date DESC, emp_id"
+)
+register_query("attendance day lookup",
+               "SELECT att_id FROM attendance WHERE emp_id=%s AND att_date=%s", (1, SAMPLE_DAY))
+
+
+def fetch_attendance_db():
+    """Return the attendance history as slotted AttendanceRecord rows, newest first."""
+    conn = create_connection()
+    if conn is None:
+        return []
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute(ATTENDANCE_LIST_QUERY)
+        return build_records(AttendanceRecord, cursor.fetchall())
+    except Error as e:
+        _show_error("DB Error", str(e))
+        return []
+    finally:
+        cursor.close()
+        conn.close()
+
+
 # -----------------------
 # PAYROLL FUNCTIONS
 # -----------------------
+ALLOWANCE_RATE = Decimal("0.10")
+DEDUCTION_RATE = Decimal("0.05")
+
+
+def calculate_payroll(base_salary, allowance_rate=ALLOWANCE_RATE, deduction_rate=DEDUCTION_RATE):
+    """Return (gross, allowances, deductions, net) for a monthly base salary."""
+    base = Decimal(str(base_salary or 0))
+    allowances = (base * allowance_rate).quantize(Decimal('0.01'))
+    deductions = (base * deduction_rate).quantize(Decimal('0.01'))
+    gross = (base + allowances).quantize(Decimal('0.01'))
+    net = (gross - deductions).quantize(Decimal('0.01'))
+    return gross, allowances, deductions, net
+
+
+def valid_year_month(year_month):
+    """True for a 'YYYY-MM' string with a real month."""
+    if not year_month or len(year_month) != 7 or year_month[4] != "-":
+        return False
+    try:
+        datetime.date(int(year_month[:4]), int(year_month[5:]), 1)
+    except ValueError:
+        return False
+    return True
+
+
+def period_date(year_month):
+    """'YYYY-MM' -> first day of that month, the value stored in pay_period columns."""
+    return datetime.date(int(year_month[:4]), int(year_month[5:7]), 1)
+
+
 def upsert_payroll_for_employee(emp_id, year_month, base_salary):
     try:
         emp_id_int = int(emp_id)
@@ -453,7 +868,7 @@ def upsert_payroll_for_employee(emp_id, year_month, base_salary):
         _show_error("Validation Error", "Employee ID must be a number.")
         return False
 
-    if not year_month or len(year_month) != 7 or year_month[4] != "-":
+    if not valid_year_month(year_month):
         _show_error("Validation Error", "year_month must be in YYYY-MM format.")
         return False
 
@@ -465,10 +880,7 @@ def upsert_payroll_for_employee(emp_id, year_month, base_salary):
         _show_error("Validation Error", "Invalid base salary for calculation.")
         return False
 
-    allowances = (base_salary_dec * Decimal("0.10")).quantize(Decimal('0.01'))
-    deductions = (base_salary_dec * Decimal("0.05")).quantize(Decimal('0.01'))
-    gross = (base_salary_dec + allowances).quantize(Decimal('0.01'))
-    net = (gross - deductions).quantize(Decimal('0.01'))
+    gross, allowances, deductions, net = calculate_payroll(base_salary_dec)
 
     conn = create_connection()
     if conn is None:
@@ -477,7 +889,7 @@ def upsert_payroll_for_employee(emp_id, year_month, base_salary):
 
     try:
         cursor.execute("""
-            INSERT INTO payroll (emp_id, `year_month`, gross_pay, allowances, deductions, net_pay)
+            INSERT INTO payroll (emp_id, pay_period, gross_pay, allowances, deductions, net_pay)
             VALUES (%s,%s,%s,%s,%s,%s)
             ON DUPLICATE KEY UPDATE
                 gross_pay=VALUES(gross_pay),
@@ -485,8 +897,12 @@ def upsert_payroll_for_employee(emp_id, year_month, base_salary):
                 deductions=VALUES(deductions),
                 net_pay=VALUES(net_pay),
                 generated_on=CURRENT_TIMESTAMP
-        """, (emp_id_int, year_month, gross, allowances, deductions, net))
+        """, (emp_id_int, period_date(year_month), gross, allowances, deductions, net))
         conn.commit()
+        _record_change("payroll", "UPSERT", f"{emp_id_int}:{year_month}", after={
+            "base_salary": base_salary_dec, "gross_pay": gross, "allowances": allowances,
+            "deductions": deductions, "net_pay": net,
+        })
         return True
     except Error as e:
         try:
@@ -500,56 +916,68 @@ def upsert_payroll_for_employee(emp_id, year_month, base_salary):
         conn.close()
 
 
-def generate_payroll_db(year_month):
-    if not year_month or len(year_month) != 7 or year_month[4] != "-":
-        _show_error("Validation Error", "year_month must be in YYYY-MM format.")
-        return False
+def generate_payroll_db(year_month, incremental=False):
+    """Generate the month's payroll for all active employees through the batch engine.
 
-    conn = create_connection()
-    if conn is None:
-        return False
-    cursor = conn.cursor(buffered=True)   # ✅ FIXED
-    try:
-        cursor.execute("SELECT emp_id, base_salary FROM employees WHERE status='ACTIVE'")
-        records = cursor.fetchall()
-    except Error as e:
-        _show_error("Error", str(e))
+    With incremental=True only employees whose pay differs from the stored rows are rewritten.
+    Returns the run summary dict (see payroll_batch.run_payroll), or False on failure.
+    """
+    if not valid_year_month(year_month):
+        _show_error("Validation Error", "year_month must be in YYYY-MM format.")
         return False
-    finally:
-        try:
-            cursor.close()
-            conn.close()
-        except Exception:
-            pass
 
-    success = True
-    for emp_id, base_salary in records:
-        if not upsert_payroll_for_employee(emp_id, year_month, base_salary):
-            success = False
+    from payroll_batch import run_payroll
+    return report_payroll_run(year_month, run_payroll(year_month, stream=None, incremental=incremental))
 
-    try:
-        if success:
-            messagebox.showinfo("Success", "Payroll generated successfully for all active employees.")
-        else:
-            messagebox.showwarning("Partial Success", "Payroll generation completed, but some employees may have failed.")
-    except Exception:
-        pass
-
-    return success
 
+def report_payroll_run(year_month, summary):
+    """Show the outcome of a payroll_batch.run_payroll summary; returns it, or False on failure."""
+    if summary is None:
+        return False
 
-def fetch_payroll_db(emp_id=None, year_month=None):
+    counts = (f"{summary['inserted']} new, {summary['changed']} updated, "
+              f"{summary['unchanged']} unchanged")
+    resumed = " (resumed)" if summary["resumed"] else ""
+    if not summary["failed"]:
+        _show_info("Success", f"Payroll job {summary['job_id']}{resumed} for {year_month}: {counts}.")
+        return summary
+    failed_ids = ", ".join(str(emp_id) for emp_id, _msg in summary["failures"][:10])
+    more = "..." if summary["failed"] > 10 else ""
+    _show_warning("Partial Success",
+                  f"Payroll job {summary['job_id']}{resumed} for {year_month}: {counts}.\n"
+                  f"{summary['failed']} employee(s) failed: {failed_ids}{more}\n"
+                  f"See Run History for the error of each employee.")
+    return False
+
+
+PAYROLL_LIST_QUERY = """
+    SELECT p.payroll_id, p.emp_id, e.first_name, e.last_name,
+           p.pay_period, p.gross_pay, p.allowances, p.deductions, p.net_pay
+    FROM payroll p
+    JOIN employees e ON p.emp_id = e.emp_id
+"""
+PAYROLL_LIST_ORDER = " ORDER BY p.pay_period DESC, p.emp_id"
+register_query("fetch_payroll_db", PAYROLL_LIST_QUERY + PAYROLL_LIST_ORDER)
+register_query("fetch_payroll_db month",
+               PAYROLL_LIST_QUERY + " WHERE p.pay_period = %s" + PAYROLL_LIST_ORDER, (SAMPLE_PERIOD,))
+register_query("fetch_payroll_db employee",
+               PAYROLL_LIST_QUERY + " WHERE p.emp_id = %s" + PAYROLL_LIST_ORDER, (1,))
+register_query("fetch_payroll_db month range",
+               PAYROLL_LIST_QUERY + " WHERE p.pay_period >= %s AND p.pay_period <= %s" + PAYROLL_LIST_ORDER,
+               (SAMPLE_PERIOD.replace(month=1), SAMPLE_PERIOD))
+
+
+def fetch_payroll_db(emp_id=None, year_month=None, from_month=None, to_month=None):
+    """Payroll rows joined to employee names; month filters take 'YYYY-MM' strings.
+
+    from_month/to_month select an inclusive range of months (e.g. the last 12).
+    """
     conn = create_connection()
     if conn is None:
         return []
     cursor = conn.cursor(buffered=True)
     try:
-        base_query = """
-            SELECT p.payroll_id, p.emp_id, e.first_name, e.last_name,
-                   p.`year_month`, p.gross_pay, p.allowances, p.deductions, p.net_pay
-            FROM payroll p
-            JOIN employees e ON p.emp_id = e.emp_id
-        """
+        base_query = PAYROLL_LIST_QUERY
         clauses = []
         params = []
 
@@ -561,18 +989,22 @@ def fetch_payroll_db(emp_id=None, year_month=None):
             except Exception:
                 return []
 
-        if year_month is not None:
-            clauses.append("p.`year_month` = %s")
-            params.append(year_month)
+        for value, clause in ((year_month, "p.pay_period = %s"),
+                              (from_month, "p.pay_period >= %s"),
+                              (to_month, "p.pay_period <= %s")):
+            if value is not None:
+                if not valid_year_month(value):
+                    return []
+                clauses.append(clause)
+                params.append(period_date(value))
 
         if clauses:
             base_query += " WHERE " + " AND ".join(clauses)
 
-        base_query += " ORDER BY p.`year_month` DESC, p.emp_id"
+        base_query += PAYROLL_LIST_ORDER
 
         cursor.execute(base_query, tuple(params))
-        rows = cursor.fetchall()
-        return rows
+        return [row[:4] + (row[4].strftime("%Y-%m"),) + row[5:] for row in cursor.fetchall()]
     except Error as e:
         _show_error("DB Error", str(e))
         return []
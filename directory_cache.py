@@ -0,0 +1,312 @@
+"""Local on-disk snapshot of the employee directory for instant startup.
+
+The employees and departments tables are mirrored into one compact binary
+file that is opened with mmap, so the Employees tab can be filled before
+any network round trip. The snapshot is then revalidated against a server
+version stamp (latest `updated_at` of both tables, last deletion tombstone
+and employee count); when the stamp differs only rows changed since the
+snapshot, plus new tombstones, are fetched and merged, and the file is
+rewritten atomically.
+
+File layout (little endian):
+    header      magic, format version, emp stamp, dept stamp, tombstone seq, counts
+    departments dept_id, name ref                          (DEPT entries)
+    employees   emp_id, dept_id, salary cents, 5 text refs  (EMP entries, by emp_id)
+    strings     UTF-8 pool; a text ref is (offset, length) into it
+"""
+import datetime
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from decimal import Decimal
+
+import db_config
+from db_config import create_connection, Error, _show_error
+from records import EmployeeRecord
+
+SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".hr_system")
+# Rows committed slightly after a later-stamped row would otherwise be missed:
+# updated_at is taken when the statement runs, not when the transaction commits.
+REVALIDATE_OVERLAP = datetime.timedelta(seconds=60)
+
+MAGIC = b"HRDS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxxqqqII")
+DEPT = struct.Struct("<iII")
+EMP = struct.Struct("<iiqIIIIIIIIII")
+NO_DEPT = -1
+NO_SALARY = -(1 << 63)
+NULL_TEXT = 0xFFFFFFFF
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_US = datetime.timedelta(microseconds=1)
+
+
+def _micros(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):      # aggregates over SQLite TIMESTAMP columns come back as text
+        value = datetime.datetime.fromisoformat(value)
+    return (value - EPOCH) // ONE_US
+
+
+def default_path():
+    """Snapshot file for the current backend (server and database, or SQLite file)."""
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", db_config.get_backend().identity)
+    return os.path.join(SNAPSHOT_DIR, f"directory-{name}.snap")
+
+
+class VersionStamp:
+    """What the server looked like when a snapshot was taken."""
+    __slots__ = ("emp_us", "dept_us", "tomb_seq", "emp_count")
+
+    def __init__(self, emp_us, dept_us, tomb_seq, emp_count):
+        self.emp_us = emp_us
+        self.dept_us = dept_us
+        self.tomb_seq = tomb_seq
+        self.emp_count = emp_count
+
+    def __eq__(self, other):
+        return isinstance(other, VersionStamp) and all(
+            getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __repr__(self):
+        return (f"VersionStamp(emp_us={self.emp_us}, dept_us={self.dept_us}, "
+                f"tomb_seq={self.tomb_seq}, emp_count={self.emp_count})")
+
+
+# -----------------------
+# FILE FORMAT
+# -----------------------
+class Snapshot:
+    """A read-only, memory-mapped snapshot file."""
+
+    def __init__(self, path, handle, view):
+        self.path = path
+        self._handle = handle
+        self._view = view
+        (magic, version, emp_us, dept_us, tomb_seq,
+         self.emp_count, self.dept_count) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a directory snapshot")
+        self.stamp = VersionStamp(emp_us, dept_us, tomb_seq, self.emp_count)
+        self._emp_at = HEADER.size + self.dept_count * DEPT.size
+        self._strings_at = self._emp_at + self.emp_count * EMP.size
+        if self._strings_at > len(view):
+            raise ValueError("truncated directory snapshot")
+
+    @classmethod
+    def open(cls, path):
+        """Map an existing snapshot, or return None if it is missing or unreadable."""
+        try:
+            handle = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            handle.close()
+            return None
+        try:
+            return cls(path, handle, view)
+        except (ValueError, struct.error):
+            view.close()
+            handle.close()
+            return None
+
+    def close(self):
+        if self._view is not None:
+            self._view.close()
+            self._handle.close()
+            self._view = None
+
+    def _text(self, offset, length):
+        if length == NULL_TEXT:
+            return None
+        start = self._strings_at + offset
+        return self._view[start:start + length].decode("utf-8")
+
+    def departments(self):
+        """{dept_id: dept_name}"""
+        result = {}
+        for i in range(self.dept_count):
+            dept_id, off, length = DEPT.unpack_from(self._view, HEADER.size + i * DEPT.size)
+            result[dept_id] = self._text(off, length)
+        return result
+
+    def rows(self):
+        """Raw employee rows: (emp_id, first, last, email, phone, job, dept_id, salary_cents)."""
+        text = self._text
+        for fields in EMP.iter_unpack(self._view[self._emp_at:self._strings_at]):
+            emp_id, dept_id, cents = fields[:3]
+            refs = fields[3:]
+            yield (emp_id, text(refs[0], refs[1]), text(refs[2], refs[3]), text(refs[4], refs[5]),
+                   text(refs[6], refs[7]), text(refs[8], refs[9]), dept_id, cents)
+
+    def records(self):
+        """Employees as EmployeeRecord rows, ordered by emp_id, as fetch_employees_db returns them."""
+        return _to_records(self.rows(), self.departments())
+
+
+def _to_records(rows, dept_names):
+    records = []
+    for emp_id, first, last, email, phone, job, dept_id, cents in rows:
+        salary = None if cents == NO_SALARY else Decimal(cents).scaleb(-2)
+        records.append(EmployeeRecord(emp_id, first, last, email, phone, job,
+                                      dept_names.get(dept_id, ""), salary))
+    return records
+
+
+def write_snapshot(path, stamp, dept_names, rows):
+    """Write a snapshot file atomically. `rows` must be sorted by emp_id."""
+    pool = bytearray()
+
+    def ref(value):
+        if value is None:
+            return 0, NULL_TEXT
+        data = value.encode("utf-8")
+        offset = len(pool)
+        pool.extend(data)
+        return offset, len(data)
+
+    body = bytearray()
+    for dept_id, name in sorted(dept_names.items()):
+        body += DEPT.pack(dept_id, *ref(name))
+    for emp_id, first, last, email, phone, job, dept_id, cents in rows:
+        body += EMP.pack(emp_id, dept_id, cents,
+                         *ref(first), *ref(last), *ref(email), *ref(phone), *ref(job))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, stamp.emp_us, stamp.dept_us, stamp.tomb_seq,
+                         len(rows), len(dept_names))
+
+    # The snapshot holds employee contact and salary data: owner-only file and directory.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if os.path.abspath(directory) == os.path.abspath(SNAPSHOT_DIR):
+        os.chmod(directory, 0o700)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(header)
+        fh.write(body)
+        fh.write(pool)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+# -----------------------
+# SERVER SIDE
+# -----------------------
+def _server_stamp(cursor):
+    cursor.execute("""
+        SELECT (SELECT MAX(updated_at) FROM employees),
+               (SELECT MAX(updated_at) FROM departments),
+               (SELECT COALESCE(MAX(seq), 0) FROM directory_tombstones),
+               (SELECT COUNT(*) FROM employees)
+    """)
+    emp_at, dept_at, tomb_seq, count = cursor.fetchone()
+    return VersionStamp(_micros(emp_at), _micros(dept_at), int(tomb_seq), int(count))
+
+
+def _employee_row(row):
+    emp_id, first, last, email, phone, job, dept_id, salary = row
+    cents = NO_SALARY if salary is None else int(Decimal(str(salary)) * 100)
+    return (emp_id, first, last, email, phone, job, NO_DEPT if dept_id is None else dept_id, cents)
+
+
+EMPLOYEE_COLUMNS = "emp_id, first_name, last_name, email, phone, job_title, dept_id, base_salary"
+CHANGED_EMPLOYEES_QUERY = db_config.register_query(
+    "directory_cache delta",
+    f"SELECT {EMPLOYEE_COLUMNS} FROM employees WHERE updated_at >= %s",
+    (datetime.datetime.combine(db_config.SAMPLE_DAY, datetime.time()),))
+
+
+class DirectoryCache:
+    """The snapshot file plus the logic that keeps it in step with the server.
+
+    cached_records() never touches the network; refresh() revalidates and
+    returns current records. Safe to call refresh() from a worker thread.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        self._lock = threading.Lock()
+        self.last_refresh = None     # "unchanged", "delta" or "full"
+
+    def cached_records(self):
+        """Records from the local snapshot, or None if there is none yet."""
+        snapshot = Snapshot.open(self.path)
+        if snapshot is None:
+            return None
+        try:
+            return snapshot.records()
+        finally:
+            snapshot.close()
+
+    def refresh(self, quiet=False):
+        """Revalidate against the server; return current records, or None on failure.
+
+        With quiet=True errors go to stderr instead of a message box (for worker threads).
+        """
+        with self._lock:
+            conn = create_connection()
+            if conn is None:
+                return None
+            cursor = conn.cursor(buffered=True)
+            try:
+                # One consistent read view, so the stamp matches the rows read with it
+                conn.start_transaction(consistent_snapshot=True, readonly=True)
+                records = self._revalidate(cursor)
+                conn.commit()
+                return records
+            except (*Error, OSError) as e:
+                conn.rollback()
+                if quiet:
+                    print(f"[Directory] {e}", file=sys.stderr)
+                else:
+                    _show_error("DB Error", f"Error refreshing employee directory: {e}")
+                return None
+            finally:
+                cursor.close()
+                conn.close()
+
+    def _revalidate(self, cursor):
+        stamp = _server_stamp(cursor)
+        snapshot = Snapshot.open(self.path)
+        try:
+            if snapshot is not None and snapshot.stamp == stamp:
+                self.last_refresh = "unchanged"
+                return snapshot.records()
+            cursor.execute("SELECT dept_id, dept_name FROM departments")
+            dept_names = dict(cursor.fetchall())
+            if snapshot is None or stamp.tomb_seq < snapshot.stamp.tomb_seq:
+                rows = None
+            else:
+                rows = self._merge_changes(cursor, snapshot, stamp)
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+        if rows is None:
+            cursor.execute(f"SELECT {EMPLOYEE_COLUMNS} FROM employees ORDER BY emp_id")
+            rows = [_employee_row(row) for row in cursor]
+            self.last_refresh = "full"
+        write_snapshot(self.path, stamp, dept_names, rows)
+        return _to_records(rows, dept_names)
+
+    def _merge_changes(self, cursor, snapshot, stamp):
+        """Apply rows changed since the snapshot; None if a full reload is needed."""
+        merged = {row[0]: row for row in snapshot.rows()}
+        since = EPOCH + snapshot.stamp.emp_us * ONE_US - REVALIDATE_OVERLAP
+        cursor.execute(CHANGED_EMPLOYEES_QUERY, (since,))
+        for row in cursor:
+            merged[row[0]] = _employee_row(row)
+        cursor.execute("SELECT emp_id FROM directory_tombstones WHERE seq > %s", (snapshot.stamp.tomb_seq,))
+        for (emp_id,) in cursor:
+            merged.pop(emp_id, None)
+        if len(merged) != stamp.emp_count:
+            # Deleted outside db_config (no tombstone): fall back to a full read
+            return None
+        self.last_refresh = "delta"
+        return [merged[emp_id] for emp_id in sorted(merged)]
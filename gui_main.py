@@ -1,9 +1,10 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import datetime
+import queue
+import threading
 from db_config import (
     add_employee_db as add_employee,
-    fetch_employees_db as fetch_all_employees,
     update_employee_db as update_employee,
     delete_employee_db as delete_employee,
     create_connection,
@@ -12,14 +13,28 @@ from db_config import (
     fetch_departments,
     mark_in_time,
     mark_out_time,
-    generate_payroll_db,
+    mark_attendance_status,
+    fetch_attendance_db,
     fetch_payroll_db,
-    upsert_payroll_for_employee
+    upsert_payroll_for_employee,
+    bulk_update_employees,
+    parse_emp_id_list,
+    valid_year_month,
+    report_payroll_run,
+    set_message_handler,
+    Error
 )
-import mysql.connector
+from payroll_batch import (fetch_payroll_jobs, fetch_job_failures, fetch_active_bounds,
+                           incremental_since, preview_payroll, run_payroll)
+from attendance_analytics import MonthBitmaps
+from attendance_board import AttendanceBoard, COUNTERS, COUNTER_TITLES, RECONCILE_SECONDS
+from directory_cache import DirectoryCache
+from name_index import NameIndex
+from reports import REPORTS, run_report
 
 # Theme utilities
 import ui_theme as theme
+import ui_profiler
 
 # Initialize DB / tables
 initialize_database()
@@ -29,6 +44,30 @@ create_tables()
 root = tk.Tk()
 header = theme.style_window(root, "Employee Management & HR System", size="1180x720")
 root.configure(bg=theme.COLORS["bg"])
+ui_profiler.install(root)
+
+# db_config reports problems as dialogs; ones raised on worker threads wait for the Tk loop
+DIALOGS = {"error": messagebox.showerror, "warning": messagebox.showwarning, "info": messagebox.showinfo}
+worker_messages = queue.Queue()
+
+def show_db_message(kind, title, msg):
+    if threading.current_thread() is threading.main_thread():
+        DIALOGS[kind](title, msg)
+    else:
+        worker_messages.put((kind, title, msg))
+
+def show_worker_messages():
+    while True:
+        try:
+            kind, title, msg = worker_messages.get_nowait()
+        except queue.Empty:
+            break
+        DIALOGS[kind](title, msg)
+    root.after(250, show_worker_messages)
+
+set_message_handler(show_db_message)
+show_worker_messages = ui_profiler.wrap("worker messages", show_worker_messages)
+root.after(250, show_worker_messages)
 
 # Style
 style = ttk.Style()
@@ -130,26 +169,51 @@ def set_dept_name_from_id(event=None):
     except:
         pass
 
-dept_combobox.bind("<<ComboboxSelected>>", set_dept_id_from_name)
-dept_id_entry.bind("<FocusOut>", set_dept_name_from_id)
+dept_combobox.bind("<<ComboboxSelected>>", ui_profiler.wrap("dept <<ComboboxSelected>>", set_dept_id_from_name))
+dept_id_entry.bind("<FocusOut>", ui_profiler.wrap("dept_id <FocusOut>", set_dept_name_from_id))
 
 # CRUD Functions
-def refresh_employees():
+directory = DirectoryCache()
+emp_view = {"generation": 0}
+# Type-ahead for the Employee ID fields; follows this window's writes, resynced on each refresh
+name_index = NameIndex().attach()
+
+def show_employees(records):
+    emp_view["generation"] += 1
+    name_index.sync(records)
     emp_tree.delete(*emp_tree.get_children())
-    employees = fetch_all_employees()
-    for i, emp in enumerate(employees):
-        values = (
-            emp.get("emp_id", ""),
-            emp.get("first_name", ""),
-            emp.get("last_name", ""),
-            emp.get("email", ""),
-            emp.get("phone", ""),
-            emp.get("job_title", ""),
-            emp.get("dept_name", ""),
-            str(emp.get("base_salary", ""))
-        )
+    for i, emp in enumerate(records):
         tag = "even" if i % 2 == 0 else "odd"
-        emp_tree.insert("", tk.END, values=values, tags=(tag,))
+        emp_tree.insert("", tk.END, values=emp.display_values(), tags=(tag,))
+
+def refresh_employees():
+    records = directory.refresh()
+    if records is not None:
+        show_employees(records)
+
+def load_employees_from_snapshot():
+    """Show the local snapshot at once, then revalidate it in the background."""
+    cached = directory.cached_records()
+    if cached is None:
+        refresh_employees()
+        return
+    show_employees(cached)
+    generation = emp_view["generation"]
+    results = queue.Queue()
+    threading.Thread(target=lambda: results.put(directory.refresh(quiet=True)), daemon=True).start()
+
+    def poll():
+        try:
+            records = results.get_nowait()
+        except queue.Empty:
+            root.after(100, poll)
+            return
+        # Skip if the table was redrawn meanwhile (e.g. after an add) or nothing changed
+        if records is not None and emp_view["generation"] == generation and directory.last_refresh != "unchanged":
+            show_employees(records)
+
+    poll = ui_profiler.wrap("employee snapshot revalidation", poll)
+    root.after(100, poll)
 
 def clear_entries():
     for k, widget in entries.items():
@@ -263,6 +327,97 @@ def on_emp_select(event):
     except:
         pass
 
+def bulk_update_action():
+    win = tk.Toplevel(root)
+    win.title("Bulk Update")
+    win.configure(bg=theme.COLORS["bg"])
+    win.transient(root)
+
+    form = theme.styled_labelframe(win, text="Select Employees & Changes")
+    form.pack(padx=12, pady=10, fill="x")
+
+    selected_ids = []
+    for item in emp_tree.selection():
+        try:
+            selected_ids.append(int(emp_tree.item(item, "values")[0]))
+        except:
+            pass
+
+    tk.Label(form, text="Employee IDs (e.g. 1,4,10-20):", bg=form.cget("bg"), fg="white").grid(row=0, column=0, sticky="w", padx=6, pady=4)
+    ids_entry = tk.Entry(form, width=36)
+    theme.style_entry(ids_entry)
+    ids_entry.grid(row=0, column=1, padx=6, pady=4)
+    if selected_ids:
+        ids_entry.insert(0, ",".join(str(i) for i in selected_ids))
+
+    tk.Label(form, text="Current Department:", bg=form.cget("bg"), fg="white").grid(row=1, column=0, sticky="w", padx=6, pady=4)
+    from_dept = ttk.Combobox(form, values=[""] + fetch_departments(), width=33)
+    from_dept.grid(row=1, column=1, padx=6, pady=4)
+
+    tk.Label(form, text="Raise %:", bg=form.cget("bg"), fg="white").grid(row=2, column=0, sticky="w", padx=6, pady=4)
+    raise_entry = tk.Entry(form, width=36)
+    theme.style_entry(raise_entry)
+    raise_entry.grid(row=2, column=1, padx=6, pady=4)
+
+    tk.Label(form, text="Move to Department:", bg=form.cget("bg"), fg="white").grid(row=3, column=0, sticky="w", padx=6, pady=4)
+    to_dept = ttk.Combobox(form, values=[""] + fetch_departments(), width=33)
+    to_dept.grid(row=3, column=1, padx=6, pady=4)
+
+    summary_lbl = tk.Label(win, text="", bg=theme.COLORS["bg"], fg="white", justify="left")
+    summary_lbl.pack(padx=12, anchor="w")
+
+    prev_columns = ("Emp ID", "Old Salary", "New Salary", "Old Dept ID", "New Dept ID")
+    prev_tree = ttk.Treeview(win, columns=prev_columns, show="headings", height=10)
+    for col in prev_columns:
+        prev_tree.heading(col, text=col)
+        prev_tree.column(col, width=110, anchor="center")
+    theme.style_treeview(prev_tree)
+    prev_tree.pack(fill="both", expand=True, padx=12, pady=6)
+
+    def run(dry_run):
+        ids_text = ids_entry.get().strip()
+        try:
+            emp_ids = parse_emp_id_list(ids_text) if ids_text else None
+        except ValueError:
+            messagebox.showerror("Error", "Invalid employee ID list.", parent=win)
+            return
+        summary = bulk_update_employees(
+            emp_ids=emp_ids,
+            dept=from_dept.get().strip(),
+            raise_pct=raise_entry.get().strip(),
+            new_dept=to_dept.get().strip(),
+            dry_run=dry_run
+        )
+        if summary is None:
+            return
+        prev_tree.delete(*prev_tree.get_children())
+        for i, row in enumerate(summary["preview"]):
+            values = [str(v) if v is not None else "" for v in row]
+            prev_tree.insert("", tk.END, values=values, tags=("even" if i % 2 == 0 else "odd",))
+        skipped = summary["skipped"]
+        skipped_text = ""
+        if skipped:
+            more = "..." if len(skipped) > 10 else ""
+            skipped_text = (f" | {len(skipped)} skipped (missing, other department or not ACTIVE): "
+                            f"{', '.join(str(emp_id) for emp_id in skipped[:10])}{more}")
+        summary_lbl.config(text=(
+            f"{'Preview' if dry_run else 'Applied'}: {summary['matched']} matched, "
+            f"{summary['updated']} updated | Monthly salary {summary['salary_before']} -> "
+            f"{summary['salary_after']} ({summary['salary_delta']:+}){skipped_text}"
+        ))
+        if not dry_run:
+            messagebox.showinfo("Bulk Update", f"{summary['updated']} employee(s) updated.", parent=win)
+            refresh_employees()
+
+    def apply():
+        if messagebox.askyesno("Confirm", "Apply these changes in one transaction?", parent=win):
+            run(False)
+
+    bulk_btns = tk.Frame(win, bg=theme.COLORS["bg"])
+    bulk_btns.pack(pady=8)
+    theme.colorful_button(bulk_btns, "Preview", lambda: run(True), "accent2").grid(row=0, column=0, padx=8)
+    theme.colorful_button(bulk_btns, "Apply", apply, "header").grid(row=0, column=1, padx=8)
+
 btn_frame = tk.Frame(tab_employee, bg=theme.COLORS["bg"])
 btn_frame.pack(pady=6)
 
@@ -270,12 +425,13 @@ theme.colorful_button(btn_frame, "Add", add_action, "accent2").grid(row=0, colum
 theme.colorful_button(btn_frame, "Update", update_action, "header").grid(row=0, column=1, padx=8)
 theme.colorful_button(btn_frame, "Delete", delete_action, "accent1").grid(row=0, column=2, padx=8)
 theme.colorful_button(btn_frame, "Refresh", lambda: (refresh_employees(), refresh_departments(), clear_entries()), "accent2").grid(row=0, column=3, padx=8)
+theme.colorful_button(btn_frame, "Bulk Update", bulk_update_action, "header").grid(row=0, column=4, padx=8)
 
 emp_table_frame = tk.Frame(tab_employee, bg=theme.COLORS["bg"])
 emp_table_frame.pack(fill="both", expand=True, padx=15, pady=8)
 
 emp_columns = ("ID", "First", "Last", "Email", "Phone", "Job Title", "Department", "Base Salary")
-emp_tree = ttk.Treeview(emp_table_frame, columns=emp_columns, show="headings", selectmode="browse", height=10)
+emp_tree = ttk.Treeview(emp_table_frame, columns=emp_columns, show="headings", selectmode="extended", height=10)
 
 for col in emp_columns:
     emp_tree.heading(col, text=col)
@@ -289,8 +445,8 @@ scroll_y.pack(side="right", fill="y")
 emp_tree.configure(yscrollcommand=scroll_y.set)
 theme.style_scrollbar(scroll_y)
 
-emp_tree.bind("<<TreeviewSelect>>", on_emp_select)
-refresh_employees()
+emp_tree.bind("<<TreeviewSelect>>", ui_profiler.wrap("emp_tree <<TreeviewSelect>>", on_emp_select))
+load_employees_from_snapshot()
 refresh_departments()
 
 # ======================================================
@@ -303,6 +459,7 @@ tk.Label(att_frame, text="Employee ID:", bg=att_frame.cget("bg")).grid(row=0, co
 emp_id_entry = tk.Entry(att_frame)
 theme.style_entry(emp_id_entry)
 emp_id_entry.grid(row=0, column=1, padx=6, pady=6)
+theme.autocomplete_entry(emp_id_entry, name_index.complete, "emp_id_entry")
 
 tk.Label(att_frame, text="Date (YYYY-MM-DD):", bg=att_frame.cget("bg")).grid(row=0, column=2, padx=6, pady=6)
 date_entry = tk.Entry(att_frame)
@@ -336,34 +493,147 @@ def mark_attendance():
         messagebox.showerror("Error", "Date format wrong.")
         return
 
-    conn = create_connection()
-    if conn:
-        try:
-            cursor = conn.cursor(buffered=True)  # FIXED
-            cursor.execute("SELECT emp_id FROM employees WHERE emp_id=%s", (eid,))
-            if not cursor.fetchone():
-                messagebox.showerror("Error", "Employee not found.")
-                return
+    if mark_attendance_status(eid, att_date, status, known_employee=eid in name_index):
+        messagebox.showinfo("Success", "Attendance recorded.")
+        refresh_attendance()
 
-            cursor.execute("""
-                INSERT INTO attendance (emp_id, att_date, status)
-                VALUES (%s,%s,%s)
-                ON DUPLICATE KEY UPDATE status=VALUES(status)
-            """, (eid, att_date, status))
-            conn.commit()
-            messagebox.showinfo("Success", "Attendance recorded.")
-            refresh_attendance()
-        except mysql.connector.Error as e:
-            conn.rollback()
-            messagebox.showerror("Error", str(e))
-        finally:
-            cursor.close()
-            conn.close()
+def punch_in():
+    emp_id = emp_id_entry.get().strip()
+    mark_in_time(emp_id, known_employee=emp_id in name_index)
+    refresh_attendance()
 
 theme.colorful_button(att_frame, "Mark Status", mark_attendance, "header").grid(row=0, column=6, padx=6, pady=6)
-theme.colorful_button(att_frame, "In Time", lambda: (mark_in_time(emp_id_entry.get().strip()), refresh_attendance()), "accent2").grid(row=0, column=7, padx=6)
+theme.colorful_button(att_frame, "In Time", punch_in, "accent2").grid(row=0, column=7, padx=6)
 theme.colorful_button(att_frame, "Out Time", lambda: (mark_out_time(emp_id_entry.get().strip()), refresh_attendance()), "accent1").grid(row=0, column=8, padx=6)
 
+def show_absence_report():
+    win = tk.Toplevel(root)
+    win.title("Absence Report")
+    win.configure(bg=theme.COLORS["bg"])
+    win.transient(root)
+
+    form = theme.styled_labelframe(win, text="Report Options")
+    form.pack(padx=12, pady=10, fill="x")
+    tk.Label(form, text="Month (YYYY-MM):", bg=form.cget("bg"), fg="white").grid(row=0, column=0, padx=6, pady=4)
+    month_entry = tk.Entry(form, width=10)
+    theme.style_entry(month_entry)
+    month_entry.grid(row=0, column=1, padx=6, pady=4)
+    month_entry.insert(0, datetime.date.today().strftime("%Y-%m"))
+    tk.Label(form, text="Absent at least (days):", bg=form.cget("bg"), fg="white").grid(row=0, column=2, padx=6, pady=4)
+    days_entry = tk.Entry(form, width=5)
+    theme.style_entry(days_entry)
+    days_entry.grid(row=0, column=3, padx=6, pady=4)
+    days_entry.insert(0, "3")
+
+    summary_lbl = tk.Label(win, text="", bg=theme.COLORS["bg"], fg="white")
+    summary_lbl.pack(padx=12, anchor="w")
+
+    absent_columns = ("Emp ID", "Absent Days")
+    absent_tree = ttk.Treeview(win, columns=absent_columns, show="headings", height=8)
+    for col in absent_columns:
+        absent_tree.heading(col, text=col)
+        absent_tree.column(col, width=120, anchor="center")
+    theme.style_treeview(absent_tree)
+    absent_tree.pack(fill="both", expand=True, padx=12, pady=4)
+
+    rate_tree = ttk.Treeview(win, show="headings", height=8)
+    theme.style_treeview(rate_tree)
+    rate_tree.pack(fill="both", expand=True, padx=12, pady=(4, 10))
+
+    def run_report():
+        ym = month_entry.get().strip()
+        if not valid_year_month(ym):
+            messagebox.showwarning("Invalid Month", "Format must be YYYY-MM.", parent=win)
+            return
+        try:
+            min_days = int(days_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Days must be a number.", parent=win)
+            return
+        bitmaps = MonthBitmaps.load(ym)
+        if bitmaps is None:
+            return
+
+        flagged = sorted(bitmaps.absent_at_least(min_days), key=lambda r: -r[1])
+        absent_tree.delete(*absent_tree.get_children())
+        for i, row in enumerate(flagged):
+            absent_tree.insert("", tk.END, values=row, tags=("even" if i % 2 == 0 else "odd",))
+        summary_lbl.config(text=f"{len(flagged)} of {len(bitmaps)} employees absent {min_days}+ days in {ym}")
+
+        rates = bitmaps.department_weekly_rates()
+        weeks = [label for label, *_rest in next(iter(rates.values()), [])]
+        rate_tree.delete(*rate_tree.get_children())
+        rate_tree["columns"] = ["Department"] + [f"Week {w}" for w in weeks]
+        for col in rate_tree["columns"]:
+            rate_tree.heading(col, text=col)
+            rate_tree.column(col, width=110, anchor="center")
+        for i, (dept_name, cells) in enumerate(rates.items()):
+            values = [dept_name] + ["-" if rate is None else f"{rate:.0%}" for _l, _p, _r, rate in cells]
+            rate_tree.insert("", tk.END, values=values, tags=("even" if i % 2 == 0 else "odd",))
+
+    theme.colorful_button(form, "Run Report", run_report, "header").grid(row=0, column=4, padx=8, pady=4)
+    run_report()
+
+theme.colorful_button(att_frame, "Absence Report", show_absence_report, "accent2").grid(row=0, column=9, padx=6)
+
+# Counters follow this window's punches as they happen; seeded when the board is first opened
+board = AttendanceBoard().attach()
+
+def show_attendance_board():
+    if board.day is None and not board.seed():
+        return
+    win = tk.Toplevel(root)
+    win.title("Attendance Board")
+    win.configure(bg=theme.COLORS["bg"])
+    win.transient(root)
+
+    status_lbl = tk.Label(win, text="", bg=theme.COLORS["bg"], fg="white")
+    status_lbl.pack(padx=12, pady=(10, 0), anchor="w")
+
+    board_columns = ("Department",) + COUNTER_TITLES
+    board_tree = ttk.Treeview(win, columns=board_columns, show="headings", height=12)
+    for col in board_columns:
+        board_tree.heading(col, text=col)
+        board_tree.column(col, width=150 if col == "Department" else 100, anchor="center")
+    theme.style_treeview(board_tree)
+    board_tree.pack(fill="both", expand=True, padx=12, pady=10)
+
+    shown = {"version": None}
+    reconciling = threading.Event()
+
+    def redraw():
+        version, totals, rows = board.snapshot()
+        if version == shown["version"]:
+            return
+        shown["version"] = version
+        board_tree.delete(*board_tree.get_children())
+        for i, (name, counts) in enumerate([("All", totals)] + rows):
+            board_tree.insert("", tk.END, values=[name] + [counts[key] for key in COUNTERS],
+                              tags=("even" if i % 2 == 0 else "odd",))
+        drift = "" if board.last_drift is None else f", {board.last_drift} changed elsewhere"
+        status_lbl.config(text=f"{board.day}  |  reconciled {board.seeded_at:%H:%M:%S}{drift}")
+
+    def reconcile():
+        try:
+            board.reconcile(quiet=True)
+        finally:
+            reconciling.clear()
+
+    def poll():
+        if not win.winfo_exists():
+            return
+        redraw()
+        age = (datetime.datetime.now() - board.seeded_at).total_seconds()
+        if age >= RECONCILE_SECONDS and not reconciling.is_set():
+            reconciling.set()
+            threading.Thread(target=reconcile, daemon=True).start()
+        win.after(500, poll)
+
+    poll = ui_profiler.wrap("attendance board poll", poll)
+    poll()
+
+theme.colorful_button(att_frame, "Live Board", show_attendance_board, "header").grid(row=0, column=10, padx=6)
+
 # -------- Attendance Table --------
 att_table_frame = tk.Frame(tab_attendance, bg=theme.COLORS["bg"])
 att_table_frame.pack(fill="both", expand=True, padx=15, pady=8)
@@ -385,21 +655,9 @@ theme.style_scrollbar(scroll_y_att)
 
 def refresh_attendance():
     att_tree.delete(*att_tree.get_children())
-    conn = create_connection()
-    if conn:
-        cursor = conn.cursor(buffered=True)
-        try:
-            cursor.execute("SELECT att_id, emp_id, att_date, in_time, out_time, status FROM attendance ORDER BY att_date DESC, emp_id")
-            rows = cursor.fetchall()
-            for i, rec in enumerate(rows):
-                values = list(rec)
-                values[3] = values[3].strftime('%Y-%m-%d %H:%M:%S') if values[3] else ''
-                values[4] = values[4].strftime('%Y-%m-%d %H:%M:%S') if values[4] else ''
-                tag = "even" if i % 2 == 0 else "odd"
-                att_tree.insert("", tk.END, values=values, tags=(tag,))
-        finally:
-            cursor.close()
-            conn.close()
+    for i, rec in enumerate(fetch_attendance_db()):
+        tag = "even" if i % 2 == 0 else "odd"
+        att_tree.insert("", tk.END, values=rec.display_values(), tags=(tag,))
 
 refresh_attendance()
 
@@ -413,6 +671,7 @@ tk.Label(pay_frame, text="Employee ID (leave empty for all):", bg=pay_frame.cget
 pay_emp_id = tk.Entry(pay_frame)
 theme.style_entry(pay_emp_id)
 pay_emp_id.grid(row=0, column=1, padx=6, pady=6)
+theme.autocomplete_entry(pay_emp_id, name_index.complete, "pay_emp_id")
 
 tk.Label(pay_frame, text="Year-Month (YYYY-MM):", bg=pay_frame.cget("bg")).grid(row=0, column=2, padx=6, pady=6)
 pay_month = tk.Entry(pay_frame)
@@ -420,17 +679,21 @@ theme.style_entry(pay_month)
 pay_month.grid(row=0, column=3, padx=6, pady=6)
 pay_month.insert(0, datetime.date.today().strftime("%Y-%m"))
 
+pay_incremental = tk.BooleanVar(value=False)
+tk.Checkbutton(pay_frame, text="Only changed employees", variable=pay_incremental,
+               bg=pay_frame.cget("bg"), fg="white", selectcolor=theme.COLORS["bg"],
+               activebackground=pay_frame.cget("bg"), activeforeground="white").grid(row=1, column=2, columnspan=2, sticky="w", padx=6)
+
 def generate_payroll():
     emp_id_str = pay_emp_id.get().strip()
     ym = pay_month.get().strip()
 
-    if not ym or len(ym) != 7 or ym[4] != '-':
+    if not valid_year_month(ym):
         messagebox.showwarning("Invalid Month", "Format must be YYYY-MM.")
         return
 
     if emp_id_str == "":
-        if generate_payroll_db(ym):
-            refresh_payroll(year_month=ym)
+        start_payroll_preview(ym, pay_incremental.get())
         return
 
     try:
@@ -455,13 +718,359 @@ def generate_payroll():
             if upsert_payroll_for_employee(eid, ym, base_salary):
                 messagebox.showinfo("Success", "Payroll generated.")
                 refresh_payroll(emp_id=eid, year_month=ym)
-        except mysql.connector.Error as e:
+        except Error as e:
             messagebox.showerror("Error", str(e))
         finally:
             cursor.close()
             conn.close()
 
-theme.colorful_button(pay_frame, "Generate Payroll", generate_payroll, "header").grid(row=0, column=4, padx=8, pady=6)
+def show_run_history():
+    win = tk.Toplevel(root)
+    win.title("Payroll Run History")
+    win.configure(bg=theme.COLORS["bg"])
+    win.transient(root)
+
+    job_columns = ("Job", "Month", "Mode", "Status", "Started", "Finished", "Seconds", "Processed", "Failed")
+    job_tree = ttk.Treeview(win, columns=job_columns, show="headings", selectmode="browse", height=10)
+    for col in job_columns:
+        job_tree.heading(col, text=col)
+        job_tree.column(col, width=100, anchor="center")
+    theme.style_treeview(job_tree)
+    job_tree.pack(fill="both", expand=True, padx=12, pady=(10, 4))
+
+    log_columns = ("Emp ID", "Error", "Logged At")
+    log_tree = ttk.Treeview(win, columns=log_columns, show="headings", height=6)
+    log_tree.heading("Emp ID", text="Emp ID")
+    log_tree.column("Emp ID", width=80, anchor="center")
+    log_tree.heading("Error", text="Error")
+    log_tree.column("Error", width=600, anchor="w")
+    log_tree.heading("Logged At", text="Logged At")
+    log_tree.column("Logged At", width=160, anchor="center")
+    theme.style_treeview(log_tree)
+    log_tree.pack(fill="both", expand=True, padx=12, pady=(4, 10))
+
+    for i, job in enumerate(fetch_payroll_jobs()):
+        values = ["" if v is None else str(v) for v in job]
+        job_tree.insert("", tk.END, values=values, tags=("even" if i % 2 == 0 else "odd",))
+
+    def on_job_select(event):
+        sel = job_tree.focus()
+        if not sel:
+            return
+        log_tree.delete(*log_tree.get_children())
+        job_id = int(job_tree.item(sel, "values")[0])
+        for i, row in enumerate(fetch_job_failures(job_id)):
+            log_tree.insert("", tk.END, values=[str(v) for v in row], tags=("even" if i % 2 == 0 else "odd",))
+
+    job_tree.bind("<<TreeviewSelect>>", ui_profiler.wrap("job_tree <<TreeviewSelect>>", on_job_select))
+
+generate_btn = theme.colorful_button(pay_frame, "Generate Payroll", generate_payroll, "header")
+generate_btn.grid(row=0, column=4, padx=8, pady=6)
+theme.colorful_button(pay_frame, "Run History", show_run_history, "accent2").grid(row=0, column=5, padx=8, pady=6)
+
+def show_reports():
+    win = tk.Toplevel(root)
+    win.title("Reports")
+    win.configure(bg=theme.COLORS["bg"])
+    win.transient(root)
+
+    form = theme.styled_labelframe(win, text="Report Options")
+    form.pack(padx=12, pady=10, fill="x")
+    titles = {title: key for key, (title, _query, _needs_month) in REPORTS.items()}
+    tk.Label(form, text="Report:", bg=form.cget("bg"), fg="white").grid(row=0, column=0, sticky="w", padx=6, pady=4)
+    report_box = ttk.Combobox(form, values=list(titles), state="readonly", width=34)
+    report_box.grid(row=0, column=1, columnspan=3, sticky="w", padx=6, pady=4)
+    report_box.current(0)
+    tk.Label(form, text="Month (YYYY-MM):", bg=form.cget("bg"), fg="white").grid(row=1, column=0, sticky="w", padx=6, pady=4)
+    month_entry = tk.Entry(form, width=10)
+    theme.style_entry(month_entry)
+    month_entry.grid(row=1, column=1, sticky="w", padx=6, pady=4)
+    month_entry.insert(0, pay_month.get().strip() or datetime.date.today().strftime("%Y-%m"))
+    tk.Label(form, text="To (optional):", bg=form.cget("bg"), fg="white").grid(row=1, column=2, padx=6, pady=4)
+    to_entry = tk.Entry(form, width=10)
+    theme.style_entry(to_entry)
+    to_entry.grid(row=1, column=3, padx=6, pady=4)
+
+    status_lbl = tk.Label(win, text="", bg=theme.COLORS["bg"], fg="white")
+    status_lbl.pack(padx=12, pady=(0, 10), anchor="w")
+
+    def export():
+        key = titles[report_box.get()]
+        month = month_entry.get().strip()
+        to_month = to_entry.get().strip() or None
+        if REPORTS[key][2] and not valid_year_month(month):
+            messagebox.showwarning("Invalid Month", "Format must be YYYY-MM.", parent=win)
+            return
+        path = filedialog.asksaveasfilename(
+            parent=win, defaultextension=".xlsx", initialfile=f"{key}-{month}.xlsx" if REPORTS[key][2] else f"{key}.xlsx",
+            filetypes=[("Excel workbook", "*.xlsx"), ("CSV", "*.csv")])
+        if not path:
+            return
+        status_lbl.config(text="Writing report...")
+        win.update_idletasks()
+        count = run_report(key, path, month if REPORTS[key][2] else None, to_month)
+        status_lbl.config(text="" if count is None else f"{count} row(s) written to {path}")
+
+    theme.colorful_button(form, "Export...", export, "header").grid(row=0, column=4, rowspan=2, padx=8, pady=4)
+
+theme.colorful_button(pay_frame, "Reports", show_reports, "accent2").grid(row=1, column=5, padx=8, pady=6)
+
+# -------- Payroll Run: stream a preview of the month, then commit it --------
+PREVIEW_MAX_ROWS = 5000         # rows listed in the table; the totals cover every employee
+PREVIEW_ROWS_PER_TICK = 500
+
+run_frame = theme.styled_labelframe(tab_payroll, text="Payroll Run")
+run_frame.pack(padx=20, pady=(0, 5), fill="x")
+run_frame.columnconfigure(1, weight=1)
+
+run_bar = ttk.Progressbar(run_frame, mode="determinate", length=320, maximum=1)
+run_bar.grid(row=0, column=0, padx=6, pady=4, sticky="w")
+run_status = tk.Label(run_frame, text="Generate Payroll for all employees previews the month before anything is written.",
+                      bg=run_frame.cget("bg"), fg="white", anchor="w")
+run_status.grid(row=0, column=1, padx=6, pady=4, sticky="we")
+run_totals = tk.Label(run_frame, text="", bg=run_frame.cget("bg"), fg="white", anchor="w")
+run_totals.grid(row=1, column=0, columnspan=2, padx=6, pady=(0, 4), sticky="w")
+
+# One run at a time: "idle", "preview", "ready" (previewed, not written) or "commit"
+pay_run = {"state": "idle"}
+
+def _money(value):
+    return f"{value:,.2f}"
+
+def _preview_worker(ym, incremental, cancel, results):
+    try:
+        since = incremental_since(ym) if incremental else None
+        bounds = fetch_active_bounds(since)
+        if bounds is None:
+            results.put(("failed", "Could not read active employees."))
+            return
+        lo, hi, total = bounds
+        results.put(("total", total))
+        listed = 0
+        for rows, stats in preview_payroll(ym, (lo or 1) - 1, hi or 0, incremental=incremental,
+                                           cancel=cancel, since=since):
+            sums = [sum(row[i] for row in rows) for i in range(2, 6)]
+            shown = rows[:max(0, PREVIEW_MAX_ROWS - listed)]
+            listed += len(shown)
+            results.put(("batch", shown, stats, sums))
+        results.put(("done", None))
+    except (*Error, RuntimeError) as e:
+        results.put(("failed", str(e)))
+    except Exception as e:      # the poller waits for a final message, whatever went wrong
+        results.put(("failed", f"{type(e).__name__}: {e}"))
+
+def _commit_worker(ym, incremental, results, restart=False):
+    try:
+        summary = run_payroll(ym, stream=None, incremental=incremental, restart=restart,
+                              on_progress=lambda p: results.put(("progress", p.completed(), p.total, p.rate())))
+    except Exception as e:
+        results.put(("failed", f"{type(e).__name__}: {e}"))
+        return
+    results.put(("committed", summary))
+
+def _set_run_buttons():
+    state = pay_run["state"]
+    run_commit_btn.config(state="normal" if state == "ready" else "disabled")
+    run_cancel_btn.config(state="normal" if state in ("preview", "ready") else "disabled")
+    generate_btn.config(state="normal" if state in ("idle", "ready") else "disabled")
+
+def _show_run_totals():
+    run = pay_run
+    counts = run["counts"]
+    gross, allowances, deductions, net = run["sums"]
+    run_totals.config(text=(
+        f"{run['rows']} to write ({counts['inserted']} new, {counts['changed']} updated, "
+        f"{counts['unchanged']} unchanged)   Gross {_money(gross)}   Allowances {_money(allowances)}   "
+        f"Deductions {_money(deductions)}   Net {_money(net)}"))
+
+def start_payroll_preview(ym, incremental):
+    if pay_run["state"] in ("preview", "commit"):
+        return
+    pay_tree.delete(*pay_tree.get_children())
+    pay_run.clear()
+    pay_run.update(state="preview", ym=ym, incremental=incremental, total=0, done=0, rows=0, listed=0,
+                   counts={"inserted": 0, "changed": 0, "unchanged": 0}, sums=[0, 0, 0, 0],
+                   pending=[], cancel=threading.Event(), results=queue.Queue(),
+                   started=datetime.datetime.now())
+    run_bar.config(maximum=1, value=0)
+    run_status.config(text=f"Computing payroll for {ym}...")
+    run_totals.config(text="")
+    _set_run_buttons()
+    threading.Thread(target=_preview_worker, daemon=True,
+                     args=(ym, incremental, pay_run["cancel"], pay_run["results"])).start()
+    root.after(100, poll_payroll_run, pay_run["results"])
+
+def _list_preview_rows():
+    """Insert a tick's worth of pending preview rows, so a large batch never blocks the window."""
+    pending = pay_run["pending"]
+    count = min(len(pending), PREVIEW_ROWS_PER_TICK)
+    for emp_id, period, gross, allowances, deductions, net in pending[:count]:
+        first, _space, last = (name_index.label(emp_id) or "").partition(" ")
+        tag = "even" if pay_run["listed"] % 2 == 0 else "odd"
+        pay_tree.insert("", tk.END, values=("preview", emp_id, first, last, f"{period:%Y-%m}", str(gross),
+                                            str(allowances), str(deductions), str(net)), tags=(tag,))
+        pay_run["listed"] += 1
+    del pending[:count]
+
+def _finish_preview(message):
+    elapsed = (datetime.datetime.now() - pay_run["started"]).total_seconds()
+    if message is not None:
+        pay_run["state"] = "idle"
+        pay_run["pending"].clear()
+        run_status.config(text=f"{message} Nothing was written.")
+        _set_run_buttons()
+        return
+    pay_run["state"] = "ready"
+    more = f" (first {PREVIEW_MAX_ROWS} listed)" if pay_run["rows"] > PREVIEW_MAX_ROWS else ""
+    run_status.config(text=f"Preview of {pay_run['ym']}: {pay_run['done']} employee(s) in {elapsed:.1f}s{more}. "
+                           f"Nothing written yet; Commit to write it or Cancel to discard it.")
+    _set_run_buttons()
+
+def poll_payroll_run(results):
+    run = pay_run
+    if results is not run.get("results"):
+        return      # a newer run took over
+    finished = False
+    while not finished:
+        try:
+            message = results.get_nowait()
+        except queue.Empty:
+            break
+        kind = message[0]
+        if kind == "total":
+            run["total"] = message[1]
+            run_bar.config(maximum=max(1, message[1]))
+        elif kind == "batch":
+            if run["cancel"].is_set():
+                continue
+            _kind, rows, stats, sums = message
+            run["done"] += sum(stats.values())
+            run["rows"] += stats["inserted"] + stats["changed"]
+            for key, value in stats.items():
+                run["counts"][key] += value
+            run["sums"] = [a + b for a, b in zip(run["sums"], sums)]
+            run["pending"].extend(rows)
+        elif kind == "progress":
+            _kind, done, total, rate = message
+            run_bar.config(maximum=max(1, total), value=done)
+            run_status.config(text=f"Writing {run['ym']}: {done}/{total} employees, {rate:,.0f} rows/s")
+        elif kind == "done":
+            finished = True
+            if run["cancel"].is_set():
+                _finish_preview("Preview cancelled.")
+        elif kind == "failed":
+            finished = True
+            if run["state"] == "commit":
+                _finish_commit(None, message[1])
+            else:
+                _finish_preview(f"Preview failed: {message[1].rstrip('.')}.")
+        elif kind == "committed":
+            finished = True
+            _finish_commit(message[1])
+
+    if run["state"] == "preview" and not run["cancel"].is_set():
+        _list_preview_rows()
+        elapsed = (datetime.datetime.now() - run["started"]).total_seconds()
+        rate = run["done"] / elapsed if elapsed > 0 else 0.0
+        run_bar.config(value=run["done"])
+        run_status.config(text=f"Computing {run['ym']}: {run['done']}/{run['total']} employees, {rate:,.0f} rows/s")
+        _show_run_totals()
+        if finished:
+            _finish_preview(None)
+    elif run["state"] == "ready" and run["pending"]:
+        _list_preview_rows()
+    if not finished or (run["state"] == "ready" and run["pending"]):
+        root.after(100, poll_payroll_run, results)
+
+poll_payroll_run = ui_profiler.wrap("payroll run poll", poll_payroll_run)
+
+def cancel_payroll_run():
+    state = pay_run["state"]
+    if state == "preview":
+        # The worker stops after its current chunk; poll_payroll_run reports it
+        pay_run["cancel"].set()
+        pay_run["pending"].clear()
+        run_status.config(text="Cancelling...")
+        run_cancel_btn.config(state="disabled")
+    elif state == "ready":
+        pay_run["state"] = "idle"
+        pay_run["pending"].clear()
+        run_bar.config(value=0)
+        run_status.config(text=f"Preview of {pay_run['ym']} discarded. Nothing was written.")
+        run_totals.config(text="")
+        _set_run_buttons()
+        refresh_payroll(year_month=pay_run["ym"])
+
+def commit_payroll_run():
+    if pay_run["state"] != "ready":
+        return
+    if not messagebox.askyesno("Commit Payroll",
+                               f"Write payroll for {pay_run['rows']} employee(s) for {pay_run['ym']}?"):
+        return
+    # A run killed mid-commit (window closed, crash) leaves its job RUNNING, which blocks the month
+    mode = "INCREMENTAL" if pay_run["incremental"] else "FULL"
+    running = [job for job in fetch_payroll_jobs(pay_run["ym"]) if job[2] == mode and job[3] == "RUNNING"]
+    restart = False
+    if running:
+        job_id, _ym, _mode, _status, started_at = running[0][:5]
+        if not messagebox.askyesno("Payroll Job Running",
+                                   f"Payroll job {job_id} for {pay_run['ym']} is still marked as running "
+                                   f"(started {started_at:%Y-%m-%d %H:%M}).\n\nIf no other payroll run is "
+                                   f"active, for example because the app was closed during a commit, it can "
+                                   f"be abandoned and the month written from the start.\n\nRestart it?"):
+            return
+        restart = True
+    pay_run["state"] = "commit"
+    pay_run["pending"].clear()
+    pay_run["results"] = queue.Queue()
+    run_bar.config(value=0)
+    run_status.config(text=f"Writing {pay_run['ym']}...")
+    _set_run_buttons()
+    threading.Thread(target=_commit_worker, daemon=True,
+                     args=(pay_run["ym"], pay_run["incremental"], pay_run["results"], restart)).start()
+    root.after(100, poll_payroll_run, pay_run["results"])
+
+def _commit_differences(summary):
+    """Lines describing where the committed run differs from its preview."""
+    run = pay_run
+    if summary["resumed"]:
+        return ["It resumed an earlier unfinished job, so only part of the month was written now; "
+                "totals were not compared with the preview."]
+    lines = []
+    if summary["processed"] != run["done"]:
+        lines.append(f"Employees: {summary['processed']} processed, {run['done']} previewed.")
+    for key in ("inserted", "changed", "unchanged"):
+        if summary[key] != run["counts"][key]:
+            lines.append(f"{key.capitalize()}: {summary[key]} written, {run['counts'][key]} previewed.")
+    for label, written, previewed in zip(("Gross", "Allowances", "Deductions", "Net"),
+                                         summary["totals"], run["sums"]):
+        if written != previewed:
+            lines.append(f"{label}: {_money(written)} written, {_money(previewed)} previewed.")
+    return lines
+
+def _finish_commit(summary, error=None):
+    ym = pay_run["ym"]
+    pay_run["state"] = "idle"
+    _set_run_buttons()
+    if summary is None:
+        reason = f": {error}" if error else ""
+        run_status.config(text=f"Payroll for {ym} stopped{reason}. A failed job resumes on the next run.")
+        refresh_payroll(year_month=ym)
+        return
+    differences = _commit_differences(summary)
+    note = " Differs from the preview (see details)." if differences else " Matches the preview."
+    run_status.config(text=f"Payroll job {summary['job_id']} for {ym} written in {summary['seconds']:.1f}s.{note}")
+    refresh_payroll(year_month=ym)
+    report_payroll_run(ym, summary)
+    if differences:
+        messagebox.showwarning("Payroll Differs From Preview",
+                               f"Payroll for {ym} was written, but not exactly as previewed "
+                               f"(employees or salaries changed in between):\n\n" + "\n".join(differences))
+
+run_commit_btn = theme.colorful_button(run_frame, "Commit", commit_payroll_run, "header")
+run_commit_btn.grid(row=0, column=2, padx=6, pady=4)
+run_cancel_btn = theme.colorful_button(run_frame, "Cancel", cancel_payroll_run, "accent2")
+run_cancel_btn.grid(row=0, column=3, padx=6, pady=4)
 
 pay_table_frame = tk.Frame(tab_payroll, bg=theme.COLORS["bg"])
 pay_table_frame.pack(fill="both", expand=True, padx=15, pady=8)
@@ -492,6 +1101,7 @@ def refresh_payroll(emp_id=None, year_month=None):
         pay_tree.insert("", tk.END, values=values, tags=(tag,))
 
 refresh_payroll()
+_set_run_buttons()
 
 # ======================================================
 # RUN APP
@@ -0,0 +1,327 @@
+"""Concurrent kiosk load test for the attendance write paths.
+
+Simulates N punch terminals calling mark_in_time, mark_out_time and
+mark_attendance_status against a local MySQL database, with a ramp-up
+profile, and reports throughput, p50/p95/p99 latency, rejections, errors,
+deadlocks and lock-wait timeouts per operation.
+
+Runs against its own database (employee_management_loadtest by default;
+on SQLite, employee_management_loadtest.db next to the application's file),
+seeds load-test employees there and clears their attendance before each run.
+
+Usage:
+    python loadtest_attendance.py --clients 50 --profile linear --ramp 30 --duration 120
+    python loadtest_attendance.py --clients 200 --profile burst --pool-size 32 --json report.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import db_config
+from db_config import mark_in_time, mark_out_time, mark_attendance_status, Error
+
+DEFAULT_DATABASE = "employee_management_loadtest"
+SEED_EMAIL_DOMAIN = "loadtest.invalid"
+OPERATIONS = ("in_time", "out_time", "status")
+
+_local = threading.local()
+
+
+# -----------------------
+# SETUP
+# -----------------------
+def seed_employees(count):
+    """Ensure `count` load-test employees exist; return their emp_ids."""
+    conn = db_config.create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        rows = [(f"Load{i}", "Test", f"lt{i}@{SEED_EMAIL_DOMAIN}", "Kiosk", 30000)
+                for i in range(count)]
+        for chunk in db_config._chunks(rows, 1000):
+            cursor.executemany("""
+                INSERT IGNORE INTO employees (first_name, last_name, email, job_title, base_salary)
+                VALUES (%s,%s,%s,%s,%s)
+            """, chunk)
+        conn.commit()
+        cursor.execute(
+            "SELECT emp_id FROM employees WHERE email LIKE %s ORDER BY emp_id LIMIT %s",
+            (f"%@{SEED_EMAIL_DOMAIN}", count)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    except Error as e:
+        conn.rollback()
+        print(f"[Seed] {e}", file=sys.stderr)
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def reset_attendance(emp_ids):
+    conn = db_config.create_connection()
+    if conn is None:
+        return False
+    cursor = conn.cursor(buffered=True)
+    try:
+        for chunk in db_config._chunks(emp_ids, 1000):
+            cursor.execute(
+                "DELETE FROM attendance WHERE emp_id IN (" + ",".join(["%s"] * len(chunk)) + ")",
+                tuple(chunk)
+            )
+            conn.commit()
+        return True
+    except Error as e:
+        conn.rollback()
+        print(f"[Reset] {e}", file=sys.stderr)
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# -----------------------
+# RAMP-UP PROFILES
+# -----------------------
+def start_offsets(profile, clients, ramp, step_clients):
+    """Seconds after t0 at which each client starts."""
+    if profile == "burst" or ramp <= 0:
+        return [0.0] * clients
+    if profile == "linear":
+        return [ramp * i / clients for i in range(clients)]
+    if profile == "step":
+        steps = max(1, -(-clients // step_clients))
+        interval = ramp / steps
+        return [interval * (i // step_clients) for i in range(clients)]
+    raise ValueError(f"Unknown profile: {profile}")
+
+
+# -----------------------
+# CLIENTS
+# -----------------------
+def _capture(kind, title, msg):
+    _local.last = (kind, msg)
+
+
+def _classify(ok, message):
+    if ok:
+        return "ok"
+    kind, msg = message or ("error", "")
+    if "1213" in msg or "Deadlock" in msg:
+        return "deadlock"
+    if "1205" in msg or "Lock wait timeout" in msg:
+        return "lock_timeout"
+    if kind == "warning":
+        return "rejected"
+    return "error"
+
+
+class ClientStats:
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.outcomes = {op: {} for op in OPERATIONS}
+        self.completions = []      # monotonic timestamps, for the per-second timeline
+        self.samples = []          # a few error messages for the report
+
+
+def run_client(emp_ids, start_at, stop_at, weights, think_ms, stats, seed):
+    rng = random.Random(seed)
+    pending_in = list(emp_ids)
+    rng.shuffle(pending_in)
+    clocked_in = []
+    today = datetime.date.today()
+
+    delay = start_at - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+    while time.monotonic() < stop_at:
+        op = rng.choices(OPERATIONS, weights)[0]
+        if op == "in_time" and not pending_in:
+            op = "status"
+        if op == "out_time" and not clocked_in:
+            op = "in_time" if pending_in else "status"
+
+        _local.last = None
+        started = time.perf_counter()
+        if op == "in_time":
+            emp_id = pending_in.pop()
+            ok = mark_in_time(str(emp_id))
+            if ok:
+                clocked_in.append(emp_id)
+        elif op == "out_time":
+            emp_id = clocked_in.pop(rng.randrange(len(clocked_in)))
+            ok = mark_out_time(str(emp_id))
+        else:
+            emp_id = rng.choice(emp_ids)
+            day = today - datetime.timedelta(days=rng.randint(1, 28))
+            ok = mark_attendance_status(emp_id, day, rng.choice(("PRESENT", "ABSENT", "LEAVE")))
+        elapsed = time.perf_counter() - started
+
+        outcome = _classify(ok, _local.last)
+        stats.latencies[op].append(elapsed)
+        stats.outcomes[op][outcome] = stats.outcomes[op].get(outcome, 0) + 1
+        stats.completions.append(time.monotonic())
+        if outcome not in ("ok", "rejected") and len(stats.samples) < 5:
+            stats.samples.append(f"{op}: {_local.last[1] if _local.last else 'unknown error'}")
+
+        if think_ms > 0:
+            time.sleep(rng.expovariate(1000.0 / think_ms))
+
+
+# -----------------------
+# REPORT
+# -----------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def build_report(all_stats, t0, duration, config):
+    report = {"config": config, "operations": {}, "timeline": []}
+    total = 0
+    for op in OPERATIONS:
+        values = sorted(v for s in all_stats for v in s.latencies[op])
+        outcomes = {}
+        for s in all_stats:
+            for outcome, count in s.outcomes[op].items():
+                outcomes[outcome] = outcomes.get(outcome, 0) + count
+        total += len(values)
+        report["operations"][op] = {
+            "count": len(values),
+            "outcomes": outcomes,
+            "p50_ms": round(_percentile(values, 50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 99) * 1000, 2),
+            "max_ms": round((values[-1] if values else 0.0) * 1000, 2),
+        }
+    buckets = [0] * (int(duration) + 1)
+    for s in all_stats:
+        for ts in s.completions:
+            second = int(ts - t0)
+            if 0 <= second < len(buckets):
+                buckets[second] += 1
+    report["timeline"] = buckets
+    report["total_ops"] = total
+    report["throughput_ops_s"] = round(total / duration, 1) if duration else 0.0
+    report["error_samples"] = [m for s in all_stats for m in s.samples][:10]
+    return report
+
+
+def print_report(report):
+    cfg = report["config"]
+    print(f"Clients: {cfg['clients']}  profile: {cfg['profile']}  pool: {cfg['pool_size'] or 'none'}  "
+          f"duration: {cfg['duration']}s")
+    print(f"{'Operation':<10}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  Outcomes")
+    for op, row in report["operations"].items():
+        outcomes = ", ".join(f"{k}={v}" for k, v in sorted(row["outcomes"].items()))
+        print(f"{op:<10}{row['count']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['max_ms']:>10}  {outcomes}")
+    print(f"Total: {report['total_ops']} ops, {report['throughput_ops_s']} ops/s")
+    peak = max(report["timeline"]) if report["timeline"] else 0
+    print(f"Peak second: {peak} ops")
+    for sample in report["error_samples"]:
+        print(f"  ! {sample}")
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the attendance punch paths.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--allow-main-db", action="store_true",
+                        help="Allow running against the application database")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=1000, help="Load-test employees to seed")
+    parser.add_argument("--profile", choices=("burst", "linear", "step"), default="linear")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Ramp-up time in seconds")
+    parser.add_argument("--step-clients", type=int, default=10, help="Clients added per step (step profile)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Test length in seconds, ramp included")
+    parser.add_argument("--mix", default="4,3,3", help="Weights for in_time,out_time,status")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a client's calls")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="Connection pool size (0 = new connection per call, as the app does)")
+    parser.add_argument("--keep-attendance", action="store_true",
+                        help="Do not clear load-test attendance before the run")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.clients < 1 or args.employees < args.clients:
+        parser.error("need at least one client and at least as many employees as clients")
+    # On SQLite the database name picks a file next to the application's, as in query_plans.py
+    sqlite_path = os.path.join(os.path.dirname(db_config.DB_SQLITE_PATH), f"{args.database}.db")
+    if db_config.DB_BACKEND == "sqlite":
+        target = sqlite_path
+        main_db = os.path.abspath(sqlite_path) == os.path.abspath(db_config.DB_SQLITE_PATH)
+    else:
+        target = args.database
+        main_db = args.database == db_config.DB_NAME
+    if main_db and not args.allow_main_db:
+        parser.error(f"refusing to load-test '{target}' without --allow-main-db")
+    try:
+        weights = [float(w) for w in args.mix.split(",")]
+        if len(weights) != len(OPERATIONS) or sum(weights) <= 0:
+            raise ValueError
+    except ValueError:
+        parser.error("--mix needs three comma-separated weights")
+
+    db_config.DB_NAME = args.database
+    db_config.DB_SQLITE_PATH = sqlite_path
+    db_config.set_message_handler(_capture)
+    db_config.initialize_database()
+    db_config.create_tables()
+    if args.pool_size:
+        try:
+            db_config.configure_pool(args.pool_size)
+        except (*Error, AttributeError, ValueError) as e:
+            parser.error(f"cannot create pool: {e}")
+
+    emp_ids = seed_employees(args.employees)
+    if not emp_ids:
+        print("Could not seed load-test employees.", file=sys.stderr)
+        return 2
+    if not args.keep_attendance and not reset_attendance(emp_ids):
+        return 2
+
+    offsets = start_offsets(args.profile, args.clients, args.ramp, args.step_clients)
+    t0 = time.monotonic() + 0.5
+    stop_at = t0 + args.duration
+    all_stats = []
+    threads = []
+    for i in range(args.clients):
+        stats = ClientStats()
+        all_stats.append(stats)
+        t = threading.Thread(
+            target=run_client,
+            args=(emp_ids[i::args.clients], t0 + offsets[i], stop_at, weights, args.think_ms, stats, i),
+            daemon=True,
+        )
+        threads.append(t)
+        t.start()
+    for t in threads:
+        t.join()
+
+    config = {k: getattr(args, k) for k in ("database", "clients", "employees", "profile", "ramp",
+                                            "duration", "mix", "think_ms", "pool_size")}
+    report = build_report(all_stats, t0, args.duration, config)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+    failures = sum(row["outcomes"].get(k, 0) for row in report["operations"].values()
+                   for k in ("error", "deadlock", "lock_timeout"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
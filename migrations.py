@@ -0,0 +1,425 @@
+"""Versioned schema migrations.
+
+Each migration runs once, in order, and is recorded in `schema_migrations`.
+create_tables() calls migrate() on every start, so existing installations
+pick up new versions automatically. Large-table changes are written as
+online operations: DDL uses ALGORITHM=INPLACE, LOCK=NONE where MySQL allows
+it, and data backfills run in primary-key batches with a commit per batch,
+so concurrent reads and writes keep working during the migration.
+
+MySQL only: the SQLite backend creates its current schema directly.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show applied and pending versions
+"""
+import argparse
+import sys
+import time
+
+from storage import Error
+
+BACKFILL_BATCH = 5000
+LOCK_NAME = "hr_schema_migrations"
+ER_ALTER_OPERATION_NOT_SUPPORTED = (1845, 1846)
+
+
+# -----------------------
+# HELPERS
+# -----------------------
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def _unique_index_on(cursor, table, columns):
+    """Name of the unique index covering exactly `columns` in order, or None."""
+    cursor.execute("""
+        SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX)
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+        GROUP BY INDEX_NAME
+    """, (table,))
+    wanted = ",".join(columns)
+    for name, cols in cursor.fetchall():
+        if cols == wanted:
+            return name
+    return None
+
+
+def _alter_online(cursor, table, clause):
+    """ALTER TABLE without blocking writers; falls back when InnoDB cannot do it in place."""
+    try:
+        cursor.execute(f"ALTER TABLE `{table}` {clause}, ALGORITHM=INPLACE, LOCK=NONE")
+    except Error as e:
+        if getattr(e, "errno", None) not in ER_ALTER_OPERATION_NOT_SUPPORTED:
+            raise
+        cursor.execute(f"ALTER TABLE `{table}` {clause}")
+
+
+def _backfill(conn, cursor, table, key, assignment, pending_condition, batch=BACKFILL_BATCH):
+    """Run `UPDATE table SET assignment` over primary-key ranges, committing each batch."""
+    cursor.execute(f"SELECT MIN(`{key}`), MAX(`{key}`) FROM `{table}`")
+    lo, hi = cursor.fetchone()
+    if lo is None:
+        return 0
+    updated = 0
+    start = lo - 1
+    while start < hi:
+        end = start + batch
+        cursor.execute(
+            f"UPDATE `{table}` SET {assignment} "
+            f"WHERE `{key}` > %s AND `{key}` <= %s AND {pending_condition}",
+            (start, end)
+        )
+        updated += cursor.rowcount
+        conn.commit()
+        start = end
+    return updated
+
+
+# -----------------------
+# MIGRATIONS
+# -----------------------
+def _m001_baseline(conn, cursor):
+    """Tables as created by create_tables before migrations existed."""
+    # Departments
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS departments (
+        dept_id INT PRIMARY KEY AUTO_INCREMENT,
+        dept_name VARCHAR(100) NOT NULL UNIQUE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # Employees
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS employees (
+        emp_id INT PRIMARY KEY AUTO_INCREMENT,
+        first_name VARCHAR(100) NOT NULL,
+        last_name VARCHAR(100),
+        email VARCHAR(150) UNIQUE,
+        phone VARCHAR(20),
+        hire_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+        job_title VARCHAR(100),
+        dept_id INT,
+        base_salary DECIMAL(12,2) DEFAULT 0,
+        status ENUM('ACTIVE','INACTIVE','TERMINATED') DEFAULT 'ACTIVE',
+        FOREIGN KEY (dept_id) REFERENCES departments(dept_id) ON DELETE SET NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # Attendance
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS attendance (
+        att_id INT PRIMARY KEY AUTO_INCREMENT,
+        emp_id INT NOT NULL,
+        att_date DATE NOT NULL,
+        in_time DATETIME,
+        out_time DATETIME,
+        status ENUM('PRESENT','ABSENT','LEAVE') DEFAULT 'PRESENT',
+        FOREIGN KEY (emp_id) REFERENCES employees(emp_id) ON DELETE CASCADE,
+        UNIQUE(emp_id, att_date)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # Payroll
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS payroll (
+        payroll_id INT PRIMARY KEY AUTO_INCREMENT,
+        emp_id INT NOT NULL,
+        `year_month` VARCHAR(7) NOT NULL,
+        gross_pay DECIMAL(12,2),
+        allowances DECIMAL(12,2),
+        deductions DECIMAL(12,2),
+        net_pay DECIMAL(12,2),
+        generated_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(emp_id, `year_month`),
+        FOREIGN KEY (emp_id) REFERENCES employees(emp_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # Audit trail (written asynchronously by audit_log)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS audit_log (
+        audit_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+        logged_at DATETIME(6) NOT NULL,
+        actor VARCHAR(100),
+        table_name VARCHAR(64) NOT NULL,
+        action VARCHAR(16) NOT NULL,
+        row_key VARCHAR(100) NOT NULL,
+        before_data JSON,
+        after_data JSON,
+        INDEX idx_audit_row (table_name, row_key, logged_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # Payroll jobs, checkpoints by emp_id range, and per-employee failures
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS payroll_jobs (
+        job_id INT PRIMARY KEY AUTO_INCREMENT,
+        `year_month` VARCHAR(7) NOT NULL,
+        mode ENUM('FULL','INCREMENTAL') NOT NULL DEFAULT 'FULL',
+        status ENUM('RUNNING','COMPLETED','PARTIAL','FAILED','ABANDONED') NOT NULL DEFAULT 'RUNNING',
+        started_at DATETIME NOT NULL,
+        finished_at DATETIME,
+        processed INT NOT NULL DEFAULT 0,
+        failed INT NOT NULL DEFAULT 0,
+        INDEX idx_jobs_month_status (`year_month`, mode, status)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS payroll_job_ranges (
+        job_id INT NOT NULL,
+        range_no INT NOT NULL,
+        first_id INT NOT NULL,
+        last_id INT NOT NULL,
+        checkpoint_id INT NOT NULL,
+        done TINYINT(1) NOT NULL DEFAULT 0,
+        PRIMARY KEY (job_id, range_no),
+        FOREIGN KEY (job_id) REFERENCES payroll_jobs(job_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS payroll_job_log (
+        log_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+        job_id INT NOT NULL,
+        emp_id INT NOT NULL,
+        message VARCHAR(500),
+        logged_at DATETIME NOT NULL,
+        INDEX idx_job_log_job (job_id),
+        FOREIGN KEY (job_id) REFERENCES payroll_jobs(job_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def _m002_typed_pay_period(conn, cursor):
+    """Replace the VARCHAR(7) `year_month` of payroll and payroll_jobs with pay_period DATE.
+
+    pay_period holds the first day of the month. The new column is added, backfilled
+    in primary-key batches, then made NOT NULL and indexed before the old one is dropped.
+    """
+    for table, key in (("payroll", "payroll_id"), ("payroll_jobs", "job_id")):
+        if not _column_exists(cursor, table, "year_month"):
+            continue
+        if not _column_exists(cursor, table, "pay_period"):
+            _alter_online(cursor, table, "ADD COLUMN pay_period DATE NULL AFTER `year_month`")
+        _backfill(conn, cursor, table, key,
+                  "pay_period = CAST(CONCAT(`year_month`, '-01') AS DATE)",
+                  "pay_period IS NULL")
+
+    if _column_exists(cursor, "payroll", "year_month"):
+        clauses = ["MODIFY pay_period DATE NOT NULL"]
+        if not _index_exists(cursor, "payroll", "uq_payroll_emp_period"):
+            clauses.append("ADD UNIQUE KEY uq_payroll_emp_period (emp_id, pay_period)")
+        old_unique = _unique_index_on(cursor, "payroll", ["emp_id", "year_month"])
+        if old_unique:
+            clauses.append(f"DROP INDEX `{old_unique}`")
+        clauses.append("DROP COLUMN `year_month`")
+        _alter_online(cursor, "payroll", ", ".join(clauses))
+
+    if _column_exists(cursor, "payroll_jobs", "year_month"):
+        clauses = ["MODIFY pay_period DATE NOT NULL"]
+        if _index_exists(cursor, "payroll_jobs", "idx_jobs_month_status"):
+            clauses.append("DROP INDEX idx_jobs_month_status")
+        if not _index_exists(cursor, "payroll_jobs", "idx_jobs_period_status"):
+            clauses.append("ADD INDEX idx_jobs_period_status (pay_period, mode, status)")
+        clauses.append("DROP COLUMN `year_month`")
+        _alter_online(cursor, "payroll_jobs", ", ".join(clauses))
+
+
+COVERING_INDEXES = [
+    # fetch_payroll_db: filter/sort by period, then emp_id; pay columns read from the index
+    ("payroll", "idx_payroll_period_emp",
+     "(pay_period DESC, emp_id, gross_pay, allowances, deductions, net_pay)"),
+    # fetch_attendance_db: ORDER BY att_date DESC, emp_id over all columns shown
+    ("attendance", "idx_att_date_emp", "(att_date DESC, emp_id, status, in_time, out_time)"),
+    # payroll batches: WHERE status='ACTIVE' AND emp_id > ? ORDER BY emp_id, reading base_salary
+    ("employees", "idx_emp_status_id", "(status, emp_id, base_salary)"),
+]
+
+
+def _m003_covering_indexes(conn, cursor):
+    """Covering indexes for the payroll, attendance and payroll-batch access patterns."""
+    for table, name, columns in COVERING_INDEXES:
+        if not _index_exists(cursor, table, name):
+            _alter_online(cursor, table, f"ADD INDEX {name} {columns}")
+
+
+# Rebuilds attendance_bitmaps rows from raw attendance for emp_id ranges (and optionally one month)
+ATTENDANCE_BITMAP_UPSERT = """
+    INSERT INTO attendance_bitmaps (emp_id, month, present_bits, absent_bits, leave_bits)
+    SELECT emp_id,
+           DATE_SUB(att_date, INTERVAL DAY(att_date) - 1 DAY) AS month,
+           BIT_OR(IF(status = 'PRESENT', 1 << (DAY(att_date) - 1), 0)),
+           BIT_OR(IF(status = 'ABSENT', 1 << (DAY(att_date) - 1), 0)),
+           BIT_OR(IF(status = 'LEAVE', 1 << (DAY(att_date) - 1), 0))
+    FROM attendance
+    WHERE emp_id > %s AND emp_id <= %s {month_filter}
+    GROUP BY emp_id, month
+    ON DUPLICATE KEY UPDATE
+        present_bits = VALUES(present_bits),
+        absent_bits = VALUES(absent_bits),
+        leave_bits = VALUES(leave_bits)
+"""
+
+
+def _m004_attendance_bitmaps(conn, cursor):
+    """Per-employee, per-month status bitmaps (bit d-1 = day d), backfilled in emp_id batches."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS attendance_bitmaps (
+        month DATE NOT NULL,
+        emp_id INT NOT NULL,
+        present_bits INT UNSIGNED NOT NULL DEFAULT 0,
+        absent_bits INT UNSIGNED NOT NULL DEFAULT 0,
+        leave_bits INT UNSIGNED NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, emp_id),
+        INDEX idx_bitmaps_emp (emp_id),
+        FOREIGN KEY (emp_id) REFERENCES employees(emp_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("SELECT MIN(emp_id), MAX(emp_id) FROM attendance")
+    lo, hi = cursor.fetchone()
+    if lo is None:
+        return
+    sql = ATTENDANCE_BITMAP_UPSERT.format(month_filter="")
+    start = lo - 1
+    while start < hi:
+        end = start + max(1, BACKFILL_BATCH // 31)
+        cursor.execute(sql, (start, end))
+        conn.commit()
+        start = end
+
+
+def _m005_directory_versioning(conn, cursor):
+    """Change tracking for the directory snapshot: updated_at stamps and delete tombstones."""
+    for table in ("employees", "departments"):
+        if not _column_exists(cursor, table, "updated_at"):
+            _alter_online(cursor, table,
+                          "ADD COLUMN updated_at TIMESTAMP(6) NOT NULL "
+                          "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+        index = f"idx_{table}_updated"
+        if not _index_exists(cursor, table, index):
+            _alter_online(cursor, table, f"ADD INDEX {index} (updated_at)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS directory_tombstones (
+        seq BIGINT PRIMARY KEY AUTO_INCREMENT,
+        emp_id INT NOT NULL,
+        deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _m001_baseline),
+    (2, "typed payroll period", _m002_typed_pay_period),
+    (3, "covering indexes for payroll and attendance", _m003_covering_indexes),
+    (4, "attendance status bitmaps", _m004_attendance_bitmaps),
+    (5, "directory change tracking", _m005_directory_versioning),
+]
+
+
+# -----------------------
+# RUNNER
+# -----------------------
+def _ensure_version_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        applied_at DATETIME NOT NULL,
+        seconds DECIMAL(10,3) NOT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, target=None, stream=None):
+    """Apply pending migrations up to `target` (default: all). Returns the versions applied.
+
+    A named lock keeps two processes from migrating the same database at once.
+    """
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (LOCK_NAME,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("another process is migrating the schema")
+        try:
+            done = applied_versions(cursor)
+            applied = []
+            for version, name, func in MIGRATIONS:
+                if version in done or (target is not None and version > target):
+                    continue
+                if stream:
+                    print(f"Applying {version:03d} {name} ...", file=stream)
+                started = time.monotonic()
+                func(conn, cursor)
+                elapsed = time.monotonic() - started
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at, seconds) VALUES (%s, %s, NOW(), %s)",
+                    (version, name, round(elapsed, 3))
+                )
+                conn.commit()
+                applied.append(version)
+            return applied
+        finally:
+            cursor.execute("DO RELEASE_LOCK(%s)", (LOCK_NAME,))
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations.")
+    parser.add_argument("--status", action="store_true", help="Show applied and pending migrations")
+    parser.add_argument("--target", type=int, help="Stop after this version")
+    args = parser.parse_args(argv)
+
+    import db_config
+    backend = db_config.get_backend()
+    if backend.name != "mysql":
+        print(f"Migrations apply to MySQL only; the {backend.name} backend creates its schema "
+              "directly in create_tables().", file=sys.stderr)
+        return 2
+    db_config.initialize_database()
+    conn = db_config.create_connection()
+    if conn is None:
+        return 3
+    try:
+        if args.status:
+            cursor = conn.cursor(buffered=True)
+            try:
+                done = applied_versions(cursor)
+            finally:
+                cursor.close()
+            for version, name, _func in MIGRATIONS:
+                print(f"{version:03d} {'applied' if version in done else 'pending':<8} {name}")
+            return 0
+        applied = migrate(conn, args.target, sys.stdout)
+        print(f"{len(applied)} migration(s) applied." if applied else "Schema is up to date.")
+        return 0
+    except (*Error, RuntimeError) as e:
+        print(f"Migration failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
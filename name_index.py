@@ -0,0 +1,173 @@
+"""In-memory prefix index over employee names and IDs, for type-ahead.
+
+Every employee contributes a few search terms (first name, last name,
+"first last" and the emp_id as text), kept lower-cased in one sorted list
+of (term, emp_id) pairs. A prefix lookup is a bisect to the first term
+>= the prefix followed by a short forward scan, so completions cost
+O(log n + k) however large the directory is.
+
+The index is loaded once from the employee directory and then kept current
+without rebuilding: attach() subscribes it to db_config's change events
+(add, update, delete), and sync() applies only the differences when a fresh
+directory listing arrives from elsewhere (e.g. a snapshot revalidation).
+
+Usage:
+    index = NameIndex()
+    index.load(records)          # EmployeeRecord rows
+    index.attach()
+    index.complete("jo")         # [(emp_id, "John Smith"), ...]
+    42 in index                  # known employee id?
+"""
+import bisect
+import threading
+
+import db_config
+
+DEFAULT_LIMIT = 10
+# sync() rebuilds from scratch when more than this share of employees changed
+REBUILD_FRACTION = 0.125
+
+
+def _terms(emp_id, first, last):
+    first = (first or "").strip().lower()
+    last = (last or "").strip().lower()
+    terms = {str(emp_id)}
+    for term in (first, last, f"{first} {last}".strip()):
+        if term:
+            terms.add(term)
+    return terms
+
+
+class NameIndex:
+    """Sorted (term, emp_id) pairs plus {emp_id: (first, last)}; thread-safe."""
+
+    def __init__(self, records=()):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._names = {}
+        self._attached = False
+        if records:
+            self.load(records)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, emp_id):
+        try:
+            return int(emp_id) in self._names
+        except (TypeError, ValueError):
+            return False
+
+    def label(self, emp_id):
+        """"First Last" of a known employee, or None."""
+        names = self._names.get(emp_id)
+        if names is None:
+            return None
+        return " ".join(part for part in names if part)
+
+    # -----------------------
+    # BUILDING + UPDATES
+    # -----------------------
+    def load(self, records):
+        """Replace the contents with `records` (anything with emp_id, first_name, last_name)."""
+        names = {r.emp_id: (r.first_name, r.last_name) for r in records}
+        entries = [(term, emp_id) for emp_id, (first, last) in names.items()
+                   for term in _terms(emp_id, first, last)]
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._names = names
+
+    def _add(self, emp_id, first, last):
+        self._names[emp_id] = (first, last)
+        for term in _terms(emp_id, first, last):
+            bisect.insort(self._entries, (term, emp_id))
+
+    def _remove(self, emp_id):
+        names = self._names.pop(emp_id, None)
+        if names is None:
+            return
+        for term in _terms(emp_id, *names):
+            i = bisect.bisect_left(self._entries, (term, emp_id))
+            if i < len(self._entries) and self._entries[i] == (term, emp_id):
+                del self._entries[i]
+
+    def add(self, emp_id, first, last):
+        """Insert or rename one employee."""
+        with self._lock:
+            self._remove(emp_id)
+            self._add(emp_id, first, last)
+
+    def remove(self, emp_id):
+        with self._lock:
+            self._remove(emp_id)
+
+    def sync(self, records):
+        """Bring the index in line with a full directory listing, touching only what changed."""
+        current = {r.emp_id: (r.first_name, r.last_name) for r in records}
+        with self._lock:
+            gone = [emp_id for emp_id in self._names if emp_id not in current]
+            changed = [(emp_id, names) for emp_id, names in current.items()
+                       if self._names.get(emp_id) != names]
+            if len(gone) + len(changed) > max(1, len(current)) * REBUILD_FRACTION:
+                rebuild = True
+            else:
+                rebuild = False
+                for emp_id in gone:
+                    self._remove(emp_id)
+                for emp_id, (first, last) in changed:
+                    self._remove(emp_id)
+                    self._add(emp_id, first, last)
+        if rebuild:
+            self.load(records)
+
+    def on_change(self, table, action, key, before=None, after=None):
+        """db_config change listener: follow employee inserts, renames and deletions."""
+        if table != "employees":
+            return
+        emp_id = int(key)
+        if action in ("DELETE", "PURGE"):
+            self.remove(emp_id)
+        elif action in ("INSERT", "UPDATE") and after and "first_name" in after:
+            self.add(emp_id, after["first_name"], after.get("last_name"))
+
+    def attach(self):
+        """Follow writes made through db_config in this process."""
+        if not self._attached:
+            db_config.add_change_listener(self.on_change)
+            self._attached = True
+        return self
+
+    def detach(self):
+        if self._attached:
+            db_config.remove_change_listener(self.on_change)
+            self._attached = False
+
+    # -----------------------
+    # LOOKUP
+    # -----------------------
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """Up to `limit` (emp_id, "First Last") whose id or name starts with `prefix`.
+
+        An exact emp_id match comes first; the rest follow in term order.
+        """
+        prefix = (prefix or "").strip().lower()
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        with self._lock:
+            if prefix.isdigit() and int(prefix) in self._names:
+                found.append(int(prefix))
+                seen.add(int(prefix))
+            entries = self._entries
+            i = bisect.bisect_left(entries, (prefix,))
+            while i < len(entries) and len(found) < limit:
+                term, emp_id = entries[i]
+                if not term.startswith(prefix):
+                    break
+                if emp_id not in seen:
+                    seen.add(emp_id)
+                    found.append(emp_id)
+                i += 1
+            return [(emp_id, self.label(emp_id)) for emp_id in found]
@@ -0,0 +1,700 @@
+"""Headless payroll runs for cron and scripts (no Tk import).
+
+Active employees are split into emp_id ranges that are processed in
+parallel worker threads, each with its own connection. Every worker reads
+its range in keyset-paginated chunks, computes pay with
+db_config.calculate_payroll (the same calculation as
+upsert_payroll_for_employee) and writes each chunk with one multi-row
+upsert and one commit. If a chunk fails, its rows are retried one by one
+so a single bad employee does not fail the chunk.
+
+Each run is tracked as a job in `payroll_jobs`, split into emp_id ranges
+in `payroll_job_ranges`. Every chunk commits its payroll rows together with
+the range's checkpoint (last emp_id done) and any per-employee failures in
+`payroll_job_log`. A run that stopped on an error or lost its connection is
+marked FAILED and resumed from the checkpoints by the next run for the same
+month and mode. A job that is still RUNNING is never taken over: a second run
+for the month is refused (use --restart if that process was killed).
+
+With --incremental, only employees whose row changed (employees.updated_at)
+since the start of the month's last COMPLETED job are read, through
+idx_employees_updated, so the cost follows the number of corrections rather
+than the workforce. Of those, only employees whose computed figures differ
+from the stored row are written; unchanged rows keep their generated_on.
+Without a completed job every active employee is compared. Rows of
+employees who are no longer active are counted as stale, as in a full run.
+A change to the pay rules themselves needs a full run.
+
+preview_payroll() computes the same rows without writing anything, so a
+month can be checked (the GUI's payroll preview) before run_payroll commits it.
+
+Usage:
+    python payroll_batch.py 2026-10
+    python payroll_batch.py 2026-10 --incremental
+    python payroll_batch.py --from 2026-01 --to 2026-06 --workers 4 --chunk-size 2000
+    python payroll_batch.py 2026-10 --restart      # ignore an unfinished job, start over
+    python payroll_batch.py --jobs                 # recent jobs with status and duration
+
+Exit codes: 0 all rows written, 1 some employees failed, 2 invalid
+arguments, 3 database unavailable or the month's job is still running.
+"""
+import argparse
+import contextvars
+import datetime
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db_config
+from db_config import create_connection, calculate_payroll, valid_year_month, period_date, Error
+
+DEFAULT_CHUNK_SIZE = 1000
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_NO_DATABASE = 3
+
+UPSERT_SQL = """
+    INSERT INTO payroll (emp_id, pay_period, gross_pay, allowances, deductions, net_pay)
+    VALUES (%s,%s,%s,%s,%s,%s)
+    ON DUPLICATE KEY UPDATE
+        gross_pay=VALUES(gross_pay),
+        allowances=VALUES(allowances),
+        deductions=VALUES(deductions),
+        net_pay=VALUES(net_pay),
+        generated_on=CURRENT_TIMESTAMP
+"""
+
+
+# -----------------------
+# MONTHS & RANGES
+# -----------------------
+def month_range(first, last):
+    """All 'YYYY-MM' months from first to last inclusive."""
+    year, month = int(first[:4]), int(first[5:])
+    end = (int(last[:4]), int(last[5:]))
+    months = []
+    while (year, month) <= end:
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def fetch_active_bounds(since=None):
+    """Return (min_emp_id, max_emp_id, count) of active employees, or None on failure.
+
+    With `since`, only employees updated at or after it are counted.
+    """
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        if since:
+            cursor.execute(CHANGED_BOUNDS_QUERY, (since,))
+        else:
+            cursor.execute("SELECT MIN(emp_id), MAX(emp_id), COUNT(*) FROM employees WHERE status='ACTIVE'")
+        return cursor.fetchone()
+    except Error as e:
+        db_config._show_error("DB Error", str(e))
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def partition_ranges(lo, hi, parts):
+    """Split [lo, hi] into up to `parts` contiguous (after_id, last_id] ranges."""
+    if lo is None or hi is None:
+        return []
+    parts = max(1, min(parts, hi - lo + 1))
+    span = (hi - lo + 1) / parts
+    bounds = [lo - 1] + [lo - 1 + int(round(span * i)) for i in range(1, parts)] + [hi]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
+
+
+# -----------------------
+# BATCHES
+# -----------------------
+BATCH_QUERY = db_config.register_query("payroll_batch chunk", """
+    SELECT e.emp_id, e.base_salary,
+           p.gross_pay, p.allowances, p.deductions, p.net_pay
+    FROM employees e
+    LEFT JOIN payroll p ON p.emp_id = e.emp_id AND p.pay_period = %s
+    WHERE e.status='ACTIVE' AND e.emp_id > %s AND e.emp_id <= %s
+    ORDER BY e.emp_id LIMIT %s
+""", (db_config.SAMPLE_PERIOD, 0, 1000, DEFAULT_CHUNK_SIZE))
+
+# Incremental runs read only employees updated since the month's last completed job. The
+# only predicate is on updated_at, so idx_employees_updated drives the read (a status or
+# emp_id condition would let the planner walk every active employee instead); the rows
+# themselves are then fetched by primary key.
+SAMPLE_SINCE = datetime.datetime.combine(db_config.SAMPLE_DAY, datetime.time())
+
+CHANGED_IDS_QUERY = db_config.register_query("payroll_batch changed employees", """
+    SELECT emp_id FROM employees WHERE updated_at >= %s
+""", (SAMPLE_SINCE,))
+
+CHANGED_BOUNDS_QUERY = db_config.register_query("payroll_batch changed bounds", """
+    SELECT MIN(CASE WHEN status='ACTIVE' THEN emp_id END), MAX(CASE WHEN status='ACTIVE' THEN emp_id END),
+           COALESCE(SUM(status='ACTIVE'), 0)
+    FROM employees WHERE updated_at >= %s
+""", (SAMPLE_SINCE,))
+
+CHANGED_BATCH_SQL = """
+    SELECT e.emp_id, e.base_salary,
+           p.gross_pay, p.allowances, p.deductions, p.net_pay
+    FROM employees e
+    LEFT JOIN payroll p ON p.emp_id = e.emp_id AND p.pay_period = %s
+    WHERE e.emp_id IN ({ids}) AND e.status='ACTIVE'
+    ORDER BY e.emp_id
+"""
+
+
+def _changed_chunks(cursor, period, since, after_id, last_id, chunk_size):
+    """Yield (records, last_id_of_chunk) for employees updated since `since`, in emp_id order."""
+    cursor.execute(CHANGED_IDS_QUERY, (since,))
+    ids = sorted(emp_id for (emp_id,) in cursor.fetchall() if after_id < emp_id <= last_id)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        cursor.execute(CHANGED_BATCH_SQL.format(ids=", ".join(["%s"] * len(chunk))), (period, *chunk))
+        yield cursor.fetchall(), chunk[-1]
+
+
+def _active_chunks(cursor, period, after_id, last_id, chunk_size):
+    """Yield (records, last emp_id read) for active employees, keyset-paginated by emp_id."""
+    while True:
+        cursor.execute(BATCH_QUERY, (period, after_id, last_id, chunk_size))
+        records = cursor.fetchall()
+        if not records:
+            return
+        after_id = records[-1][0]
+        yield records, after_id
+
+
+def incremental_since(year_month):
+    """Start of the month's newest COMPLETED payroll job, or None if it has none (or on error).
+
+    Employees updated since then are the only ones an incremental run needs to read.
+    """
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT MAX(started_at) FROM payroll_jobs WHERE pay_period = %s AND status = 'COMPLETED'
+        """, (period_date(year_month),))
+        return cursor.fetchone()[0]
+    except Error as e:
+        db_config._show_error("DB Error", str(e))
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def iter_payroll_batches(conn, year_month, after_id, last_id, chunk_size=DEFAULT_CHUNK_SIZE,
+                         incremental=False, since=None):
+    """Yield (rows, stats, last_seen_id) per chunk of active employees with after_id < emp_id <= last_id.
+
+    `rows` are computed payroll rows to write. `stats` counts the chunk's employees as
+    {"inserted", "changed", "unchanged"}; in full mode every existing row counts as changed.
+    With incremental=True, rows whose stored figures already match are left out.
+    With `since`, only employees updated at or after it are read.
+    """
+    period = period_date(year_month)
+    cursor = conn.cursor(buffered=True)
+    try:
+        if since:
+            chunks = _changed_chunks(cursor, period, since, after_id, last_id, chunk_size)
+        else:
+            chunks = _active_chunks(cursor, period, after_id, last_id, chunk_size)
+        for records, last_seen in chunks:
+            rows = []
+            stats = {"inserted": 0, "changed": 0, "unchanged": 0}
+            for emp_id, base_salary, *stored in records:
+                figures = calculate_payroll(base_salary)
+                if stored[0] is None:
+                    stats["inserted"] += 1
+                elif incremental and tuple(stored) == figures:
+                    stats["unchanged"] += 1
+                    continue
+                else:
+                    stats["changed"] += 1
+                rows.append((emp_id, period) + figures)
+            yield rows, stats, last_seen
+    finally:
+        cursor.close()
+
+
+def preview_payroll(year_month, after_id, last_id, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False,
+                    cancel=None, since=None):
+    """Compute payroll for active employees with after_id < emp_id <= last_id, writing nothing.
+
+    Yields (rows, stats) per chunk like iter_payroll_batches, so a run can be checked before
+    it is committed with run_payroll. Stops early once `cancel` (a threading.Event) is set.
+    Raises RuntimeError if the database is unavailable.
+    """
+    conn = create_connection()
+    if conn is None:
+        raise RuntimeError("database unavailable")
+    try:
+        for rows, stats, _last_seen in iter_payroll_batches(conn, year_month, after_id, last_id,
+                                                             chunk_size, incremental, since):
+            if cancel is not None and cancel.is_set():
+                return
+            yield rows, stats
+    finally:
+        conn.close()
+
+
+def count_stale_rows(year_month):
+    """Payroll rows of the month whose employee is no longer active (left in place)."""
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM payroll p
+            JOIN employees e ON p.emp_id = e.emp_id
+            WHERE p.pay_period = %s AND e.status <> 'ACTIVE'
+        """, (period_date(year_month),))
+        return cursor.fetchone()[0]
+    except Error as e:
+        db_config._show_error("DB Error", str(e))
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _audit_rows(rows):
+    for emp_id, period, gross, allowances, deductions, net in rows:
+        db_config._record_change("payroll", "UPSERT", f"{emp_id}:{period:%Y-%m}", after={
+            "gross_pay": gross, "allowances": allowances, "deductions": deductions, "net_pay": net,
+        })
+
+
+def write_payroll_batch(conn, rows, before_commit=None):
+    """Upsert one chunk in a single transaction.
+
+    Returns (written, failures) where failures is a list of (emp_id, message). A failed
+    chunk is retried row by row so only the offending employees are reported.
+    before_commit(cursor, failures), if given, runs inside the chunk's final transaction.
+    """
+    cursor = conn.cursor()
+    try:
+        if rows:
+            cursor.executemany(UPSERT_SQL, rows)
+        if before_commit:
+            before_commit(cursor, [])
+        conn.commit()
+        _audit_rows(rows)
+        return len(rows), []
+    except Error:
+        conn.rollback()
+    finally:
+        cursor.close()
+
+    written = 0
+    failures = []
+    cursor = conn.cursor()
+    try:
+        for row in rows:
+            try:
+                cursor.execute(UPSERT_SQL, row)
+                conn.commit()
+                _audit_rows([row])
+                written += 1
+            except Error as e:
+                conn.rollback()
+                failures.append((row[0], str(e)))
+        if before_commit:
+            before_commit(cursor, failures)
+            conn.commit()
+    finally:
+        cursor.close()
+    return written, failures
+
+
+# -----------------------
+# JOBS & CHECKPOINTS
+# -----------------------
+def _open_job(year_month, mode, workers, restart, since=None):
+    """Return (job_id, pending ranges, already processed) for a new or resumed job.
+
+    Only a FAILED job is resumed. The newest job row is read FOR UPDATE, so two runs
+    starting together cannot both claim it or both create a new job; a job that is still
+    RUNNING belongs to another run and makes this one fail (restart=True abandons it).
+    A new job's ranges cover the active employees (updated since `since`, if given).
+    Pending ranges are (range_no, checkpoint_id, last_id) tuples. Returns None on failure.
+    """
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT job_id, processed, status, started_at FROM payroll_jobs
+            WHERE pay_period = %s AND mode = %s AND status IN ('RUNNING','FAILED')
+            ORDER BY job_id DESC LIMIT 1 FOR UPDATE
+        """, (period_date(year_month), mode))
+        job = cursor.fetchone()
+        if job and restart:
+            cursor.execute("UPDATE payroll_jobs SET status='ABANDONED', finished_at=NOW() WHERE job_id=%s",
+                           (job[0],))
+            job = None
+        if job and job[2] == "RUNNING":
+            conn.rollback()
+            db_config._show_error("Payroll Running",
+                                  f"Payroll job {job[0]} for {year_month} is already running (started "
+                                  f"{job[3]}). If that run was killed, start again with --restart.")
+            return None
+
+        if job:
+            job_id, processed = job[:2]
+            cursor.execute("UPDATE payroll_jobs SET status='RUNNING', finished_at=NULL WHERE job_id=%s",
+                           (job_id,))
+            cursor.execute("""
+                SELECT range_no, checkpoint_id, last_id FROM payroll_job_ranges
+                WHERE job_id=%s AND done=0 ORDER BY range_no
+            """, (job_id,))
+            pending = cursor.fetchall()
+        else:
+            if since:
+                cursor.execute(CHANGED_BOUNDS_QUERY, (since,))
+            else:
+                cursor.execute("SELECT MIN(emp_id), MAX(emp_id), COUNT(*) FROM employees WHERE status='ACTIVE'")
+            lo, hi, _count = cursor.fetchone()
+            cursor.execute("""
+                INSERT INTO payroll_jobs (pay_period, mode, status, started_at)
+                VALUES (%s, %s, 'RUNNING', NOW())
+            """, (period_date(year_month), mode))
+            job_id = cursor.lastrowid
+            processed = 0
+            pending = [(i, a, b) for i, (a, b) in enumerate(partition_ranges(lo, hi, workers))]
+            if pending:
+                cursor.executemany("""
+                    INSERT INTO payroll_job_ranges (job_id, range_no, first_id, last_id, checkpoint_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, [(job_id, n, a, b, a) for n, a, b in pending])
+        conn.commit()
+        return job_id, pending, processed
+    except Error as e:
+        conn.rollback()
+        db_config._show_error("DB Error", f"Could not open payroll job: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _checkpoint(job_id, range_no, last_seen_id, scanned):
+    """before_commit callback storing a chunk's checkpoint, counters and failures with its rows."""
+    def apply(cursor, failures):
+        cursor.execute("""
+            UPDATE payroll_job_ranges SET checkpoint_id=%s WHERE job_id=%s AND range_no=%s
+        """, (last_seen_id, job_id, range_no))
+        cursor.execute("""
+            UPDATE payroll_jobs SET processed = processed + %s, failed = failed + %s WHERE job_id=%s
+        """, (scanned, len(failures), job_id))
+        if failures:
+            cursor.executemany("""
+                INSERT INTO payroll_job_log (job_id, emp_id, message, logged_at) VALUES (%s, %s, %s, NOW())
+            """, [(job_id, emp_id, message[:500]) for emp_id, message in failures])
+    return apply
+
+
+def _finish_job(job_id, status):
+    conn = create_connection()
+    if conn is None:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE payroll_jobs SET status=%s, finished_at=NOW() WHERE job_id=%s", (status, job_id))
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        db_config._show_error("DB Error", f"Could not close payroll job {job_id}: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fetch_payroll_jobs(year_month=None, limit=50):
+    """Recent payroll jobs as (job_id, year_month, mode, status, started_at, finished_at,
+    duration_seconds, processed, failed) tuples, newest first."""
+    conn = create_connection()
+    if conn is None:
+        return []
+    cursor = conn.cursor(buffered=True)
+    try:
+        query = """
+            SELECT job_id, pay_period, mode, status, started_at, finished_at,
+                   TIMESTAMPDIFF(SECOND, started_at, COALESCE(finished_at, NOW())),
+                   processed, failed
+            FROM payroll_jobs
+        """
+        params = []
+        if year_month:
+            query += " WHERE pay_period = %s"
+            params.append(period_date(year_month))
+        query += " ORDER BY job_id DESC LIMIT %s"
+        params.append(int(limit))
+        cursor.execute(query, tuple(params))
+        return [(row[0], row[1].strftime("%Y-%m")) + row[2:] for row in cursor.fetchall()]
+    except Error as e:
+        db_config._show_error("DB Error", str(e))
+        return []
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fetch_job_failures(job_id):
+    """(emp_id, message, logged_at) rows recorded for one job."""
+    conn = create_connection()
+    if conn is None:
+        return []
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT emp_id, message, logged_at FROM payroll_job_log
+            WHERE job_id=%s ORDER BY log_id
+        """, (job_id,))
+        return cursor.fetchall()
+    except Error as e:
+        db_config._show_error("DB Error", str(e))
+        return []
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# -----------------------
+# RUNS
+# -----------------------
+class Progress:
+    """Thread-safe counters with throttled progress output.
+
+    callback(progress), if given, is called after every chunk (from the worker thread).
+    `resumed` counts rows done by an earlier run of the same job: part of the
+    progress shown, but not of this run's rate. `sums` are the (gross, allowances,
+    deductions, net) totals of the rows written by this run.
+    """
+
+    def __init__(self, label, total, stream=sys.stderr, interval=1.0, callback=None):
+        self.label = label
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.callback = callback
+        self.resumed = 0
+        self.done = 0
+        self.failed = 0
+        self.counts = {"inserted": 0, "changed": 0, "unchanged": 0}
+        self.sums = [0, 0, 0, 0]
+        self.started = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, written, failed, stats=None, sums=None):
+        with self._lock:
+            self.done += written + failed + (stats or {}).get("unchanged", 0)
+            self.failed += failed
+            for key, value in (stats or {}).items():
+                self.counts[key] += value
+            if sums:
+                self.sums = [a + b for a, b in zip(self.sums, sums)]
+            now = time.monotonic()
+            if self.stream and now - self._last_report >= self.interval:
+                self._last_report = now
+                self.report()
+            if self.callback:
+                self.callback(self)
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def completed(self):
+        """Rows done by this job so far, including those of the run it resumed."""
+        return self.resumed + self.done
+
+    def report(self):
+        pct = 100.0 * self.completed() / self.total if self.total else 100.0
+        print(f"[{self.label}] {self.completed()}/{self.total} ({pct:.0f}%) "
+              f"{self.rate():.0f} rows/s, {self.failed} failed", file=self.stream)
+
+
+def _run_range(job_id, range_no, year_month, after_id, last_id, chunk_size, progress, incremental,
+               since=None):
+    conn = create_connection()
+    if conn is None:
+        raise RuntimeError("database unavailable")
+    failures = []
+    batches = iter_payroll_batches(conn, year_month, after_id, last_id, chunk_size, incremental, since)
+    try:
+        for rows, stats, last_seen in batches:
+            scanned = len(rows) + stats["unchanged"]
+            written, failed = write_payroll_batch(conn, rows, _checkpoint(job_id, range_no, last_seen, scanned))
+            failures.extend(failed)
+            failed_ids = {emp_id for emp_id, _message in failed}
+            kept = [row for row in rows if row[0] not in failed_ids]
+            progress.add(written, len(failed), stats, [sum(row[i] for row in kept) for i in range(2, 6)])
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE payroll_job_ranges SET done=1 WHERE job_id=%s AND range_no=%s",
+                           (job_id, range_no))
+            conn.commit()
+        finally:
+            cursor.close()
+    finally:
+        batches.close()     # release its cursor before the connection, even after an error
+        conn.close()
+    return failures
+
+
+def run_payroll(year_month, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, stream=sys.stderr,
+                incremental=False, restart=False, on_progress=None):
+    """Generate payroll for every active employee in one month as a checkpointed job.
+
+    With incremental=True only employees updated since the month's last completed job are
+    read (see incremental_since). A FAILED job for the same month and mode is resumed
+    unless restart=True; one that is still RUNNING makes this run fail.
+    on_progress(progress) is called with the run's Progress after every chunk.
+    Returns a summary dict {"job_id", "year_month", "resumed", "processed", "failed",
+    "failures", "inserted", "changed", "unchanged", "totals", "stale", "seconds", "rows_per_s"},
+    or None if the database is unavailable or the run was interrupted (its job is
+    left FAILED and resumable). "totals" are the (gross, allowances, deductions, net) sums
+    of the rows this run wrote. "stale" counts rows of employees who are no longer active.
+    """
+    since = incremental_since(year_month) if incremental else None
+    bounds = fetch_active_bounds(since)
+    if bounds is None:
+        return None
+    mode = "INCREMENTAL" if incremental else "FULL"
+    job = _open_job(year_month, mode, workers, restart, since)
+    if job is None:
+        return None
+    job_id, pending, already_done = job
+
+    progress = Progress(f"{year_month} job {job_id}", bounds[2], stream, callback=on_progress)
+    progress.resumed = already_done
+    failures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            # Workers run in a copy of the caller's context so they use the same tenant database
+            futures = [pool.submit(contextvars.copy_context().run, _run_range, job_id, n, year_month,
+                                   a, b, chunk_size, progress, incremental, since)
+                       for n, a, b in pending]
+            for future in futures:
+                failures.extend(future.result())
+    except (*Error, RuntimeError) as e:
+        _finish_job(job_id, "FAILED")
+        db_config._show_error("DB Error", f"Payroll job {job_id} for {year_month} stopped, "
+                                          f"it will resume on the next run: {e}")
+        return None
+    except BaseException:
+        _finish_job(job_id, "FAILED")     # resumable, instead of blocking the month as RUNNING
+        raise
+    _finish_job(job_id, "PARTIAL" if failures else "COMPLETED")
+    if stream:
+        progress.report()
+    elapsed = time.monotonic() - progress.started
+    return {
+        "job_id": job_id,
+        "resumed": already_done > 0,
+        "year_month": year_month,
+        "processed": progress.completed(),
+        "failed": len(failures),
+        "failures": failures,
+        "inserted": progress.counts["inserted"],
+        "changed": progress.counts["changed"],
+        "unchanged": progress.counts["unchanged"],
+        "totals": tuple(progress.sums),
+        "stale": count_stale_rows(year_month) or 0,
+        "seconds": elapsed,
+        "rows_per_s": progress.rate(),
+    }
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def _print_message(kind, title, msg):
+    print(f"[{title}] {msg}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate monthly payroll without the GUI.")
+    parser.add_argument("year_month", nargs="?", help="Month to generate (YYYY-MM)")
+    parser.add_argument("--from", dest="first", help="First month of a range (YYYY-MM)")
+    parser.add_argument("--to", dest="last", help="Last month of a range (YYYY-MM)")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel worker connections")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per commit")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only read employees changed since the month's last completed run, "
+                             "and only rewrite those whose pay differs")
+    parser.add_argument("--restart", action="store_true",
+                        help="Abandon an unfinished job for the month instead of resuming it")
+    parser.add_argument("--jobs", action="store_true", help="List recent payroll jobs and exit")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args(argv)
+
+    if args.jobs:
+        db_config.set_message_handler(_print_message)
+        print(f"{'Job':>6}  {'Month':<8}{'Mode':<13}{'Status':<11}{'Started':<21}{'Secs':>7}{'Done':>9}{'Failed':>8}")
+        for job_id, ym, mode, status, started, _finished, secs, done, failed in fetch_payroll_jobs(args.year_month):
+            print(f"{job_id:>6}  {ym:<8}{mode:<13}{status:<11}{str(started):<21}{secs or 0:>7}{done:>9}{failed:>8}")
+        return EXIT_OK
+
+    if args.year_month:
+        months = [args.year_month]
+        if args.first or args.last:
+            parser.print_usage(sys.stderr)
+            print("Give either a month or --from/--to, not both.", file=sys.stderr)
+            return EXIT_USAGE
+    elif args.first and args.last:
+        if not (valid_year_month(args.first) and valid_year_month(args.last)) or args.first > args.last:
+            print("Invalid month range.", file=sys.stderr)
+            return EXIT_USAGE
+        months = month_range(args.first, args.last)
+    else:
+        parser.print_usage(sys.stderr)
+        print("A month or --from/--to is required.", file=sys.stderr)
+        return EXIT_USAGE
+    if not all(valid_year_month(m) for m in months):
+        print("year_month must be in YYYY-MM format.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.workers < 1 or args.chunk_size < 1:
+        print("--workers and --chunk-size must be positive.", file=sys.stderr)
+        return EXIT_USAGE
+
+    db_config.set_message_handler(_print_message)
+    stream = None if args.quiet else sys.stderr
+    exit_code = EXIT_OK
+    for month in months:
+        summary = run_payroll(month, args.chunk_size, args.workers, stream, args.incremental, args.restart)
+        if summary is None:
+            return EXIT_NO_DATABASE
+        print(f"{month} (job {summary['job_id']}{', resumed' if summary['resumed'] else ''}): {summary['processed']} processed ({summary['inserted']} new, "
+              f"{summary['changed']} changed, {summary['unchanged']} unchanged), "
+              f"{summary['failed']} failed in {summary['seconds']:.1f}s ({summary['rows_per_s']:.0f} rows/s)")
+        if summary["stale"]:
+            print(f"  {summary['stale']} row(s) belong to employees who are no longer active", file=sys.stderr)
+        for emp_id, message in summary["failures"][:20]:
+            print(f"  emp {emp_id}: {message}", file=sys.stderr)
+        if summary["failed"]:
+            exit_code = EXIT_PARTIAL
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
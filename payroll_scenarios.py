@@ -0,0 +1,252 @@
+"""What-if payroll scenarios over the whole active workforce.
+
+The salary roster is read once into columnar arrays (department code and
+salary in cents per employee) and reduced to per-department sums. Every
+payroll component is linear in base salary, so a scenario is evaluated on
+those sums in O(departments) time, without touching the database again.
+
+Totals are computed on department sums, so they can differ from the
+per-employee rounded rows in `payroll` by at most one cent per employee
+and component.
+
+Usage:
+    python payroll_scenarios.py 2026-10 --raise Sales=5 --default-raise 3
+    python payroll_scenarios.py 2026-10 --raise Sales=5 --allowance-rate 0.12
+"""
+import argparse
+import sys
+from array import array
+from decimal import Decimal
+
+from db_config import (
+    create_connection,
+    Error,
+    _show_error,
+    period_date,
+    valid_year_month,
+    ALLOWANCE_RATE,
+    DEDUCTION_RATE,
+)
+
+CENT = Decimal("0.01")
+NO_DEPT = "(No Department)"
+
+
+# -----------------------
+# ROSTER
+# -----------------------
+class SalaryRoster:
+    """Active employees' salaries held column-wise, with per-department sums."""
+
+    def __init__(self, dept_names, dept_codes, salary_cents):
+        self.dept_names = dept_names          # code -> department name
+        self.dept_codes = dept_codes          # array('H'), one entry per employee
+        self.salary_cents = salary_cents      # array('q'), one entry per employee
+        self.codes = {name: code for code, name in enumerate(dept_names)}
+        self.headcount = [0] * len(dept_names)
+        self.cents_sum = [0] * len(dept_names)
+        for code, cents in zip(dept_codes, salary_cents):
+            self.headcount[code] += 1
+            self.cents_sum[code] += cents
+
+    def __len__(self):
+        return len(self.salary_cents)
+
+    @classmethod
+    def load(cls):
+        """Read the active roster in one query. Returns None on failure."""
+        conn = create_connection()
+        if conn is None:
+            return None
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute("""
+                SELECT COALESCE(d.dept_name, %s), e.base_salary
+                FROM employees e
+                LEFT JOIN departments d ON e.dept_id = d.dept_id
+                WHERE e.status = 'ACTIVE'
+            """, (NO_DEPT,))
+            names = []
+            index = {}
+            codes = array("H")
+            cents = array("q")
+            for dept_name, salary in cursor:
+                code = index.get(dept_name)
+                if code is None:
+                    code = index[dept_name] = len(names)
+                    names.append(dept_name)
+                codes.append(code)
+                cents.append(int(Decimal(str(salary or 0)) * 100))
+            return cls(names, codes, cents)
+        except Error as e:
+            _show_error("DB Error", f"Error loading salary roster: {e}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def fetch_payroll_totals(year_month):
+    """Return {dept_name: {"gross", "allowances", "deductions", "net", "headcount"}} from `payroll`."""
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT COALESCE(d.dept_name, %s), COUNT(*),
+                   SUM(p.gross_pay), SUM(p.allowances), SUM(p.deductions), SUM(p.net_pay)
+            FROM payroll p
+            JOIN employees e ON p.emp_id = e.emp_id
+            LEFT JOIN departments d ON e.dept_id = d.dept_id
+            WHERE p.pay_period = %s
+            GROUP BY 1
+        """, (NO_DEPT, period_date(year_month)))
+        totals = {}
+        for dept_name, count, gross, allowances, deductions, net in cursor.fetchall():
+            totals[dept_name] = _figures(gross, allowances, deductions, net, count)
+        return totals
+    except Error as e:
+        _show_error("DB Error", f"Error fetching payroll totals: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# -----------------------
+# SCENARIOS
+# -----------------------
+class Scenario:
+    """A rule set: percentage raises by department, a default raise and payroll rates."""
+
+    def __init__(self, name, dept_raise_pct=None, default_raise_pct=0,
+                 allowance_rate=ALLOWANCE_RATE, deduction_rate=DEDUCTION_RATE):
+        self.name = name
+        self.dept_raise_pct = {k: Decimal(str(v)) for k, v in (dept_raise_pct or {}).items()}
+        self.default_raise_pct = Decimal(str(default_raise_pct or 0))
+        self.allowance_rate = Decimal(str(allowance_rate))
+        self.deduction_rate = Decimal(str(deduction_rate))
+
+    def factor_for(self, dept_name):
+        pct = self.dept_raise_pct.get(dept_name, self.default_raise_pct)
+        return Decimal("1") + pct / Decimal("100")
+
+
+def _figures(gross, allowances, deductions, net, headcount):
+    return {
+        "headcount": headcount,
+        "gross": Decimal(str(gross or 0)).quantize(CENT),
+        "allowances": Decimal(str(allowances or 0)).quantize(CENT),
+        "deductions": Decimal(str(deductions or 0)).quantize(CENT),
+        "net": Decimal(str(net or 0)).quantize(CENT),
+    }
+
+
+def evaluate(roster, scenario, baseline):
+    """Apply one scenario to the roster and compare it against `baseline` payroll totals.
+
+    Returns {"scenario", "departments": {dept: {"scenario", "current", "monthly_delta"}},
+    "total": {...}, "monthly_delta", "annual_delta"}.
+    """
+    departments = {}
+    total = _figures(0, 0, 0, 0, 0)
+    current_total = _figures(0, 0, 0, 0, 0)
+    names = set(roster.dept_names) | set(baseline)
+    for dept_name in sorted(names):
+        code = roster.codes.get(dept_name)
+        if code is None:
+            base = Decimal("0")
+            count = 0
+        else:
+            base = Decimal(roster.cents_sum[code]) / 100 * scenario.factor_for(dept_name)
+            count = roster.headcount[code]
+        allowances = base * scenario.allowance_rate
+        deductions = base * scenario.deduction_rate
+        gross = base + allowances
+        figures = _figures(gross, allowances, deductions, gross - deductions, count)
+        current = baseline.get(dept_name) or _figures(0, 0, 0, 0, 0)
+        departments[dept_name] = {
+            "scenario": figures,
+            "current": current,
+            "monthly_delta": figures["net"] - current["net"],
+        }
+        for key in total:
+            total[key] += figures[key]
+            current_total[key] += current[key]
+
+    monthly_delta = total["net"] - current_total["net"]
+    return {
+        "scenario": scenario.name,
+        "departments": departments,
+        "total": total,
+        "current_total": current_total,
+        "monthly_delta": monthly_delta,
+        "annual_delta": monthly_delta * 12,
+    }
+
+
+def run_scenarios(year_month, scenarios, roster=None):
+    """Evaluate many scenarios against one payroll month. Nothing is written to the database."""
+    if roster is None:
+        roster = SalaryRoster.load()
+    if roster is None:
+        return None
+    baseline = fetch_payroll_totals(year_month)
+    if baseline is None:
+        return None
+    return [evaluate(roster, scenario, baseline) for scenario in scenarios]
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def _parse_raise(values):
+    rules = {}
+    for item in values or []:
+        dept_name, sep, pct = item.rpartition("=")
+        if not sep or not dept_name:
+            raise argparse.ArgumentTypeError(f"Expected DEPT=PCT, got '{item}'")
+        rules[dept_name] = Decimal(pct)
+    return rules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Model payroll impact of raises and rate changes.")
+    parser.add_argument("year_month", help="Payroll month to compare against (YYYY-MM)")
+    parser.add_argument("--scenario", default="What-if", help="Scenario name")
+    parser.add_argument("--raise", dest="raises", action="append", metavar="DEPT=PCT",
+                        help="Raise for one department, e.g. Sales=5 (repeatable)")
+    parser.add_argument("--default-raise", type=Decimal, default=Decimal("0"),
+                        help="Raise %% for departments without a specific rule")
+    parser.add_argument("--allowance-rate", type=Decimal, default=ALLOWANCE_RATE)
+    parser.add_argument("--deduction-rate", type=Decimal, default=DEDUCTION_RATE)
+    args = parser.parse_args(argv)
+
+    if not valid_year_month(args.year_month):
+        print("year_month must be in YYYY-MM format.", file=sys.stderr)
+        return 2
+    try:
+        rules = _parse_raise(args.raises)
+    except (argparse.ArgumentTypeError, ArithmeticError) as e:
+        parser.error(str(e))
+
+    scenario = Scenario(args.scenario, rules, args.default_raise, args.allowance_rate, args.deduction_rate)
+    results = run_scenarios(args.year_month, [scenario])
+    if results is None:
+        return 1
+
+    result = results[0]
+    print(f"Scenario: {result['scenario']} vs payroll {args.year_month}")
+    print(f"{'Department':<20}{'Heads':>7}{'Current Net':>16}{'Scenario Net':>16}{'Delta':>14}")
+    for dept_name, row in result["departments"].items():
+        print(f"{dept_name:<20}{row['scenario']['headcount']:>7}{row['current']['net']:>16}"
+              f"{row['scenario']['net']:>16}{row['monthly_delta']:>+14}")
+    print(f"{'TOTAL':<20}{result['total']['headcount']:>7}{result['current_total']['net']:>16}"
+          f"{result['total']['net']:>16}{result['monthly_delta']:>+14}")
+    print(f"Annual impact: {result['annual_delta']:+}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
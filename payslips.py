@@ -0,0 +1,264 @@
+"""Payslip PDFs for one payroll month, rendered in parallel.
+
+The month's rows are streamed from `payroll` joined to `employees` in
+emp_id keyset pages; each page is rendered into one-page PDF documents by a
+pool of worker processes, while the main process writes the finished
+documents to a directory or into a single zip archive. Only a few pages are
+in flight at a time, so memory stays bounded for any headcount.
+
+The PDF writer below is deliberately minimal (standard Type 1 fonts, text
+only) so no external library or service is needed.
+
+Usage:
+    python payslips.py 2026-10 --out payslips/2026-10
+    python payslips.py 2026-10 --zip payslips-2026-10.zip --workers 8
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import db_config
+from db_config import create_connection, Error, _show_error, valid_year_month, period_date
+
+COMPANY_NAME = "Employee Management & HR System"
+DEFAULT_CHUNK_SIZE = 200
+
+EXIT_OK = 0
+EXIT_USAGE = 2
+EXIT_NO_DATABASE = 3
+
+
+# -----------------------
+# PDF RENDERING
+# -----------------------
+def _pdf_text(value):
+    text = "" if value is None else str(value)
+    data = text.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _money(value):
+    return f"{value:,.2f}" if value is not None else "-"
+
+
+def build_pdf(lines):
+    """One A4 page. `lines` are (font, size, x, y, text) with font in F1 (regular), F2 (bold), F3 (mono)."""
+    content = bytearray()
+    for font, size, x, y, text in lines:
+        content += b"BT /%s %d Tf %d %d Td (%s) Tj ET\n" % (font.encode(), size, x, y, _pdf_text(text))
+    content += b"0.6 w 50 620 m 545 620 l S 50 470 m 545 470 l S\n"
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R /F2 5 0 R /F3 6 0 R >> >> /Contents 7 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + bytes(content) + b"endstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_payslip(row, year_month, company=COMPANY_NAME, generated=None):
+    """PDF bytes for one payroll row (see PAYSLIP_QUERY for the column order)."""
+    (emp_id, first, last, email, job_title, dept_name,
+     gross, allowances, deductions, net, generated_on) = row
+    month = datetime.datetime.strptime(year_month, "%Y-%m").strftime("%B %Y")
+    base = None if gross is None or allowances is None else gross - allowances
+    name = f"{first or ''} {last or ''}".strip()
+    lines = [
+        ("F2", 18, 50, 780, company),
+        ("F1", 12, 50, 758, f"Payslip for {month}"),
+        ("F2", 11, 50, 720, "Employee"),
+        ("F1", 11, 160, 720, f"{name} (ID {emp_id})"),
+        ("F2", 11, 50, 702, "Department"),
+        ("F1", 11, 160, 702, dept_name or "-"),
+        ("F2", 11, 50, 684, "Job title"),
+        ("F1", 11, 160, 684, job_title or "-"),
+        ("F2", 11, 50, 666, "Email"),
+        ("F1", 11, 160, 666, email or "-"),
+        ("F2", 11, 50, 630, "Earnings and deductions"),
+    ]
+    y = 600
+    for label, amount in (("Base salary", base), ("Allowances", allowances), ("Gross pay", gross),
+                          ("Deductions", -deductions if deductions is not None else None)):
+        lines.append(("F1", 11, 50, y, label))
+        lines.append(("F3", 11, 380, y, f"{_money(amount):>20}"))
+        y -= 20
+    lines += [
+        ("F2", 12, 50, 450, "Net pay"),
+        ("F3", 12, 366, 450, f"{_money(net):>20}"),
+        ("F1", 9, 50, 80, f"Payroll generated {generated_on or '-'}; document created {generated or '-'}."),
+    ]
+    return build_pdf(lines)
+
+
+def render_batch(rows, year_month, company=COMPANY_NAME):
+    """Worker entry point: [(file_name, pdf_bytes)] for a page of payroll rows."""
+    generated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    return [(f"payslip-{year_month}-{row[0]}.pdf", render_payslip(row, year_month, company, generated))
+            for row in rows]
+
+
+# -----------------------
+# STREAMING + OUTPUT
+# -----------------------
+PAYSLIP_QUERY = db_config.register_query("payslips page", """
+    SELECT p.emp_id, e.first_name, e.last_name, e.email, e.job_title, d.dept_name,
+           p.gross_pay, p.allowances, p.deductions, p.net_pay, p.generated_on
+    FROM payroll p
+    JOIN employees e ON p.emp_id = e.emp_id
+    LEFT JOIN departments d ON e.dept_id = d.dept_id
+    WHERE p.pay_period = %s AND p.emp_id > %s
+    ORDER BY p.emp_id LIMIT %s
+""", (db_config.SAMPLE_PERIOD, 0, DEFAULT_CHUNK_SIZE))
+
+
+def iter_payslip_rows(conn, year_month, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield pages of payslip rows for the month, in emp_id order."""
+    period = period_date(year_month)
+    cursor = conn.cursor(buffered=True)
+    try:
+        after_id = 0
+        while True:
+            cursor.execute(PAYSLIP_QUERY, (period, after_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+    finally:
+        cursor.close()
+
+
+class _DirectoryOutput:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def add(self, name, data):
+        with open(os.path.join(self.path, name), "wb") as fh:
+            fh.write(data)
+
+    def close(self):
+        pass
+
+
+class _ZipOutput:
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, name, data):
+        self.archive.writestr(name, data)
+
+    def close(self):
+        self.archive.close()
+
+
+def generate_payslips(year_month, out_dir=None, archive=None, workers=None,
+                      chunk_size=DEFAULT_CHUNK_SIZE, company=COMPANY_NAME, stream=sys.stderr):
+    """Render every payslip of the month into `out_dir` or the zip file `archive`.
+
+    Returns {"documents", "bytes", "seconds", "docs_per_s", "path"}, or None on a database error.
+    """
+    conn = create_connection()
+    if conn is None:
+        return None
+    output = _ZipOutput(archive) if archive else _DirectoryOutput(out_dir)
+    workers = workers or os.cpu_count() or 1
+    documents = 0
+    written = 0
+    started = time.monotonic()
+    last_report = started
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            pages = iter_payslip_rows(conn, year_month, chunk_size)
+            while True:
+                # Keep a bounded number of pages in flight; write them back in order
+                while len(pending) < workers * 2:
+                    rows = next(pages, None)
+                    if rows is None:
+                        break
+                    pending.append(pool.submit(render_batch, rows, year_month, company))
+                if not pending:
+                    break
+                for name, data in pending.pop(0).result():
+                    output.add(name, data)
+                    documents += 1
+                    written += len(data)
+                now = time.monotonic()
+                if stream and now - last_report >= 1.0:
+                    last_report = now
+                    print(f"[Payslips] {documents} documents, {documents / (now - started):.0f} docs/s",
+                          file=stream)
+        seconds = time.monotonic() - started
+        return {
+            "documents": documents,
+            "bytes": written,
+            "seconds": seconds,
+            "docs_per_s": documents / seconds if seconds > 0 else 0.0,
+            "path": output.path,
+        }
+    except Error as e:
+        _show_error("DB Error", f"Error generating payslips: {e}")
+        return None
+    finally:
+        output.close()
+        conn.close()
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render payslip PDFs for a payroll month.")
+    parser.add_argument("year_month", help="Payroll month (YYYY-MM)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="Directory to write one PDF per employee into")
+    target.add_argument("--zip", help="Write all PDFs into this zip archive instead")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per render task")
+    parser.add_argument("--company", default=COMPANY_NAME, help="Company name printed on each payslip")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args(argv)
+
+    if not valid_year_month(args.year_month):
+        print("year_month must be in YYYY-MM format.", file=sys.stderr)
+        return EXIT_USAGE
+    if (args.workers is not None and args.workers < 1) or args.chunk_size < 1:
+        print("--workers and --chunk-size must be positive.", file=sys.stderr)
+        return EXIT_USAGE
+
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    summary = generate_payslips(args.year_month, args.out, args.zip, args.workers, args.chunk_size,
+                                args.company, None if args.quiet else sys.stderr)
+    if summary is None:
+        return EXIT_NO_DATABASE
+    print(f"{summary['documents']} payslip(s) for {args.year_month} written to {summary['path']} "
+          f"({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']:.1f}s "
+          f"({summary['docs_per_s']:.0f} docs/s)")
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
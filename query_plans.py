@@ -0,0 +1,378 @@
+"""Query-plan capture and plan regression checks.
+
+Every hot read query is registered in db_config (register_query) together
+with representative parameters. This tool seeds a dedicated local database
+with a fixed, deterministic data set, refreshes the index statistics, asks
+the backend for each registered query's plan and reduces it to what
+matters per table: access type, chosen index and rows examined, plus
+whether the query needs a filesort or a temporary table.
+
+The result is compared with the committed baseline (query_plan_baseline.json,
+one section per backend). A plan regresses when a table's access type gets
+worse (e.g. ref -> ALL), it loses its index, its rows examined more than
+double, or a filesort or temporary table appears; any regression is printed
+and the exit status is 1. Choosing a different index alone is a warning.
+A backend with no section in the baseline fails the check as well (exit
+status 1) until its plans are recorded with --update-baseline.
+
+The committed baseline holds a sqlite section only. Against MySQL the check
+therefore fails until someone records and commits a mysql section by running
+--update-baseline against a MySQL server. Until then there is no MySQL
+plan-regression coverage.
+
+MySQL plans come from EXPLAIN FORMAT=JSON. SQLite's EXPLAIN QUERY PLAN is
+mapped onto the same access types (SCAN -> ALL or index, SEARCH -> ref,
+range or eq_ref) and has no row estimates.
+
+Usage:
+    python query_plans.py                      # compare with the baseline
+    python query_plans.py --update-baseline    # record the current plans
+    python query_plans.py --show               # print plans, no comparison
+    python query_plans.py --database hr_plans_ci
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import sys
+from decimal import Decimal
+
+import db_config
+from db_config import Error
+
+# Imported for the queries they register
+import attendance_board  # noqa: F401
+import directory_cache  # noqa: F401
+import payroll_batch  # noqa: F401
+import payslips  # noqa: F401
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plan_baseline.json")
+DEFAULT_DATABASE = "employee_management_plans"
+
+# Best to worst, as MySQL names them
+ACCESS_TYPES = ("system", "const", "eq_ref", "ref", "fulltext", "ref_or_null", "index_merge",
+                "unique_subquery", "index_subquery", "range", "index", "ALL")
+# Rows examined regress when they grow past this factor and by at least ROWS_SLACK
+ROWS_FACTOR = 2
+ROWS_SLACK = 100
+
+SEED = 20260115
+SEED_EMPLOYEES = 2000
+SEED_DEPARTMENTS = ("HR", "Finance", "IT", "Sales", "Marketing", "Operations", "Legal", "Support")
+SEED_ATTENDANCE_DAYS = 30
+SEED_PAYROLL_MONTHS = 6
+ANALYZED_TABLES = ("departments", "employees", "attendance", "payroll")
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_USAGE = 2
+EXIT_NO_DATABASE = 3
+
+
+# -----------------------
+# SEEDING
+# -----------------------
+def _month_start(day, months_back):
+    month = day.month - 1 - months_back
+    return datetime.date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def seed_database(conn):
+    """Fill an empty database with the fixed plan-check data set; False if it already has employees."""
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("SELECT COUNT(*) FROM employees")
+        if cursor.fetchone()[0]:
+            return False
+        rng = random.Random(SEED)
+        cursor.executemany("INSERT IGNORE INTO departments (dept_name) VALUES (%s)",
+                           [(name,) for name in SEED_DEPARTMENTS])
+        cursor.execute("SELECT dept_id FROM departments ORDER BY dept_id")
+        dept_ids = [row[0] for row in cursor.fetchall()]
+
+        employees = []
+        for i in range(1, SEED_EMPLOYEES + 1):
+            status = "ACTIVE" if i % 10 else rng.choice(("INACTIVE", "TERMINATED"))
+            updated = datetime.datetime.combine(db_config.SAMPLE_DAY, datetime.time(9)) \
+                - datetime.timedelta(days=i % 365 + 1)
+            employees.append((f"First{i}", f"Last{i}", f"employee{i}@example.com", f"555-{i:05d}",
+                              "Engineer", rng.choice(dept_ids), Decimal(rng.randrange(30000, 120000)),
+                              status, updated))
+        cursor.executemany(
+            "INSERT INTO employees (first_name, last_name, email, phone, job_title, dept_id, "
+            "base_salary, status, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", employees)
+        cursor.execute("SELECT emp_id, base_salary FROM employees WHERE status = 'ACTIVE' ORDER BY emp_id")
+        active = cursor.fetchall()
+
+        attendance = []
+        for offset in range(SEED_ATTENDANCE_DAYS):
+            day = db_config.SAMPLE_DAY - datetime.timedelta(days=offset)
+            for emp_id, _salary in active:
+                roll = rng.random()
+                if roll < 0.05:
+                    continue
+                if roll < 0.10:
+                    attendance.append((emp_id, day, None, None, rng.choice(("ABSENT", "LEAVE"))))
+                    continue
+                in_time = datetime.datetime.combine(day, datetime.time(8, rng.randrange(60)))
+                out_time = None if offset == 0 and roll < 0.5 else in_time + datetime.timedelta(hours=9)
+                attendance.append((emp_id, day, in_time, out_time, "PRESENT"))
+        cursor.executemany("INSERT INTO attendance (emp_id, att_date, in_time, out_time, status) "
+                           "VALUES (%s, %s, %s, %s, %s)", attendance)
+
+        payroll = []
+        for months_back in range(SEED_PAYROLL_MONTHS):
+            period = _month_start(db_config.SAMPLE_DAY, months_back)
+            for emp_id, salary in active:
+                gross = (Decimal(salary) / 12).quantize(Decimal("0.01"))
+                allowances = (gross * Decimal("0.10")).quantize(Decimal("0.01"))
+                deductions = (gross * Decimal("0.12")).quantize(Decimal("0.01"))
+                payroll.append((emp_id, period, gross, allowances, deductions,
+                                gross + allowances - deductions))
+        cursor.executemany("INSERT INTO payroll (emp_id, pay_period, gross_pay, allowances, deductions, "
+                           "net_pay) VALUES (%s, %s, %s, %s, %s, %s)", payroll)
+        conn.commit()
+        return True
+    finally:
+        cursor.close()
+
+
+# -----------------------
+# PLAN CAPTURE
+# -----------------------
+def _mysql_plan(document):
+    """Reduce an EXPLAIN FORMAT=JSON document to the plan shape used here."""
+    plan = {"tables": [], "filesort": False, "temporary": False}
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        plan["filesort"] |= bool(node.get("using_filesort"))
+        plan["temporary"] |= bool(node.get("using_temporary_table"))
+        table = node.get("table")
+        if isinstance(table, dict) and "table_name" in table:
+            plan["tables"].append({
+                "table": table["table_name"],
+                "access": table.get("access_type", "ALL"),
+                "key": table.get("key"),
+                "rows": table.get("rows_examined_per_scan"),
+            })
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                walk(value)
+
+    walk(document)
+    return plan
+
+
+_SQLITE_STEP = re.compile(
+    r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?"
+    r"(?: USING (?:(AUTOMATIC )?(?:PARTIAL )?(?:COVERING )?INDEX (\w+)|INTEGER PRIMARY KEY|PRIMARY KEY))?"
+    r"(?: \((.*)\))?")
+
+
+def _sqlite_plan(rows):
+    """Map EXPLAIN QUERY PLAN rows onto MySQL's access types."""
+    plan = {"tables": [], "filesort": False, "temporary": False}
+    for _id, _parent, detail in rows:
+        if detail.startswith("USE TEMP B-TREE"):
+            if "ORDER BY" in detail:
+                plan["filesort"] = True
+            else:
+                plan["temporary"] = True
+            continue
+        match = _SQLITE_STEP.match(detail)
+        if not match:
+            continue
+        verb, table, alias, automatic, index, constraint = match.groups()
+        if verb == "SCAN":
+            access, key = ("index", index) if index else ("ALL", None)
+        elif index is None and "PRIMARY KEY" in detail:
+            access, key = "eq_ref", "PRIMARY"
+        else:
+            # An automatic index is built per query because no real one fits
+            key = None if automatic else index
+            access = "range" if constraint and re.search(r"[<>]", constraint) else "ref"
+        plan["tables"].append({"table": alias or table, "access": access, "key": key, "rows": None})
+    return plan
+
+
+def capture_plans(conn, backend, names=None):
+    """{query name: plan} for the registered queries (all, or `names`)."""
+    parse = _mysql_plan if backend.name == "mysql" else _sqlite_plan
+    plans = {}
+    cursor = conn.cursor(buffered=True)
+    try:
+        for name in sorted(names or db_config.QUERIES):
+            sql, params = db_config.QUERIES[name]
+            plans[name] = parse(backend.explain(cursor, sql, params))
+    finally:
+        cursor.close()
+    return plans
+
+
+# -----------------------
+# COMPARISON
+# -----------------------
+def _rank(access):
+    return ACCESS_TYPES.index(access) if access in ACCESS_TYPES else len(ACCESS_TYPES)
+
+
+def _by_table(plan):
+    """{table: step}; a table read more than once gets '#2', '#3' appended."""
+    steps = {}
+    for step in plan["tables"]:
+        label = step["table"]
+        n = 2
+        while label in steps:
+            label = f"{step['table']}#{n}"
+            n += 1
+        steps[label] = step
+    return steps
+
+
+def compare_plan(baseline, current):
+    """(regressions, warnings) for one query, as lists of messages."""
+    regressions, warnings = [], []
+    old_steps, new_steps = _by_table(baseline), _by_table(current)
+    for table, new in new_steps.items():
+        old = old_steps.get(table)
+        if old is None:
+            warnings.append(f"{table}: new in plan ({new['access']}, key {new['key']})")
+            continue
+        if _rank(new["access"]) > _rank(old["access"]):
+            regressions.append(f"{table}: access {old['access']} -> {new['access']}")
+        if old["key"] and not new["key"]:
+            regressions.append(f"{table}: no longer uses an index (was {old['key']})")
+        elif old["key"] != new["key"]:
+            warnings.append(f"{table}: index {old['key']} -> {new['key']}")
+        if old["rows"] is not None and new["rows"] is not None \
+                and new["rows"] > old["rows"] * ROWS_FACTOR and new["rows"] - old["rows"] >= ROWS_SLACK:
+            regressions.append(f"{table}: rows examined {old['rows']} -> {new['rows']}")
+    for table in old_steps.keys() - new_steps.keys():
+        warnings.append(f"{table}: no longer in plan")
+    for flag, label in (("filesort", "filesort"), ("temporary", "temporary table")):
+        if current[flag] and not baseline[flag]:
+            regressions.append(f"now needs a {label}")
+    return regressions, warnings
+
+
+def load_baseline(path):
+    """{backend name: {query name: plan}}; empty if the file does not exist."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, baseline):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(baseline, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    os.replace(tmp, path)
+
+
+def _describe(plan):
+    steps = ", ".join(
+        f"{s['table']} {s['access']}" + (f" [{s['key']}]" if s["key"] else "")
+        + (f" ~{s['rows']} rows" if s["rows"] is not None else "")
+        for s in plan["tables"])
+    extras = [label for flag, label in (("filesort", "filesort"), ("temporary", "temporary"))
+              if plan[flag]]
+    return steps + (f" (+{', '.join(extras)})" if extras else "")
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture query plans and check them against the baseline.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE,
+                        help="Database to seed and explain against (default: %(default)s; "
+                             "for SQLite, a file of that name in ~/.hr_system)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file (default: %(default)s)")
+    parser.add_argument("--query", action="append", dest="queries",
+                        help="Only this registered query (repeatable; default: all)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--update-baseline", action="store_true",
+                      help="Record the current plans as this backend's baseline")
+    mode.add_argument("--show", action="store_true", help="Print the plans without comparing")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.queries or () if name not in db_config.QUERIES]
+    if unknown:
+        print(f"Unknown query(s): {', '.join(unknown)}", file=sys.stderr)
+        return EXIT_USAGE
+
+    # Never explain against the working database: its data (and so its plans) keep changing
+    db_config.DB_NAME = args.database
+    db_config.DB_SQLITE_PATH = os.path.join(os.path.dirname(db_config.DB_SQLITE_PATH), f"{args.database}.db")
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    db_config.initialize_database()
+    db_config.create_tables()
+    conn = db_config.create_connection()
+    if conn is None:
+        return EXIT_NO_DATABASE
+    backend = db_config.get_backend()
+    try:
+        if seed_database(conn):
+            print(f"Seeded {backend.identity}", file=sys.stderr)
+        backend.analyze_tables(conn, ANALYZED_TABLES)
+        plans = capture_plans(conn, backend, args.queries)
+    except Error as e:
+        print(f"Cannot capture plans: {e}", file=sys.stderr)
+        return EXIT_NO_DATABASE
+    finally:
+        conn.close()
+
+    if args.show:
+        for name, plan in plans.items():
+            print(f"{name}: {_describe(plan)}")
+        return EXIT_OK
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        section = baseline.setdefault(backend.name, {})
+        if not args.queries:
+            section.clear()
+        section.update(plans)
+        save_baseline(args.baseline, baseline)
+        print(f"Recorded {len(plans)} {backend.name} plan(s) in {args.baseline}")
+        return EXIT_OK
+
+    section = baseline.get(backend.name)
+    if not section:
+        print(f"FAIL no {backend.name} section in {args.baseline}; record one with --update-baseline")
+        return EXIT_REGRESSION
+    failed = 0
+    for name, plan in plans.items():
+        if name not in section:
+            failed += 1
+            print(f"FAIL {name}: not in the {backend.name} baseline (run with --update-baseline)")
+            continue
+        regressions, warnings = compare_plan(section[name], plan)
+        if regressions:
+            failed += 1
+            print(f"FAIL {name}: {_describe(plan)}")
+            print(f"     baseline: {_describe(section[name])}")
+        for message in regressions:
+            print(f"     regression: {message}")
+        for message in warnings:
+            print(f"WARN {name}: {message}")
+    if not args.queries:
+        for name in sorted(section.keys() - plans.keys()):
+            print(f"WARN {name}: in the baseline but no longer registered")
+    print(f"{len(plans) - failed} of {len(plans)} plan(s) match the {backend.name} baseline")
+    return EXIT_REGRESSION if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# ------------------------------------------------------
+# COMPACT ROW RECORDS
+# Slotted containers for result rows. Values are kept as the
+# driver returned them and only formatted for display on demand.
+# ------------------------------------------------------
+
+DATETIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def _datetime_text(value):
+    return value.strftime(DATETIME_FMT) if value else ""
+
+
+class EmployeeRecord:
+    __slots__ = ("emp_id", "first_name", "last_name", "email", "phone",
+                 "job_title", "dept_name", "base_salary")
+
+    def __init__(self, emp_id, first_name, last_name, email, phone,
+                 job_title, dept_name, base_salary):
+        self.emp_id = emp_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+        self.phone = phone
+        self.job_title = job_title
+        self.dept_name = dept_name
+        self.base_salary = base_salary
+
+    def get(self, key, default=None):
+        """Dict-style access kept for callers written against dictionary rows."""
+        value = getattr(self, key, default) if key in self.__slots__ else default
+        return default if value is None else value
+
+    def display_values(self):
+        """Row values as strings for a Treeview, in Employees table column order."""
+        return (
+            self.emp_id,
+            _text(self.first_name),
+            _text(self.last_name),
+            _text(self.email),
+            _text(self.phone),
+            _text(self.job_title),
+            _text(self.dept_name),
+            _text(self.base_salary),
+        )
+
+    def __repr__(self):
+        return f"EmployeeRecord(emp_id={self.emp_id!r}, name={self.first_name!r} {self.last_name!r})"
+
+
+class AttendanceRecord:
+    __slots__ = ("att_id", "emp_id", "att_date", "in_time", "out_time", "status")
+
+    def __init__(self, att_id, emp_id, att_date, in_time, out_time, status):
+        self.att_id = att_id
+        self.emp_id = emp_id
+        self.att_date = att_date
+        self.in_time = in_time
+        self.out_time = out_time
+        self.status = status
+
+    def display_values(self):
+        """Row values as strings for a Treeview; timestamps are formatted here, not at fetch."""
+        return (
+            self.att_id,
+            self.emp_id,
+            _text(self.att_date),
+            _datetime_text(self.in_time),
+            _datetime_text(self.out_time),
+            _text(self.status),
+        )
+
+    def __repr__(self):
+        return f"AttendanceRecord(emp_id={self.emp_id!r}, date={self.att_date!r}, status={self.status!r})"
+
+
+def build_records(cls, rows):
+    """Wrap plain tuple rows from a cursor into slotted records."""
+    return [cls(*row) for row in rows]
@@ -0,0 +1,325 @@
+"""HR summary reports as streaming spreadsheets (XLSX or CSV).
+
+Aggregation is done in SQL; rows are read from an unbuffered cursor and
+written straight to the output, so memory stays bounded regardless of row
+count. XLSX files are produced by a small streaming writer on top of
+zipfile (inline strings, one worksheet written row by row), so no
+spreadsheet library is needed.
+
+Reports:
+    headcount   headcount and salary by department
+    register    payroll register for a month or month range, with a totals row
+    attendance  attendance summary per employee for a month range
+
+Usage:
+    python reports.py headcount headcount.xlsx
+    python reports.py register register-2026-10.xlsx --month 2026-10
+    python reports.py register register-q3.csv --month 2026-07 --to 2026-09
+    python reports.py attendance attendance.csv --month 2026-07 --to 2026-09
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import os
+import re
+import sys
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+import db_config
+from db_config import create_connection, Error, _show_error, valid_year_month, period_date
+
+NO_DEPT = "(No Department)"
+
+EXIT_OK = 0
+EXIT_USAGE = 2
+EXIT_DB_ERROR = 3
+
+
+# -----------------------
+# STREAMING WRITERS
+# -----------------------
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+# cellXfs indexes in STYLES_XML
+_STYLE_HEADER, _STYLE_MONEY, _STYLE_DATE, _STYLE_DATETIME = 1, 2, 3, 4
+
+STYLES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="5">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+</styleSheet>"""
+
+
+def _cell(value, style=0):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, Decimal):
+        return f'<c s="{_STYLE_MONEY}"><v>{value}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, datetime.datetime):
+        serial = (value - _EXCEL_EPOCH) / datetime.timedelta(days=1)
+        return f'<c s="{_STYLE_DATETIME}"><v>{serial:.6f}</v></c>'
+    if isinstance(value, datetime.date):
+        serial = (value - _EXCEL_EPOCH.date()).days
+        return f'<c s="{_STYLE_DATE}"><v>{serial}</v></c>'
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxWriter:
+    """Single-sheet XLSX written row by row; only the current row is held in memory."""
+
+    def __init__(self, path, sheet_name="Report"):
+        self.path = path
+        self.sheet_name = escape(re.sub(r"[\x00-\x1f\[\]:*?/\\]", "", sheet_name)[:31] or "Report")
+        self.archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet = self.archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                          b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                          b"<sheetData>")
+        self.rows = 0
+
+    def header(self, columns):
+        self._sheet.write(("<row>" + "".join(_cell(c, _STYLE_HEADER) for c in columns) + "</row>").encode("utf-8"))
+
+    def row(self, values):
+        self._sheet.write(("<row>" + "".join(_cell(v) for v in values) + "</row>").encode("utf-8"))
+        self.rows += 1
+
+    def close(self):
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self.archive.writestr("[Content_Types].xml", """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>""")
+        self.archive.writestr("_rels/.rels", """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>""")
+        self.archive.writestr("xl/workbook.xml", f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{self.sheet_name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>""")
+        self.archive.writestr("xl/_rels/workbook.xml.rels", """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>""")
+        self.archive.writestr("xl/styles.xml", STYLES_XML)
+        self.archive.close()
+
+
+class CsvWriter:
+    """Same interface as XlsxWriter, for plain CSV output."""
+
+    def __init__(self, path, sheet_name=None):
+        self.path = path
+        self.handle = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.handle)
+        self.rows = 0
+
+    def header(self, columns):
+        self.writer.writerow(columns)
+
+    def row(self, values):
+        self.writer.writerow(["" if v is None else v for v in values])
+        self.rows += 1
+
+    def close(self):
+        self.handle.close()
+
+
+def open_writer(path, sheet_name):
+    """XlsxWriter for .xlsx paths, CsvWriter for anything else."""
+    if path.lower().endswith(".xlsx"):
+        return XlsxWriter(path, sheet_name)
+    return CsvWriter(path, sheet_name)
+
+
+# -----------------------
+# REPORT QUERIES
+# -----------------------
+def _month_bounds(first_month, last_month):
+    first = period_date(first_month)
+    last = period_date(last_month)
+    return first, last.replace(day=calendar.monthrange(last.year, last.month)[1])
+
+
+def headcount_report(cursor, month=None, to_month=None):
+    cursor.execute("""
+        SELECT COALESCE(d.dept_name, %s) AS department,
+               SUM(e.status = 'ACTIVE'), SUM(e.status = 'INACTIVE'), SUM(e.status = 'TERMINATED'),
+               SUM(CASE WHEN e.status = 'ACTIVE' THEN e.base_salary END),
+               AVG(CASE WHEN e.status = 'ACTIVE' THEN e.base_salary END),
+               MIN(CASE WHEN e.status = 'ACTIVE' THEN e.base_salary END),
+               MAX(CASE WHEN e.status = 'ACTIVE' THEN e.base_salary END)
+        FROM employees e
+        LEFT JOIN departments d ON e.dept_id = d.dept_id
+        GROUP BY department
+        ORDER BY department
+    """, (NO_DEPT,))
+    columns = ["Department", "Active", "Inactive", "Terminated",
+               "Active Salary Total", "Average Salary", "Min Salary", "Max Salary"]
+
+    def rows():
+        for dept, active, inactive, terminated, total, avg, low, high in cursor:
+            yield (dept, int(active or 0), int(inactive or 0), int(terminated or 0), total,
+                   None if avg is None else Decimal(avg).quantize(Decimal("0.01")), low, high)
+    return columns, rows()
+
+
+def register_report(cursor, month, to_month=None):
+    cursor.execute("""
+        SELECT p.emp_id, e.first_name, e.last_name, COALESCE(d.dept_name, %s), e.job_title,
+               p.pay_period, p.gross_pay, p.allowances, p.deductions, p.net_pay, p.generated_on
+        FROM payroll p
+        JOIN employees e ON p.emp_id = e.emp_id
+        LEFT JOIN departments d ON e.dept_id = d.dept_id
+        WHERE p.pay_period BETWEEN %s AND %s
+        ORDER BY p.pay_period, p.emp_id
+    """, (NO_DEPT, period_date(month), period_date(to_month or month)))
+    columns = ["Emp ID", "First Name", "Last Name", "Department", "Job Title", "Pay Period",
+               "Gross", "Allowances", "Deductions", "Net", "Generated On"]
+
+    def rows():
+        totals = [Decimal("0")] * 4
+        count = 0
+        for row in cursor:
+            count += 1
+            for i in range(4):
+                totals[i] += row[6 + i] or 0
+            yield row
+        yield ("TOTAL", f"{count} payslips", None, None, None, None, *totals, None)
+    return columns, rows()
+
+
+def attendance_report(cursor, month, to_month=None):
+    first, last = _month_bounds(month, to_month or month)
+    cursor.execute("""
+        SELECT e.emp_id, e.first_name, e.last_name, COALESCE(d.dept_name, %s),
+               SUM(a.status = 'PRESENT'), SUM(a.status = 'ABSENT'), SUM(a.status = 'LEAVE'),
+               ROUND(AVG(TIMESTAMPDIFF(MINUTE, a.in_time, a.out_time)) / 60, 2),
+               MIN(a.att_date), MAX(a.att_date)
+        FROM attendance a
+        JOIN employees e ON a.emp_id = e.emp_id
+        LEFT JOIN departments d ON e.dept_id = d.dept_id
+        WHERE a.att_date BETWEEN %s AND %s
+        GROUP BY e.emp_id, e.first_name, e.last_name, d.dept_name
+        ORDER BY e.emp_id
+    """, (NO_DEPT, first, last))
+    columns = ["Emp ID", "First Name", "Last Name", "Department",
+               "Present", "Absent", "Leave", "Avg Hours", "First Day", "Last Day"]
+
+    def rows():
+        for emp_id, first_name, last_name, dept, present, absent, leave, hours, day1, day2 in cursor:
+            yield (emp_id, first_name, last_name, dept, int(present or 0), int(absent or 0),
+                   int(leave or 0), None if hours is None else float(hours), day1, day2)
+    return columns, rows()
+
+
+# key -> (title, query function, needs a month)
+REPORTS = {
+    "headcount": ("Headcount & Salary by Department", headcount_report, False),
+    "register": ("Payroll Register", register_report, True),
+    "attendance": ("Attendance Summary", attendance_report, True),
+}
+
+
+def run_report(key, path, month=None, to_month=None):
+    """Write report `key` to `path` (.xlsx or .csv). Returns the data row count, or None on error.
+
+    month and to_month are ignored by reports that do not take a month (headcount).
+    The report is written to a temporary file next to `path` and renamed over it
+    only once complete, so a failed run never leaves a truncated report behind.
+    """
+    title, query, needs_month = REPORTS[key]
+    if not needs_month:
+        month = to_month = None
+    elif not valid_year_month(month or ""):
+        _show_error("Validation Error", "Month must be in YYYY-MM format.")
+        return None
+    if to_month and (not valid_year_month(to_month) or to_month < month):
+        _show_error("Validation Error", "Invalid month range.")
+        return None
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor()      # unbuffered: rows stream from the server as they are written
+    root, ext = os.path.splitext(path)
+    partial = f"{root}.{os.getpid()}.tmp{ext}"     # same directory, so the rename is atomic
+    writer = None
+    try:
+        columns, rows = query(cursor, month, to_month)
+        writer = open_writer(partial, title)
+        writer.header(columns)
+        for row in rows:
+            writer.row(row)
+        finished, writer = writer, None
+        finished.close()
+        os.replace(partial, path)
+        return finished.rows
+    except (*Error, OSError) as e:
+        _show_error("Report Error", f"Error writing {title}: {e}")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+        try:
+            cursor.close()
+        except Error:
+            pass
+        conn.close()
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write HR summary reports as XLSX or CSV.")
+    parser.add_argument("report", choices=sorted(REPORTS), help="Which report")
+    parser.add_argument("path", help="Output file (.xlsx for a spreadsheet, otherwise CSV)")
+    parser.add_argument("--month", help="Month (YYYY-MM) for register and attendance")
+    parser.add_argument("--to", dest="to_month", help="Last month of a register or attendance range (YYYY-MM)")
+    args = parser.parse_args(argv)
+
+    title, _query, needs_month = REPORTS[args.report]
+    if needs_month and not args.month:
+        print(f"--month is required for the {args.report} report.", file=sys.stderr)
+        return EXIT_USAGE
+    if any(m and not valid_year_month(m) for m in (args.month, args.to_month)):
+        print("Months must be in YYYY-MM format.", file=sys.stderr)
+        return EXIT_USAGE
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    count = run_report(args.report, args.path, args.month, args.to_month)
+    if count is None:
+        return EXIT_DB_ERROR
+    print(f"{title}: {count} row(s) written to {args.path}")
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""Purge terminated employees without long cascade locks.
+
+Deleting an employee lets ON DELETE CASCADE remove all of their attendance
+and payroll history in one transaction, which holds row locks for as long
+as that takes. This job instead works through TERMINATED employees in
+small groups and, for each group:
+
+  1. optionally exports the employees and their history (gzip JSON Lines);
+  2. deletes child rows table by table in batches of at most --batch rows,
+     one short transaction per batch, pausing --pause seconds in between;
+  3. deletes the (now childless) employee rows, records directory
+     tombstones and audit entries.
+
+Every child batch re-reads the group's employees with a shared lock and only
+touches those still TERMINATED, so an employee reactivated mid-run keeps
+their history, and the lock held per batch is bounded by the batch size.
+
+Usage:
+    python retention.py --dry-run
+    python retention.py --export purge-2026-10.jsonl.gz --batch 500 --pause 0.1
+    python retention.py --emp-ids 1200-1300
+
+Exit codes: 0 done, 2 invalid arguments, 3 database error.
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+import db_config
+from db_config import create_connection, Error, _show_error, parse_emp_id_list, EMPLOYEE_AUDIT_COLUMNS
+
+DEFAULT_GROUP_SIZE = 50
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAUSE = 0.05
+
+EXIT_OK = 0
+EXIT_USAGE = 2
+EXIT_DB_ERROR = 3
+
+# Child tables of employees and the order rows are deleted in
+CHILD_TABLES = (
+    ("attendance", "att_id"),
+    ("payroll", "payroll_id"),
+    ("attendance_bitmaps", "emp_id, month"),
+)
+
+
+def _placeholders(values):
+    return ",".join(["%s"] * len(values))
+
+
+def count_terminated(cursor, emp_ids=None):
+    """(employees, {table: child rows}) that a purge would remove."""
+    where, params = "status = 'TERMINATED'", ()
+    if emp_ids:
+        where += f" AND emp_id IN ({_placeholders(emp_ids)})"
+        params = tuple(emp_ids)
+    cursor.execute(f"SELECT COUNT(*) FROM employees WHERE {where}", params)
+    employees = cursor.fetchone()[0]
+    rows = {}
+    for table, _order in CHILD_TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE emp_id IN (SELECT emp_id FROM employees WHERE {where})",
+                       params)
+        rows[table] = cursor.fetchone()[0]
+    return employees, rows
+
+
+def iter_terminated_groups(cursor, group_size, emp_ids=None):
+    """Yield lists of TERMINATED emp_ids, keyset-paginated by emp_id."""
+    if emp_ids:
+        for chunk in db_config._chunks(sorted(set(emp_ids)), group_size):
+            cursor.execute(
+                f"SELECT emp_id FROM employees WHERE status = 'TERMINATED' AND emp_id IN ({_placeholders(chunk)})",
+                tuple(chunk)
+            )
+            group = [row[0] for row in cursor.fetchall()]
+            if group:
+                yield group
+        return
+    after = 0
+    while True:
+        cursor.execute("""
+            SELECT emp_id FROM employees
+            WHERE status = 'TERMINATED' AND emp_id > %s
+            ORDER BY emp_id LIMIT %s
+        """, (after, group_size))
+        group = [row[0] for row in cursor.fetchall()]
+        if not group:
+            return
+        yield group
+        after = group[-1]
+
+
+# -----------------------
+# EXPORT
+# -----------------------
+class Exporter:
+    """One gzip JSON Lines file, one line per purged employee with their history.
+
+    write_group() returns only once the group is on disk (fsync), so the purge that
+    follows it can never commit ahead of its export.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        created = not os.path.exists(path)
+        self.raw = open(path, "ab")
+        if created:
+            _fsync_directory(directory)
+        self.handle = io.TextIOWrapper(gzip.GzipFile(fileobj=self.raw, mode="ab"), encoding="utf-8")
+
+    def _rows(self, cursor, sql, emp_ids):
+        cursor.execute(sql.format(ids=_placeholders(emp_ids)), tuple(emp_ids))
+        columns = [d[0] for d in cursor.description]
+        by_emp = {}
+        for row in cursor.fetchall():
+            item = dict(zip(columns, row))
+            by_emp.setdefault(item["emp_id"], []).append(item)
+        return by_emp
+
+    def write_group(self, cursor, emp_ids):
+        employees = self._rows(cursor, """
+            SELECT e.emp_id, e.first_name, e.last_name, e.email, e.phone, e.job_title,
+                   d.dept_name, e.base_salary, e.status
+            FROM employees e LEFT JOIN departments d ON e.dept_id = d.dept_id
+            WHERE e.emp_id IN ({ids})
+        """, emp_ids)
+        attendance = self._rows(cursor, """
+            SELECT emp_id, att_date, in_time, out_time, status FROM attendance
+            WHERE emp_id IN ({ids}) ORDER BY emp_id, att_date
+        """, emp_ids)
+        payroll = self._rows(cursor, """
+            SELECT emp_id, pay_period, gross_pay, allowances, deductions, net_pay, generated_on FROM payroll
+            WHERE emp_id IN ({ids}) ORDER BY emp_id, pay_period
+        """, emp_ids)
+        lines = []
+        for emp_id in emp_ids:
+            if emp_id not in employees:
+                continue
+            lines.append(json.dumps({
+                "employee": employees[emp_id][0],
+                "attendance": attendance.get(emp_id, []),
+                "payroll": payroll.get(emp_id, []),
+            }, default=str, separators=(",", ":")))
+        if lines:
+            self.handle.write("\n".join(lines) + "\n")
+            self.handle.flush()         # text -> gzip (sync flush) -> raw file
+            os.fsync(self.raw.fileno())
+
+    def close(self):
+        try:
+            self.handle.close()         # writes the gzip trailer; leaves the raw file open
+            self.raw.flush()
+            os.fsync(self.raw.fileno())
+        finally:
+            self.raw.close()
+
+
+def _fsync_directory(directory):
+    """Make a new file's directory entry durable (POSIX; a no-op where directories can't be opened)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# -----------------------
+# PURGE
+# -----------------------
+class PurgeProgress:
+    """Counters with throttled progress output."""
+
+    def __init__(self, total, stream=sys.stderr, interval=1.0):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.purged = 0
+        self.skipped = 0
+        self.rows = {table: 0 for table, _order in CHILD_TABLES}
+        self.batches = 0
+        self.max_batch_s = 0.0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def batch(self, table, deleted, seconds):
+        self.rows[table] += deleted
+        self.batches += 1
+        self.max_batch_s = max(self.max_batch_s, seconds)
+        self._maybe_report()
+
+    def employees(self, purged, skipped):
+        self.purged += purged
+        self.skipped += skipped
+        self._maybe_report()
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        if self.stream and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        done = self.purged + self.skipped
+        pct = 100.0 * done / self.total if self.total else 100.0
+        rows = ", ".join(f"{table} {n}" for table, n in self.rows.items())
+        print(f"[Purge] {done}/{self.total} employees ({pct:.0f}%), rows deleted: {rows}; "
+              f"longest batch {self.max_batch_s * 1000:.0f} ms", file=self.stream)
+
+
+def _still_terminated(cursor, emp_ids, lock="FOR SHARE"):
+    cursor.execute(
+        f"SELECT emp_id FROM employees WHERE status = 'TERMINATED' AND emp_id IN ({_placeholders(emp_ids)}) {lock}",
+        tuple(emp_ids)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _delete_children(conn, cursor, emp_ids, batch_size, pause, progress):
+    """Delete the group's child rows in bounded transactions; return the ids still TERMINATED."""
+    for table, order in CHILD_TABLES:
+        while emp_ids:
+            started = time.monotonic()
+            emp_ids = _still_terminated(cursor, emp_ids)
+            if not emp_ids:
+                conn.commit()
+                break
+            cursor.execute(
+                f"DELETE FROM {table} WHERE emp_id IN ({_placeholders(emp_ids)}) ORDER BY {order} LIMIT %s",
+                tuple(emp_ids) + (batch_size,)
+            )
+            deleted = cursor.rowcount
+            conn.commit()
+            progress.batch(table, deleted, time.monotonic() - started)
+            if deleted < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return emp_ids
+
+
+def _delete_employees(conn, cursor, emp_ids):
+    """Delete childless employees; return their audit before-images."""
+    cursor.execute(
+        "SELECT emp_id, " + ", ".join(EMPLOYEE_AUDIT_COLUMNS) + " FROM employees "
+        f"WHERE status = 'TERMINATED' AND emp_id IN ({_placeholders(emp_ids)}) FOR UPDATE",
+        tuple(emp_ids)
+    )
+    images = {row[0]: dict(zip(EMPLOYEE_AUDIT_COLUMNS, row[1:])) for row in cursor.fetchall()}
+    if images:
+        ids = tuple(images)
+        cursor.execute(f"DELETE FROM employees WHERE emp_id IN ({_placeholders(ids)})", ids)
+        cursor.executemany("INSERT INTO directory_tombstones (emp_id) VALUES (%s)", [(i,) for i in ids])
+    conn.commit()
+    return images
+
+
+def purge_terminated(emp_ids=None, group_size=DEFAULT_GROUP_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                     pause=DEFAULT_PAUSE, export_path=None, dry_run=False, stream=sys.stderr):
+    """Purge TERMINATED employees (all, or those in `emp_ids`) and their history.
+
+    Returns {"employees", "purged", "skipped", "rows": {table: n}, "export_path",
+    "dry_run", "seconds", "max_batch_ms"}, or None on a database error.
+    """
+    conn = create_connection()
+    if conn is None:
+        return None
+    cursor = conn.cursor(buffered=True)
+    exporter = None
+    try:
+        total, child_rows = count_terminated(cursor, emp_ids)
+        progress = PurgeProgress(total, stream)
+        if dry_run:
+            progress.rows = child_rows
+        else:
+            if export_path:
+                exporter = Exporter(export_path)
+            groups = iter_terminated_groups(conn.cursor(buffered=True), group_size, emp_ids)
+            for group in groups:
+                if exporter is not None:
+                    exporter.write_group(cursor, group)
+                    conn.commit()
+                remaining = _delete_children(conn, cursor, group, batch_size, pause, progress)
+                images = _delete_employees(conn, cursor, remaining) if remaining else {}
+                for emp_id, before in images.items():
+                    db_config._record_change("employees", "PURGE", emp_id, before=before)
+                progress.employees(len(images), len(group) - len(images))
+            if stream:
+                progress.report()
+        return {
+            "employees": total,
+            "purged": progress.purged,
+            "skipped": progress.skipped,
+            "rows": dict(progress.rows),
+            "export_path": export_path if exporter is not None else None,
+            "dry_run": dry_run,
+            "seconds": time.monotonic() - progress.started,
+            "max_batch_ms": progress.max_batch_s * 1000,
+        }
+    except Error as e:
+        conn.rollback()
+        _show_error("DB Error", f"Error purging terminated employees: {e}")
+        return None
+    finally:
+        if exporter is not None:
+            exporter.close()
+        cursor.close()
+        conn.close()
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Purge TERMINATED employees and their history in small batches.")
+    parser.add_argument("--emp-ids", help="Only these employees, e.g. 1,4,10-20 (must be TERMINATED)")
+    parser.add_argument("--group-size", type=int, default=DEFAULT_GROUP_SIZE, help="Employees handled together")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE, help="Max child rows per delete transaction")
+    parser.add_argument("--pause", type=float, default=DEFAULT_PAUSE, help="Seconds to sleep between batches")
+    parser.add_argument("--export", help="Write purged employees and history to this .jsonl.gz file first")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be purged")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args(argv)
+
+    if args.group_size < 1 or args.batch < 1 or args.pause < 0:
+        print("--group-size and --batch must be positive, --pause not negative.", file=sys.stderr)
+        return EXIT_USAGE
+    emp_ids = None
+    if args.emp_ids:
+        try:
+            emp_ids = parse_emp_id_list(args.emp_ids)
+        except ValueError as e:
+            print(f"Invalid --emp-ids: {e}", file=sys.stderr)
+            return EXIT_USAGE
+
+    db_config.set_message_handler(lambda kind, title, msg: print(f"[{title}] {msg}", file=sys.stderr))
+    summary = purge_terminated(emp_ids, args.group_size, args.batch, args.pause, args.export,
+                               args.dry_run, None if args.quiet else sys.stderr)
+    if summary is None:
+        return EXIT_DB_ERROR
+    rows = ", ".join(f"{table} {n}" for table, n in summary["rows"].items())
+    if summary["dry_run"]:
+        print(f"Would purge {summary['employees']} terminated employee(s); child rows: {rows}")
+        return EXIT_OK
+    print(f"Purged {summary['purged']} of {summary['employees']} terminated employee(s) "
+          f"in {summary['seconds']:.1f}s; rows deleted: {rows}; longest batch {summary['max_batch_ms']:.0f} ms")
+    if summary["skipped"]:
+        print(f"  {summary['skipped']} employee(s) were no longer TERMINATED and were kept", file=sys.stderr)
+    if summary["export_path"]:
+        print(f"  exported to {summary['export_path']}")
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,533 @@
+"""Storage backends behind db_config: MySQL server or embedded SQLite.
+
+Both backends hand out connections with the subset of the mysql.connector
+API the rest of the code uses (cursor(buffered=, dictionary=), execute,
+executemany, fetch*, iteration, rowcount, lastrowid, commit, rollback,
+start_transaction, is_connected, close), so the employee, attendance and
+payroll functions run unchanged on either.
+
+SQLiteBackend keeps the database in one local file in WAL mode (readers
+never block the writer) with foreign keys enforced. Statements written for
+MySQL are translated once per distinct SQL text:
+
+    %s                          -> ?
+    INSERT IGNORE               -> INSERT OR IGNORE
+    ON DUPLICATE KEY UPDATE     -> ON CONFLICT (<unique key>) DO UPDATE SET
+    VALUES(col)                 -> excluded.col
+    CURRENT_TIMESTAMP           -> NOW()  (local time, like MySQL)
+    SELECT ... FOR UPDATE/SHARE -> the lock clause is dropped and the
+                                   transaction is started with BEGIN IMMEDIATE
+
+NOW(), CURDATE() and TIMESTAMPDIFF() are provided as SQL functions. DECIMAL,
+DATE and DATETIME/TIMESTAMP columns come back as Decimal, date and datetime,
+like they do from MySQL. migrations.py is MySQL-only: SQLite creates its
+current schema directly and migrations.py refuses to run against it.
+"""
+import datetime
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+try:
+    import mysql.connector
+    from mysql.connector import pooling
+except ImportError:          # SQLite-only installs do not need the MySQL driver
+    mysql = None
+
+# Catch-all for driver errors: use as `except Error` with either backend. It is a tuple,
+# so unpack it when catching other exceptions too: `except (*Error, OSError)`.
+Error = (sqlite3.Error,) + ((mysql.connector.Error,) if mysql is not None else ())
+
+CENT = Decimal("0.01")
+
+
+# -----------------------
+# MYSQL
+# -----------------------
+class MySQLBackend:
+    name = "mysql"
+
+    def __init__(self, host, user, password, database, pool_size=0, pool_timeout=10.0):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python is not installed")
+        self.host = host
+        self.user = user
+        self.password = password
+        self.database = database
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.identity = f"{host}-{database}"
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _connection_args(self):
+        return dict(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=False,
+            use_pure=False   # C extension when installed; rows are built as tuples in C
+        )
+
+    def configure_pool(self, size=None):
+        """(Re)create the shared connection pool; size 0 disables pooling."""
+        if size is not None:
+            self.pool_size = size
+        self._pool = None
+        if self.pool_size > 0:
+            self._pool = pooling.MySQLConnectionPool(
+                pool_name=f"hr_{self.database}", pool_size=self.pool_size, **self._connection_args()
+            )
+        return self._pool
+
+    def _pooled_connection(self):
+        """Borrow a pooled connection, waiting up to pool_timeout while all are in use."""
+        deadline = time.monotonic() + self.pool_timeout
+        while True:
+            try:
+                return self._pool.get_connection()
+            except mysql.connector.errors.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.005)
+
+    def connect(self):
+        if self.pool_size > 0:
+            if self._pool is None:
+                with self._pool_lock:
+                    if self._pool is None:
+                        self.configure_pool()
+            return self._pooled_connection()
+        return mysql.connector.connect(**self._connection_args())
+
+    def initialize_database(self):
+        conn = mysql.connector.connect(host=self.host, user=self.user, password=self.password)
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute(
+                f"CREATE DATABASE IF NOT EXISTS `{self.database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def create_schema(self, conn):
+        import migrations
+        migrations.migrate(conn)
+
+    # Bulk copy support (backup.py)
+    def estimate_rows(self, cursor, table):
+        """Approximate row count from table statistics; no table scan."""
+        cursor.execute("""
+            SELECT TABLE_ROWS FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (table,))
+        row = cursor.fetchone()
+        return int(row[0] or 0) if row else 0
+
+    def block_writes(self, conn):
+        """Hold off all writers until unblock_writes(); needs the RELOAD privilege."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("FLUSH TABLES WITH READ LOCK")
+        finally:
+            cursor.close()
+
+    def unblock_writes(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UNLOCK TABLES")
+        finally:
+            cursor.close()
+
+    def begin_bulk_load(self, conn):
+        """Skip foreign key and unique checks for this session while loading trusted rows."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        finally:
+            cursor.close()
+
+    def truncate_table(self, conn, table):
+        """Empty a table; call on a begin_bulk_load() session so referenced tables can be truncated."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"TRUNCATE TABLE `{table}`")
+        finally:
+            cursor.close()
+
+    # Query plans (query_plans.py)
+    def analyze_tables(self, conn, tables):
+        """Refresh index statistics so EXPLAIN sees the current data."""
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute("ANALYZE TABLE " + ", ".join(f"`{table}`" for table in tables))
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def explain(self, cursor, sql, params=()):
+        """The optimizer's plan for one statement: EXPLAIN FORMAT=JSON, parsed."""
+        cursor.execute("EXPLAIN FORMAT=JSON " + sql, params)
+        return json.loads(cursor.fetchone()[0])
+
+
+# -----------------------
+# SQLITE
+# -----------------------
+def _now():
+    return datetime.datetime.now().isoformat(" ", "microseconds")
+
+
+def _parse_datetime(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def _timestampdiff(unit, start, end):
+    if start is None or end is None:
+        return None
+    seconds = (_parse_datetime(end) - _parse_datetime(start)).total_seconds()
+    per = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}[unit.upper()]
+    return int(seconds / per)
+
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()).quantize(CENT))
+sqlite3.register_converter("DATE", lambda b: datetime.date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda b: datetime.datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.datetime.fromisoformat(b.decode()))
+
+# Unique key used as the ON CONFLICT target when translating ON DUPLICATE KEY UPDATE
+CONFLICT_TARGETS = {
+    "departments": "dept_name",
+    "employees": "email",
+    "attendance": "emp_id, att_date",
+    "payroll": "emp_id, pay_period",
+    "attendance_bitmaps": "month, emp_id",
+    "schema_migrations": "version",
+}
+
+_INSERT_TABLE = re.compile(r"\bINSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)`?", re.I)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_FUNC = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.I)
+_LOCK_CLAUSE = re.compile(r"\s+FOR\s+(?:UPDATE|SHARE)\b", re.I)
+_WRITE_VERB = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+
+
+@functools.lru_cache(maxsize=512)
+def translate_sql(sql):
+    """MySQL-flavoured SQL -> (SQLite SQL, needs a write transaction)."""
+    locking = bool(_LOCK_CLAUSE.search(sql))
+    out = _LOCK_CLAUSE.sub("", sql)
+    out = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", out, flags=re.I)
+    out = re.sub(r"\bCURRENT_TIMESTAMP\b(?!\s*\()", "NOW()", out, flags=re.I)
+    out = re.sub(r"\bTIMESTAMPDIFF\s*\(\s*(\w+)\s*,", r"TIMESTAMPDIFF('\1',", out, flags=re.I)
+    if _ON_DUPLICATE.search(out):
+        head, tail = _ON_DUPLICATE.split(out, 1)
+        table = _INSERT_TABLE.search(head).group(1)
+        tail = _VALUES_FUNC.sub(r"excluded.\1", tail)
+        out = f"{head}ON CONFLICT ({CONFLICT_TARGETS[table]}) DO UPDATE SET{tail}"
+    out = out.replace("%s", "?")
+    return out, locking or bool(_WRITE_VERB.match(out))
+
+
+class SQLiteCursor:
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self._dictionary = dictionary
+
+    def _begin_if_needed(self, writes):
+        if writes and not self._conn.raw.in_transaction:
+            self._cursor.execute("BEGIN IMMEDIATE")
+
+    def execute(self, sql, params=()):
+        sql, writes = translate_sql(sql)
+        self._begin_if_needed(writes)
+        self._cursor.execute(sql, tuple(params or ()))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sql, writes = translate_sql(sql)
+        self._begin_if_needed(writes)
+        self._cursor.executemany(sql, [tuple(p) for p in seq_of_params])
+        return self
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {d[0]: value for d, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A sqlite3 connection with explicit transactions and mysql.connector-style methods."""
+
+    def __init__(self, path, timeout):
+        self.raw = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.raw.execute("PRAGMA foreign_keys = ON")
+        self.raw.execute("PRAGMA synchronous = NORMAL")
+        self.raw.create_function("NOW", 0, _now)
+        self.raw.create_function("CURDATE", 0, lambda: datetime.date.today().isoformat())
+        self.raw.create_function("TIMESTAMPDIFF", 3, _timestampdiff)
+        self._open = True
+
+    def cursor(self, buffered=None, dictionary=False):
+        return SQLiteCursor(self, dictionary)
+
+    def start_transaction(self, consistent_snapshot=False, readonly=False, **_kwargs):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN")
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        if self._open:
+            self.rollback()
+            self.raw.close()
+            self._open = False
+
+
+SQLITE_SCHEMA_VERSION = 1
+
+# Same tables and semantics as the MySQL schema after migrations 1-5
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS departments (
+    dept_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dept_name VARCHAR(100) NOT NULL UNIQUE,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_departments_updated ON departments (updated_at);
+
+CREATE TABLE IF NOT EXISTS employees (
+    emp_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100),
+    email VARCHAR(150) UNIQUE,
+    phone VARCHAR(20),
+    hire_date DATETIME DEFAULT (datetime('now', 'localtime')),
+    job_title VARCHAR(100),
+    dept_id INTEGER REFERENCES departments(dept_id) ON DELETE SET NULL,
+    base_salary DECIMAL(12,2) DEFAULT 0,
+    status VARCHAR(10) DEFAULT 'ACTIVE' CHECK (status IN ('ACTIVE','INACTIVE','TERMINATED')),
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_emp_status_id ON employees (status, emp_id, base_salary);
+CREATE INDEX IF NOT EXISTS idx_employees_updated ON employees (updated_at);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    att_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    emp_id INTEGER NOT NULL REFERENCES employees(emp_id) ON DELETE CASCADE,
+    att_date DATE NOT NULL,
+    in_time DATETIME,
+    out_time DATETIME,
+    status VARCHAR(10) DEFAULT 'PRESENT' CHECK (status IN ('PRESENT','ABSENT','LEAVE')),
+    UNIQUE (emp_id, att_date)
+);
+CREATE INDEX IF NOT EXISTS idx_att_date_emp ON attendance (att_date DESC, emp_id, status, in_time, out_time);
+
+CREATE TABLE IF NOT EXISTS payroll (
+    payroll_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    emp_id INTEGER NOT NULL REFERENCES employees(emp_id) ON DELETE CASCADE,
+    pay_period DATE NOT NULL,
+    gross_pay DECIMAL(12,2),
+    allowances DECIMAL(12,2),
+    deductions DECIMAL(12,2),
+    net_pay DECIMAL(12,2),
+    generated_on DATETIME DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (emp_id, pay_period)
+);
+CREATE INDEX IF NOT EXISTS idx_payroll_period_emp
+    ON payroll (pay_period DESC, emp_id, gross_pay, allowances, deductions, net_pay);
+
+CREATE TABLE IF NOT EXISTS audit_log (
+    audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    logged_at DATETIME NOT NULL,
+    actor VARCHAR(100),
+    table_name VARCHAR(64) NOT NULL,
+    action VARCHAR(16) NOT NULL,
+    row_key VARCHAR(100) NOT NULL,
+    before_data TEXT,
+    after_data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_audit_row ON audit_log (table_name, row_key, logged_at);
+
+CREATE TABLE IF NOT EXISTS payroll_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pay_period DATE NOT NULL,
+    mode VARCHAR(12) NOT NULL DEFAULT 'FULL' CHECK (mode IN ('FULL','INCREMENTAL')),
+    status VARCHAR(10) NOT NULL DEFAULT 'RUNNING'
+        CHECK (status IN ('RUNNING','COMPLETED','PARTIAL','FAILED','ABANDONED')),
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_period_status ON payroll_jobs (pay_period, mode, status);
+
+CREATE TABLE IF NOT EXISTS payroll_job_ranges (
+    job_id INTEGER NOT NULL REFERENCES payroll_jobs(job_id) ON DELETE CASCADE,
+    range_no INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    checkpoint_id INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, range_no)
+);
+
+CREATE TABLE IF NOT EXISTS payroll_job_log (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL REFERENCES payroll_jobs(job_id) ON DELETE CASCADE,
+    emp_id INTEGER NOT NULL,
+    message VARCHAR(500),
+    logged_at DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_log_job ON payroll_job_log (job_id);
+
+CREATE TABLE IF NOT EXISTS attendance_bitmaps (
+    month DATE NOT NULL,
+    emp_id INTEGER NOT NULL REFERENCES employees(emp_id) ON DELETE CASCADE,
+    present_bits INTEGER NOT NULL DEFAULT 0,
+    absent_bits INTEGER NOT NULL DEFAULT 0,
+    leave_bits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, emp_id)
+);
+CREATE INDEX IF NOT EXISTS idx_bitmaps_emp ON attendance_bitmaps (emp_id);
+
+CREATE TABLE IF NOT EXISTS directory_tombstones (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    emp_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP(6) NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+
+-- ON UPDATE CURRENT_TIMESTAMP(6)
+CREATE TRIGGER IF NOT EXISTS trg_employees_updated AFTER UPDATE ON employees
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE employees SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') WHERE emp_id = NEW.emp_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_departments_updated AFTER UPDATE ON departments
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE departments SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') WHERE dept_id = NEW.dept_id;
+END;
+"""
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.identity = f"sqlite-{os.path.abspath(path)}"
+
+    def configure_pool(self, size=None):
+        """Connections are in-process file handles; there is nothing to pool."""
+        return None
+
+    def connect(self):
+        return SQLiteConnection(self.path, self.timeout)
+
+    def initialize_database(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")   # persistent for the database file
+        finally:
+            conn.close()
+
+    def create_schema(self, conn):
+        raw = conn.raw
+        version = raw.execute("PRAGMA user_version").fetchone()[0]
+        if version < SQLITE_SCHEMA_VERSION:
+            raw.executescript(SQLITE_SCHEMA)
+            raw.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}")
+
+    # Bulk copy support (backup.py)
+    def estimate_rows(self, cursor, table):
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        return int(cursor.fetchone()[0])
+
+    def block_writes(self, conn):
+        """Take the database write lock; readers that start now all see the same data."""
+        conn.raw.execute("BEGIN IMMEDIATE")
+
+    def unblock_writes(self, conn):
+        conn.rollback()
+
+    def begin_bulk_load(self, conn):
+        """Skip foreign key checks on this connection (must be outside a transaction).
+
+        Inserts still serialise on SQLite's single writer.
+        """
+        conn.raw.execute("PRAGMA foreign_keys = OFF")
+
+    def truncate_table(self, conn, table):
+        conn.raw.execute("BEGIN IMMEDIATE")
+        conn.raw.execute(f"DELETE FROM {table}")
+        conn.commit()
+
+    # Query plans (query_plans.py)
+    def analyze_tables(self, conn, tables):
+        for table in tables:
+            conn.raw.execute(f"ANALYZE {table}")
+        conn.commit()
+
+    def explain(self, cursor, sql, params=()):
+        """The planner's plan for one statement: EXPLAIN QUERY PLAN rows (id, parent, detail)."""
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [(row[0], row[1], row[3]) for row in cursor.fetchall()]
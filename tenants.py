@@ -0,0 +1,319 @@
+"""Several company databases served from one process, one per tenant.
+
+Tenants are listed in a JSON file (HR_TENANTS_FILE, default
+~/.hr_system/tenants.json):
+
+    {"tenants": {
+        "acme":   {"database": "hr_acme"},
+        "globex": {"database": "hr_globex", "host": "db2.local", "pool_size": 8},
+        "demo":   {"backend": "sqlite", "path": "~/.hr_system/demo.db"}
+    }}
+
+MySQL tenants default to db_config's host, user and password, so several
+databases on one local server need nothing but their names. Each tenant
+gets its own storage backend and connection pool.
+
+Once a TenantRouter is installed, every db_config function (and everything
+built on it: payroll_batch, reports, directory_cache, the audit log) uses
+the database of the tenant selected with use_tenant(); code outside
+use_tenant() keeps using the configured default database. The tenant is
+held in a context variable, so it follows asyncio tasks and work submitted
+with contextvars.copy_context() (payroll_batch workers are).
+
+fan_out() runs one function for every tenant concurrently and returns the
+results per tenant; fetch_all_employees() and generate_payroll_all() merge
+the most common ones.
+
+Usage:
+    python tenants.py list
+    python tenants.py init                       # create databases and schema
+    python tenants.py employees > employees.csv  # every tenant's directory
+    python tenants.py payroll 2026-10 --incremental
+"""
+import argparse
+import contextlib
+import contextvars
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import audit_log
+import db_config
+import storage
+from db_config import Error
+from records import EmployeeRecord, build_records
+
+TENANTS_FILE = os.environ.get(
+    "HR_TENANTS_FILE", os.path.join(os.path.expanduser("~"), ".hr_system", "tenants.json"))
+DEFAULT_POOL_SIZE = 4
+DEFAULT_FAN_OUT = 8
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_NO_DATABASE = 3
+
+_current = contextvars.ContextVar("hr_tenant", default=None)
+
+
+def current_tenant():
+    """Name of the tenant selected in this context, or None for the default database."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def use_tenant(name):
+    """Route db_config calls made inside the block to `name`'s database."""
+    token = _current.set(name)
+    try:
+        yield name
+    finally:
+        _current.reset(token)
+
+
+# -----------------------
+# CONFIGURATION
+# -----------------------
+def make_backend(settings):
+    """Storage backend for one tenant's settings dict (see the module docstring)."""
+    kind = settings.get("backend", "mysql")
+    if kind == "sqlite":
+        return storage.SQLiteBackend(os.path.expanduser(settings["path"]))
+    if kind == "mysql":
+        return storage.MySQLBackend(
+            settings.get("host", db_config.DB_HOST),
+            settings.get("user", db_config.DB_USER),
+            settings.get("password", db_config.DB_PASS),
+            settings["database"],
+            settings.get("pool_size", DEFAULT_POOL_SIZE),
+            settings.get("pool_timeout", db_config.DB_POOL_TIMEOUT),
+        )
+    raise ValueError(f"unknown backend '{kind}'")
+
+
+def load_tenants(path=TENANTS_FILE):
+    """{name: settings} from a tenants file; ValueError if it is malformed."""
+    with open(path, encoding="utf-8") as fh:
+        tenants = json.load(fh).get("tenants")
+    if not isinstance(tenants, dict) or not tenants:
+        raise ValueError(f"{path}: no tenants defined")
+    for name, settings in tenants.items():
+        if settings.get("backend", "mysql") == "mysql" and "database" not in settings:
+            raise ValueError(f"{path}: tenant '{name}' has no database")
+        if settings.get("backend") == "sqlite" and "path" not in settings:
+            raise ValueError(f"{path}: tenant '{name}' has no path")
+    return tenants
+
+
+# -----------------------
+# ROUTER
+# -----------------------
+def _fetch_employees():
+    """Like db_config.fetch_employees_db, but raises instead of returning [] on failure,
+    so fan_out() reports an unreachable tenant rather than an empty one."""
+    conn = db_config.create_connection()
+    if conn is None:
+        raise RuntimeError("cannot connect to the tenant database")
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute(db_config.EMPLOYEE_LIST_QUERY)
+        return build_records(EmployeeRecord, cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class TenantRouter:
+    """Per-tenant backends, selected by the current tenant once install()ed."""
+
+    def __init__(self, tenants=None):
+        self.backends = {}
+        for name, settings in (tenants or {}).items():
+            self.register(name, settings)
+
+    @classmethod
+    def from_file(cls, path=TENANTS_FILE):
+        return cls(load_tenants(path))
+
+    def register(self, name, settings):
+        """Add or replace a tenant; `settings` as in the tenants file."""
+        self.backends[name] = make_backend(settings)
+
+    def names(self):
+        return sorted(self.backends)
+
+    def backend_for_current(self):
+        name = _current.get()
+        if name is None:
+            return None
+        try:
+            return self.backends[name]
+        except KeyError:
+            raise RuntimeError(f"unknown tenant '{name}'") from None
+
+    def connect(self, name):
+        """A connection to `name`'s database, or None (used by the audit writer)."""
+        with use_tenant(name):
+            return db_config.create_connection()
+
+    def install(self):
+        """Make db_config and the audit log follow the current tenant."""
+        db_config.set_backend_resolver(self.backend_for_current)
+        audit_log.set_router(current_tenant, self.connect)
+        return self
+
+    def uninstall(self):
+        audit_log.flush()
+        audit_log.set_router(None, None)
+        db_config.set_backend_resolver(None)
+
+    def fan_out(self, func, *args, tenants=None, max_workers=None, **kwargs):
+        """Call func(*args, **kwargs) once per tenant, concurrently, each inside use_tenant().
+
+        Returns (results, errors): {tenant: return value} for the calls that
+        finished and {tenant: exception} for the ones that raised.
+        """
+        names = list(tenants) if tenants is not None else self.names()
+        unknown = [name for name in names if name not in self.backends]
+        if unknown:
+            raise ValueError(f"unknown tenant(s): {', '.join(unknown)}")
+        results, errors = {}, {}
+        if not names:
+            return results, errors
+
+        def call(name):
+            with use_tenant(name):
+                return func(*args, **kwargs)
+
+        workers = max_workers or min(len(names), DEFAULT_FAN_OUT)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tenant") as pool:
+            futures = {name: pool.submit(contextvars.copy_context().run, call, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except (*Error, RuntimeError, OSError) as e:
+                    errors[name] = e
+        return results, errors
+
+    # Merged fan-out queries
+    def fetch_all_employees(self, tenants=None):
+        """[(tenant, EmployeeRecord)] for every tenant, by tenant then emp_id; plus {tenant: error}."""
+        results, errors = self.fan_out(_fetch_employees, tenants=tenants)
+        merged = [(name, record) for name in sorted(results) for record in results[name]]
+        return merged, errors
+
+    def generate_payroll_all(self, year_month, incremental=False, workers=1, chunk_size=None,
+                             tenants=None):
+        """Run payroll_batch.run_payroll for the month in every tenant at once.
+
+        Returns ({tenant: summary or None}, totals, {tenant: error}); totals
+        adds up processed, failed, inserted and changed over the tenants.
+        """
+        import payroll_batch
+        options = {"workers": workers, "stream": None, "incremental": incremental}
+        if chunk_size:
+            options["chunk_size"] = chunk_size
+        results, errors = self.fan_out(payroll_batch.run_payroll, year_month, tenants=tenants, **options)
+        totals = {"processed": 0, "failed": 0, "inserted": 0, "changed": 0}
+        for summary in results.values():
+            for key in totals:
+                totals[key] += (summary or {}).get(key, 0)
+        return results, totals, errors
+
+
+# -----------------------
+# COMMAND LINE
+# -----------------------
+def _print_message(kind, title, msg):
+    tenant = current_tenant()
+    prefix = f"{tenant}: " if tenant else ""
+    print(f"[{prefix}{title}] {msg}", file=sys.stderr)
+
+
+def _report_errors(errors):
+    for name, error in sorted(errors.items()):
+        print(f"[{name}] {error}", file=sys.stderr)
+
+
+def _init_tenant():
+    db_config.initialize_database()
+    db_config.create_tables()
+    return db_config.create_connection() is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Work with several company databases at once.")
+    parser.add_argument("--file", default=TENANTS_FILE, help="Tenants file (default: %(default)s)")
+    parser.add_argument("--tenant", action="append", dest="tenants",
+                        help="Limit to this tenant (repeatable; default: all)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show configured tenants")
+    commands.add_parser("init", help="Create each tenant's database and schema")
+    commands.add_parser("employees", help="Every tenant's employees as CSV on stdout")
+    payroll = commands.add_parser("payroll", help="Generate payroll in every tenant concurrently")
+    payroll.add_argument("year_month", help="Payroll month (YYYY-MM)")
+    payroll.add_argument("--incremental", action="store_true", help="Only write changed rows")
+    payroll.add_argument("--workers", type=int, default=1, help="Worker threads per tenant")
+    args = parser.parse_args(argv)
+
+    try:
+        router = TenantRouter.from_file(args.file)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Cannot load tenants: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    unknown = [name for name in args.tenants or () if name not in router.backends]
+    if unknown:
+        print(f"Unknown tenant(s): {', '.join(unknown)}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.command == "payroll" and not db_config.valid_year_month(args.year_month):
+        print("year_month must be in YYYY-MM format.", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.command == "list":
+        for name in router.names():
+            print(f"{name}\t{router.backends[name].identity}")
+        return EXIT_OK
+
+    db_config.set_message_handler(_print_message)
+    router.install()
+    try:
+        if args.command == "init":
+            # One tenant at a time: migrations serialise on a server-wide lock anyway
+            ok = True
+            for name in args.tenants or router.names():
+                with use_tenant(name):
+                    ok = _init_tenant() and ok
+            return EXIT_OK if ok else EXIT_NO_DATABASE
+
+        if args.command == "employees":
+            merged, errors = router.fetch_all_employees(args.tenants)
+            writer = csv.writer(sys.stdout)
+            writer.writerow(["tenant", *EmployeeRecord.__slots__])
+            for name, record in merged:
+                writer.writerow([name, *record.display_values()])
+            _report_errors(errors)
+            return EXIT_PARTIAL if errors else EXIT_OK
+
+        results, totals, errors = router.generate_payroll_all(
+            args.year_month, args.incremental, max(1, args.workers), tenants=args.tenants)
+        for name in sorted(results):
+            summary = results[name]
+            if summary is None:
+                errors.setdefault(name, "payroll run did not complete")
+                continue
+            print(f"{name}: {summary['processed']} processed, {summary['failed']} failed "
+                  f"in {summary['seconds']:.1f}s (job {summary['job_id']})")
+        print(f"Total: {totals['processed']} processed, {totals['failed']} failed "
+              f"across {len(results)} tenant(s)")
+        _report_errors(errors)
+        if errors and not any(results.values()):
+            return EXIT_NO_DATABASE
+        return EXIT_PARTIAL if errors or totals["failed"] else EXIT_OK
+    finally:
+        router.uninstall()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Tests for checkpointed payroll jobs in payroll_batch.py, on a throwaway SQLite database.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audit_log
+import db_config
+import payroll_batch
+
+MONTH = "2026-10"
+EMPLOYEES = 25
+
+
+class PayrollJobTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (db_config.DB_BACKEND, db_config.DB_SQLITE_PATH, db_config._backend)
+        db_config.DB_BACKEND = "sqlite"
+        db_config.DB_SQLITE_PATH = os.path.join(self.tmp.name, "payroll.db")
+        db_config._backend = None
+        self.messages = []
+        db_config.set_message_handler(lambda kind, title, msg: self.messages.append((kind, title, msg)))
+        db_config.initialize_database()
+        db_config.create_tables()
+        self.execute("INSERT INTO employees (first_name, email, base_salary, updated_at) VALUES "
+                     + ", ".join(["(%s, %s, %s, '2026-01-01 00:00:00.000')"] * EMPLOYEES),
+                     [value for n in range(1, EMPLOYEES + 1) for value in (f"E{n}", f"e{n}@example.com", 1000 + n)])
+
+    def tearDown(self):
+        audit_log.flush()       # payroll writes are audited into this database, not the real one
+        db_config.set_message_handler(None)
+        db_config.DB_BACKEND, db_config.DB_SQLITE_PATH, db_config._backend = self.saved
+        self.tmp.cleanup()
+
+    def execute(self, sql, params=()):
+        conn = db_config.create_connection()
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else None
+            conn.commit()
+            return rows
+        finally:
+            cursor.close()
+            conn.close()
+
+    def jobs(self):
+        return self.execute("SELECT job_id, status, processed FROM payroll_jobs ORDER BY job_id")
+
+    def payroll_rows(self):
+        return self.execute("SELECT COUNT(*) FROM payroll WHERE pay_period = %s",
+                            (payroll_batch.period_date(MONTH),))[0][0]
+
+    def fail_on_call(self, number):
+        """Patch write_payroll_batch so its `number`-th call raises like a lost connection."""
+        real = payroll_batch.write_payroll_batch
+        calls = []
+
+        def write(*args):
+            calls.append(1)
+            if len(calls) == number:
+                raise RuntimeError("connection lost")
+            return real(*args)
+        return mock.patch.object(payroll_batch, "write_payroll_batch", write)
+
+    def test_failed_job_resumes_from_its_checkpoint(self):
+        with self.fail_on_call(2):
+            self.assertIsNone(payroll_batch.run_payroll(MONTH, chunk_size=10, stream=None))
+        self.assertEqual(self.jobs(), [(1, "FAILED", 10)])
+        self.assertEqual(self.execute("SELECT checkpoint_id, done FROM payroll_job_ranges WHERE job_id = 1"),
+                         [(10, 0)])
+        self.assertEqual(self.payroll_rows(), 10)
+
+        summary = payroll_batch.run_payroll(MONTH, chunk_size=10, stream=None)
+        self.assertEqual(summary["job_id"], 1)
+        self.assertTrue(summary["resumed"])
+        self.assertEqual(summary["processed"], EMPLOYEES)
+        self.assertEqual(summary["inserted"], EMPLOYEES - 10)
+        self.assertEqual(self.jobs(), [(1, "COMPLETED", EMPLOYEES)])
+        self.assertEqual(self.execute("SELECT checkpoint_id, done FROM payroll_job_ranges WHERE job_id = 1"),
+                         [(EMPLOYEES, 1)])
+        self.assertEqual(self.payroll_rows(), EMPLOYEES)
+
+    def test_ranges_cover_every_employee_once(self):
+        summary = payroll_batch.run_payroll(MONTH, chunk_size=4, workers=3, stream=None)
+        self.assertEqual(summary["processed"], EMPLOYEES)
+        ranges = self.execute("SELECT first_id, last_id, checkpoint_id, done FROM payroll_job_ranges "
+                              "ORDER BY range_no")
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], EMPLOYEES)
+        for (_first, last, checkpoint, done), following in zip(ranges, ranges[1:] + [None]):
+            self.assertEqual((checkpoint, done), (last, 1))
+            if following:
+                self.assertEqual(following[0], last)
+        self.assertEqual(self.payroll_rows(), EMPLOYEES)
+
+    def test_running_job_is_not_taken_over(self):
+        self.execute("INSERT INTO payroll_jobs (pay_period, mode, status, started_at) "
+                     "VALUES (%s, 'FULL', 'RUNNING', NOW())", (payroll_batch.period_date(MONTH),))
+        self.assertIsNone(payroll_batch.run_payroll(MONTH, stream=None))
+        self.assertEqual(self.messages[-1][1], "Payroll Running")
+        self.assertEqual(self.jobs(), [(1, "RUNNING", 0)])
+        self.assertEqual(self.payroll_rows(), 0)
+
+        summary = payroll_batch.run_payroll(MONTH, stream=None, restart=True)
+        self.assertFalse(summary["resumed"])
+        self.assertEqual(self.jobs(), [(1, "ABANDONED", 0), (2, "COMPLETED", EMPLOYEES)])
+
+    def test_completed_job_is_not_resumed(self):
+        payroll_batch.run_payroll(MONTH, stream=None)
+        summary = payroll_batch.run_payroll(MONTH, stream=None)
+        self.assertEqual(summary["job_id"], 2)
+        self.assertFalse(summary["resumed"])
+        self.assertEqual(summary["changed"], EMPLOYEES)
+
+    def test_incremental_reads_only_changed_employees(self):
+        payroll_batch.run_payroll(MONTH, stream=None)
+        self.execute("UPDATE employees SET base_salary = base_salary + 100 WHERE emp_id IN (3, 7)")
+        self.execute("UPDATE employees SET phone = '555' WHERE emp_id = 9")
+        self.execute("UPDATE employees SET status = 'INACTIVE' WHERE emp_id = 11")
+
+        summary = payroll_batch.run_payroll(MONTH, stream=None, incremental=True)
+        self.assertEqual((summary["processed"], summary["changed"], summary["unchanged"]), (3, 2, 1))
+        self.assertEqual(summary["stale"], 1)
+        pay = dict(self.execute("SELECT emp_id, gross_pay FROM payroll WHERE emp_id IN (3, 7)"))
+        self.assertEqual(pay, {emp_id: payroll_batch.calculate_payroll(1000 + emp_id + 100)[0]
+                               for emp_id in (3, 7)})
+
+        summary = payroll_batch.run_payroll(MONTH, stream=None, incremental=True)
+        self.assertEqual(summary["processed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for the MySQL -> SQLite statement translation in storage.py.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import translate_sql, SQLiteBackend
+
+
+class TranslateSqlTest(unittest.TestCase):
+    def test_placeholders(self):
+        sql, writes = translate_sql("SELECT * FROM employees WHERE emp_id = %s AND status = %s")
+        self.assertEqual(sql, "SELECT * FROM employees WHERE emp_id = ? AND status = ?")
+        self.assertFalse(writes)
+
+    def test_insert_ignore(self):
+        sql, writes = translate_sql("INSERT IGNORE INTO departments (dept_name) VALUES (%s)")
+        self.assertEqual(sql, "INSERT OR IGNORE INTO departments (dept_name) VALUES (?)")
+        self.assertTrue(writes)
+
+    def test_on_duplicate_key_update(self):
+        sql, writes = translate_sql(
+            "INSERT INTO payroll (emp_id, pay_period, net_pay) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE net_pay = VALUES(net_pay)")
+        self.assertEqual(sql, "INSERT INTO payroll (emp_id, pay_period, net_pay) VALUES (?, ?, ?) "
+                              "ON CONFLICT (emp_id, pay_period) DO UPDATE SET net_pay = excluded.net_pay")
+        self.assertTrue(writes)
+
+    def test_on_duplicate_key_unknown_table(self):
+        with self.assertRaises(KeyError):
+            translate_sql("INSERT INTO nowhere (a) VALUES (%s) ON DUPLICATE KEY UPDATE a = VALUES(a)")
+
+    def test_current_timestamp(self):
+        sql, _writes = translate_sql("UPDATE employees SET updated_at = CURRENT_TIMESTAMP WHERE emp_id = %s")
+        self.assertEqual(sql, "UPDATE employees SET updated_at = NOW() WHERE emp_id = ?")
+        # CURRENT_TIMESTAMP(6) is a column default, not rewritten
+        sql, _writes = translate_sql("SELECT CURRENT_TIMESTAMP(6)")
+        self.assertEqual(sql, "SELECT CURRENT_TIMESTAMP(6)")
+
+    def test_timestampdiff_unit_is_quoted(self):
+        sql, _writes = translate_sql("SELECT TIMESTAMPDIFF(MINUTE, in_time, out_time) FROM attendance")
+        self.assertEqual(sql, "SELECT TIMESTAMPDIFF('MINUTE', in_time, out_time) FROM attendance")
+
+    def test_lock_clause_dropped_and_marks_write(self):
+        for clause in ("FOR UPDATE", "for share"):
+            sql, writes = translate_sql(f"SELECT status FROM employees WHERE emp_id = %s {clause}")
+            self.assertEqual(sql, "SELECT status FROM employees WHERE emp_id = ?")
+            self.assertTrue(writes)
+
+    def test_write_verbs(self):
+        for verb in ("INSERT INTO t VALUES (1)", "  update t SET a = 1", "DELETE FROM t", "REPLACE INTO t VALUES (1)"):
+            self.assertTrue(translate_sql(verb)[1], verb)
+        self.assertFalse(translate_sql("SELECT 1 -- DELETE")[1])
+
+    def test_percent_literals_untouched(self):
+        sql, _writes = translate_sql("SELECT strftime('%d', att_date) FROM attendance WHERE emp_id = %s")
+        self.assertEqual(sql, "SELECT strftime('%d', att_date) FROM attendance WHERE emp_id = ?")
+
+
+class AttendanceBitmapUpsertTest(unittest.TestCase):
+    """The SQLite rebuild statement, translated, runs against the SQLite schema."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        backend = SQLiteBackend(os.path.join(self.tmp.name, "test.db"))
+        backend.initialize_database()
+        self.conn = backend.connect()
+        backend.create_schema(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_rebuild_sets_day_bits(self):
+        from attendance_analytics import SQLITE_BITMAP_UPSERT
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO employees (emp_id, first_name, last_name, email, base_salary) "
+                       "VALUES (1, 'Ann', 'Lee', 'ann@example.com', 1000)")
+        for day, status in ((1, "PRESENT"), (2, "ABSENT"), (3, "LEAVE"), (31, "PRESENT")):
+            cursor.execute("INSERT INTO attendance (emp_id, att_date, status) VALUES (%s, %s, %s)",
+                           (1, datetime.date(2026, 10, day), status))
+        sql = SQLITE_BITMAP_UPSERT.format(month_filter="")
+        cursor.execute(sql, (0, 10))
+        cursor.execute(sql, (0, 10))            # second run takes the conflict path
+        self.conn.commit()
+        cursor.execute("SELECT month, present_bits, absent_bits, leave_bits FROM attendance_bitmaps "
+                       "WHERE emp_id = 1")
+        self.assertEqual(cursor.fetchall(), [(datetime.date(2026, 10, 1), 1 | 1 << 30, 1 << 1, 1 << 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+"""Event-loop latency profiler and stall detector for the Tk GUI.
+
+Disabled unless HR_UI_PROFILE is set in the environment; then
+
+  * wrap() times every registered callback (theme buttons, bindings) and
+    keeps a per-callback latency histogram;
+  * a heartbeat after() timer measures how late the event loop gets back to
+    it; a gap above HR_UI_STALL_MS (default 200) is a stall;
+  * a watchdog thread samples the main thread's stack while a stall is in
+    progress, so the log shows where the time went, even inside a DB call.
+
+Stalls are appended to the log as they end; the histogram is written at exit.
+The log goes to HR_UI_PROFILE_LOG or ~/.hr_system/ui-profile-<timestamp>.log.
+
+Usage:
+    HR_UI_PROFILE=1 python gui_main.py
+"""
+import atexit
+import datetime
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+
+ENABLED = bool(os.environ.get("HR_UI_PROFILE"))
+DEFAULT_STALL_MS = 200.0
+
+
+def _stall_threshold():
+    """HR_UI_STALL_MS as a positive number of ms; anything else falls back to the default."""
+    raw = os.environ.get("HR_UI_STALL_MS")
+    if raw is None:
+        return DEFAULT_STALL_MS
+    try:
+        value = float(raw)
+    except ValueError:
+        value = 0.0
+    if not value > 0 or value == float("inf"):
+        if ENABLED:
+            print(f"ui_profiler: ignoring HR_UI_STALL_MS={raw!r}, using {DEFAULT_STALL_MS:.0f}",
+                  file=sys.stderr)
+        return DEFAULT_STALL_MS
+    return value
+
+
+STALL_MS = _stall_threshold()
+HEARTBEAT_MS = 50
+MAX_SAMPLES_PER_STALL = 5
+BUCKETS_MS = (16, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_stats = {}            # callback name -> [count, total_s, max_s, bucket counts]
+_active = []           # names of callbacks running on the main thread (innermost last)
+_log = None
+_main_ident = None
+_last_beat = None
+_stall = None          # {"started", "callbacks", "samples"} while the loop is blocked
+
+
+def _bucket(ms):
+    for i, limit in enumerate(BUCKETS_MS):
+        if ms < limit:
+            return i
+    return len(BUCKETS_MS)
+
+
+def _observe(name, seconds):
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            entry = _stats[name] = [0, 0.0, 0.0, [0] * (len(BUCKETS_MS) + 1)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3][_bucket(seconds * 1000)] += 1
+
+
+def wrap(name, func):
+    """Return `func` timed under `name` (or unchanged when profiling is off)."""
+    if not ENABLED or func is None:
+        return func
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        _active.append(name)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _observe(name, time.perf_counter() - started)
+            _active.pop()
+    return timed
+
+
+# -----------------------
+# LOG
+# -----------------------
+def _write(text):
+    global _log
+    if _log is None:
+        path = os.environ.get("HR_UI_PROFILE_LOG")
+        if not path:
+            directory = os.path.join(os.path.expanduser("~"), ".hr_system")
+            os.makedirs(directory, exist_ok=True)
+            stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(directory, f"ui-profile-{stamp}.log")
+        _log = open(path, "a", encoding="utf-8")
+        print(f"[UI profile] logging to {path}", file=sys.stderr)
+    _log.write(text)
+    _log.flush()
+
+
+def _log_stall(gap_ms, stall):
+    callbacks = ", ".join(stall["callbacks"]) or "(no wrapped callback)"
+    lines = [f"{datetime.datetime.now().isoformat(timespec='milliseconds')} "
+             f"STALL {gap_ms:.0f} ms in {callbacks}\n"]
+    for offset_ms, stack in stall["samples"]:
+        lines.append(f"  sample at +{offset_ms:.0f} ms:\n")
+        lines.extend("    " + line.rstrip("\n").replace("\n", "\n    ") + "\n" for line in stack)
+    _write("".join(lines))
+
+
+def report():
+    """Per-callback histogram as text, slowest total first."""
+    header = "".join(f"{'<' + str(ms):>7}" for ms in BUCKETS_MS) + f"{'>=' + str(BUCKETS_MS[-1]):>8}"
+    lines = [f"{'Callback':<40}{'Count':>7}{'Mean ms':>9}{'Max ms':>9}{header}\n"]
+    with _lock:
+        rows = sorted(_stats.items(), key=lambda item: -item[1][1])
+        for name, (count, total, worst, buckets) in rows:
+            cells = "".join(f"{n:>7}" for n in buckets[:-1]) + f"{buckets[-1]:>8}"
+            lines.append(f"{name[:39]:<40}{count:>7}{total / count * 1000:>9.1f}{worst * 1000:>9.1f}{cells}\n")
+    return "".join(lines)
+
+
+def _write_report():
+    if _stats:
+        _write(f"\n{datetime.datetime.now().isoformat(timespec='seconds')} CALLBACK LATENCY\n{report()}")
+
+
+# -----------------------
+# HEARTBEAT + WATCHDOG
+# -----------------------
+def _beat(root):
+    global _last_beat, _stall
+    now = time.monotonic()
+    gap_ms = (now - _last_beat) * 1000
+    _last_beat = now
+    with _lock:
+        stall, _stall = _stall, None
+    if gap_ms - HEARTBEAT_MS >= STALL_MS:
+        _log_stall(gap_ms, stall or {"callbacks": [], "samples": []})
+    root.after(HEARTBEAT_MS, _beat, root)
+
+
+def _watchdog():
+    global _stall
+    frames_of = sys._current_frames
+    while True:
+        time.sleep(HEARTBEAT_MS / 2000.0)
+        last = _last_beat
+        blocked_ms = (time.monotonic() - last) * 1000 - HEARTBEAT_MS
+        if blocked_ms < STALL_MS:
+            continue
+        with _lock:
+            if _stall is None or _stall["started"] != last:
+                _stall = {"started": last, "callbacks": [], "samples": [], "next_ms": 0.0}
+            stall = _stall
+            for name in _active:
+                if name not in stall["callbacks"]:
+                    stall["callbacks"].append(name)
+            if len(stall["samples"]) >= MAX_SAMPLES_PER_STALL or blocked_ms < stall["next_ms"]:
+                continue
+            stall["next_ms"] = blocked_ms + STALL_MS
+        frame = frames_of().get(_main_ident)
+        if frame is not None:
+            stack = traceback.format_stack(frame)
+            with _lock:
+                stall["samples"].append((blocked_ms, stack))
+
+
+def install(root):
+    """Start the heartbeat and watchdog for `root` (no-op when profiling is off)."""
+    global _main_ident, _last_beat
+    if not ENABLED or _main_ident is not None:
+        return
+    _main_ident = threading.get_ident()
+    _last_beat = time.monotonic()
+    root.after(HEARTBEAT_MS, _beat, root)
+    threading.Thread(target=_watchdog, name="ui-watchdog", daemon=True).start()
+    atexit.register(_write_report)
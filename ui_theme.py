@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk
 
+import ui_profiler
+
 # ------------------------------------------------------
 # COLOR PALETTE
 # ------------------------------------------------------
@@ -63,7 +65,7 @@ def styled_labelframe(parent, text):
 # ------------------------------------------------------
 def colorful_button(parent, text, cmd, style="accent2"):
     color = COLORS.get(style, COLORS["accent2"])
-    btn = tk.Button(parent, text=text, command=cmd,
+    btn = tk.Button(parent, text=text, command=ui_profiler.wrap(f"button: {text}", cmd),
                     font=("Arial", 11, "bold"),
                     bg=color, fg="white",
                     activebackground=color,
@@ -107,3 +109,85 @@ def style_scrollbar(scrollbar):
                     bordercolor=COLORS["border"],
                     arrowcolor="white")
     scrollbar.configure(style="Vertical.TScrollbar")
+
+
+# ------------------------------------------------------
+# AUTOCOMPLETE POPUP
+# complete(text) -> [(value, label)]; picking a row puts value in the entry
+# ------------------------------------------------------
+def autocomplete_entry(entry, complete, name="autocomplete", rows=8):
+    popup = {"win": None, "list": None, "values": []}
+
+    def hide(event=None):
+        if popup["win"] is not None:
+            popup["win"].destroy()
+            popup.update(win=None, list=None, values=[])
+
+    def pick(event=None):
+        if popup["win"] is None:
+            return None
+        selection = popup["list"].curselection()
+        value = popup["values"][selection[0] if selection else 0]
+        entry.delete(0, tk.END)
+        entry.insert(0, str(value))
+        hide()
+        entry.focus_set()
+        entry.icursor(tk.END)
+        return "break"
+
+    def hide_unless_focused():
+        try:
+            focus = entry.focus_get()
+        except (KeyError, tk.TclError):
+            focus = None
+        if focus is not entry and focus is not popup["list"]:
+            hide()
+
+    def show(matches):
+        if popup["win"] is None:
+            win = tk.Toplevel(entry)
+            win.wm_overrideredirect(True)
+            listbox = tk.Listbox(win, font=("Arial", 10), bg=COLORS["frame"], fg="white",
+                                 selectbackground=COLORS["accent2"], activestyle="none",
+                                 relief="flat", highlightthickness=1,
+                                 highlightbackground=COLORS["border"])
+            listbox.pack(fill="both", expand=True)
+            listbox.bind("<ButtonRelease-1>", pick)
+            listbox.bind("<Return>", pick)
+            listbox.bind("<Escape>", lambda e: (hide(), entry.focus_set()))
+            listbox.bind("<FocusOut>", lambda e: entry.after(150, hide_unless_focused))
+            popup.update(win=win, list=listbox)
+        listbox = popup["list"]
+        listbox.delete(0, tk.END)
+        for value, label in matches:
+            listbox.insert(tk.END, f"{value}  {label or ''}")
+        listbox.configure(height=min(rows, len(matches)), width=max(int(entry.cget("width")), 28))
+        popup["values"] = [value for value, _label in matches]
+        popup["win"].wm_geometry(f"+{entry.winfo_rootx()}+{entry.winfo_rooty() + entry.winfo_height()}")
+        popup["win"].lift()
+
+    def on_key(event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        matches = complete(entry.get())
+        if matches:
+            show(matches)
+        else:
+            hide()
+
+    def on_down(event):
+        if popup["win"] is None:
+            return None
+        listbox = popup["list"]
+        listbox.focus_set()
+        listbox.selection_clear(0, tk.END)
+        listbox.selection_set(0)
+        listbox.activate(0)
+        return "break"
+
+    entry.bind("<KeyRelease>", ui_profiler.wrap(f"{name} <KeyRelease>", on_key), add="+")
+    entry.bind("<Down>", on_down, add="+")
+    entry.bind("<Return>", pick, add="+")
+    entry.bind("<Escape>", hide, add="+")
+    entry.bind("<FocusOut>", lambda e: entry.after(150, hide_unless_focused), add="+")
+    return hide